@@ -0,0 +1,79 @@
+"""Process-wide OpenAI client pool.
+
+Building an ``OpenAI`` client per camera per prompt throws away HTTP
+keep-alive and TLS sessions.  Clients here live for the whole process: one
+HTTP connection pool per endpoint, one API client per (endpoint, api key) on
+top of it, so cameras and the interface AI that talk to the same server share
+connections.  The async clients used on the router's event loop are pooled
+the same way.
+"""
+import threading
+
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+_lock = threading.Lock()
+_http_pools = {}   # endpoint -> httpx client (connection pool)
+_clients = {}      # (endpoint, api_key) -> OpenAI
+_ahttp_pools = {}  # endpoint -> async httpx client
+_aclients = {}     # (endpoint, api_key) -> AsyncOpenAI
+
+
+def get_client(endpoint, api_key):
+    """Return the shared ``OpenAI`` client for an endpoint / key pair."""
+    key = (endpoint, api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            pool = _http_pools.get(endpoint)
+            if pool is None:
+                pool = _http_pools[endpoint] = DefaultHttpxClient()
+            client = _clients[key] = OpenAI(api_key=api_key, base_url=endpoint, http_client=pool)
+        return client
+
+
+def get_async_client(endpoint, api_key):
+    """Return the shared ``AsyncOpenAI`` client for an endpoint / key pair.
+
+    Async clients belong to the event loop that first uses them, so only call
+    this from the router's event-loop thread.
+    """
+    key = (endpoint, api_key)
+    client = _aclients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _aclients.get(key)
+        if client is None:
+            pool = _ahttp_pools.get(endpoint)
+            if pool is None:
+                pool = _ahttp_pools[endpoint] = DefaultAsyncHttpxClient()
+            client = _aclients[key] = AsyncOpenAI(api_key=api_key, base_url=endpoint, http_client=pool)
+        return client
+
+
+def close_all():
+    """Close every pooled sync connection (application shutdown)."""
+    with _lock:
+        for pool in _http_pools.values():
+            try:
+                pool.close()
+            except Exception:
+                pass
+        _http_pools.clear()
+        _clients.clear()
+
+
+async def aclose_all():
+    """Close the async pools; await this on the event loop that owns them."""
+    with _lock:
+        pools = list(_ahttp_pools.values())
+        _ahttp_pools.clear()
+        _aclients.clear()
+    for pool in pools:
+        try:
+            await pool.aclose()
+        except Exception:
+            pass
@@ -1,66 +1,161 @@
-from camera_handler import get_active_camera_ais
+from camera_handler import camera_registry
 from triangulation import triangulate_3d_position
-from robot_arm_controller import handle_robot_arm_command
-from dictionary import CAMERA_KEYWORDS, TRIANGULATION_KEYWORDS, ARM_KEYWORDS
-import re
+from robot_arm_controller import ahandle_robot_arm_command
+from arm_transport import arm_driver
+from arm_motion import arm_motion
+from object_detector import object_detector, detection_labels, detection_conf, match_label
+from intent_router import intent_router, describe_router
+from async_runtime import get_runtime
+from conversation_history import ConversationHistory
+from config_store import ConfigStore
+from tool_calls import parse_tool_calls, visible_text, format_tool_results, ToolCallFilter
+from metrics import metrics
+import asyncio, re, threading, time
+from collections import OrderedDict
+
+MAX_HISTORIES = 32  # per-client conversations kept; the least recently used is dropped
 
 class InterfaceAIRouter:
     """Routes user prompts to either the interface LLM or camera AIs and injects
-    per‑instance personality / role prompts from the WALDO config."""
+    per‑instance personality / role prompts from the WALDO config.
+
+    The routing itself is a coroutine (``aprocess_prompt``) running on a
+    dedicated event-loop thread; ``process_prompt`` is the blocking wrapper
+    and ``submit_prompt`` the non-blocking, cancellable one."""
 
-    def __init__(self, interface_ai_instance, config_data, camera_calibration, app):
+    def __init__(self, interface_ai_instance, config_data, camera_calibration, app, runtime=None):
         self.interface_ai = interface_ai_instance
-        self.config_data = config_data
+        self.config_data = config_data = ConfigStore.wrap(config_data)
         self.camera_calibration = camera_calibration
-        self.app = app  # WALDOApp instance (for live frames)
-        self.conversation_history = []
+        self.app = app  # WALDOApp instance (for live frames via app.frames)
+        self._histories = OrderedDict()  # client -> ConversationHistory
+        camera_registry.sync(config_data)
+        self.camera_ais = camera_registry.cameras()
+        object_detector.sync(config_data)
+        arm_driver.sync(config_data)
+        arm_motion.sync(config_data)
+        self.runtime = runtime or get_runtime()
+        self._inflight = set()
+        self._latest = {}  # client -> its most recent submit_prompt future (for supersede)
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------------------
+    def history_for(self, client=None):
+        """The conversation of one client (the GUI, one HTTP caller, ...)."""
+        with self._lock:
+            history = self._histories.get(client)
+            if history is None:
+                history = self._histories[client] = ConversationHistory(
+                    token_budget=self.config_data.typed.history_token_budget,
+                    keep_recent=self.config_data.typed.history_keep_turns,
+                    summarizer=self._summarize_history,
+                )
+                while len(self._histories) > MAX_HISTORIES:
+                    self._histories.popitem(last=False)
+            self._histories.move_to_end(client)
+            return history
+
+    def history_tokens(self):
+        """Context tokens held across all client conversations."""
+        with self._lock:
+            histories = list(self._histories.values())
+        return sum(h.tokens for h in histories)
+
+    def process_prompt(self, prompt: str, on_token=None, client=None):
+        """Route and answer a prompt, blocking until the answer is ready.
+
+        With ``on_token`` set, camera and general-chat answers are streamed:
+        the callback receives each text delta as it arrives.  The full answer
+        is returned either way.
+        """
+        return self.runtime.run(self._with_timeout(self.aprocess_prompt(prompt, on_token, client)))
+
+    def submit_prompt(self, prompt: str, on_token=None, supersede=False, client=None):
+        """Start answering a prompt and return a ``concurrent.futures.Future``.
+
+        Any number of prompts may be in flight.  With ``supersede`` the
+        prompt previously submitted by the same ``client`` is cancelled first
+        (the GUI does this when the user sends a new prompt); other clients'
+        prompts are left alone.  ``future.cancel()`` cancels a single request.
+        """
+        future = self.runtime.submit(self._with_timeout(self.aprocess_prompt(prompt, on_token, client)))
+        with self._lock:
+            previous, self._latest[client] = self._latest.get(client), future
+            self._inflight.add(future)
+        future.add_done_callback(lambda f: self._inflight_done(f, client))
+        if supersede and previous is not None:
+            previous.cancel()
+        return future
+
+    def pending(self):
+        """Prompts submitted and not finished yet."""
+        with self._lock:
+            return len(self._inflight)
+
+    def cancel_all(self):
+        with self._lock:
+            pending = list(self._inflight)
+        for future in pending:
+            future.cancel()
+
+    def _inflight_done(self, future, client):
+        with self._lock:
+            self._inflight.discard(future)
+            if self._latest.get(client) is future:
+                del self._latest[client]
+
+    async def _with_timeout(self, coro):
+        timeout = self.config_data.typed.prompt_timeout
+        try:
+            return await asyncio.wait_for(coro, timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            return f"[Error: No answer within {timeout:g}s.]"
 
     # ---------------------------------------------------------------------
-    def process_prompt(self, prompt: str):
-        prompt_lc = prompt.lower()
-        camera_ais = get_active_camera_ais(self.config_data)
-
-        # Try to pick a camera explicitly mentioned (by index or name) --------
-        cam_id = 0
-        for idx in camera_ais:
-            name = self.config_data.get(f"camera_name_{idx}", f"camera {idx+1}").lower()
-            if f"camera {idx+1}" in prompt_lc or name in prompt_lc:
-                cam_id = idx
-                break
+    async def aprocess_prompt(self, prompt: str, on_token=None, client=None):
+        """Coroutine behind ``process_prompt``; runs on the router's event loop.
+
+        Each prompt is one metrics trace, labelled with its intent.  The
+        prompt sees and extends only ``client``'s conversation history.
+        """
+        history = self.history_for(client)
+        with metrics.trace("prompt") as trace:
+            return await self._answer(prompt, on_token, trace, history)
+
+    async def _answer(self, prompt, on_token, trace, history):
+        camera_ais = self.camera_ais
+
+        # Score every intent and camera reference (by index or name) in one pass
+        match = intent_router.route(prompt, self._camera_names(camera_ais))
+        cam_id = match.camera if match.camera is not None else 0
+        trace.set(intent=match.intent)
 
         # 1. CAMERA routing --------------------------------------------------
-        if any(word in prompt_lc for word in CAMERA_KEYWORDS):
-            if cam_id in camera_ais:
-                frame = self.app.latest_frames.get(cam_id)
-                if frame is not None:
-                    camera_answer = camera_ais[cam_id].query(prompt, image=frame)
-                    self._remember(prompt, camera_answer)
-                    return camera_answer
-                return "[Error: Could not capture camera frame.]"
-            return "[Error: No camera available.]"
+        if match.intent == "camera":
+            camera_answer, ok = await self._camera_answer(prompt, cam_id, on_token)
+            if ok:
+                history.add(prompt, camera_answer)
+            return camera_answer
 
         # 2. TRIANGULATION ---------------------------------------------------
-        elif any(word in prompt_lc for word in TRIANGULATION_KEYWORDS):
-            object_name = prompt
-            pixel_coords = {}
-            for cam_id, cam_ai in camera_ais.items():
-                frame = self.app.latest_frames.get(cam_id)
-                reply = cam_ai.query(f"Locate the {object_name}. Give only x,y pixel coordinates.", image=frame)
-                try:
-                    pixel_coords[cam_id] = self._parse_coords(reply)
-                except ValueError:
-                    pixel_coords[cam_id] = None
-            world_pos = triangulate_3d_position(self.camera_calibration, pixel_coords)
-            self._remember(prompt, str(world_pos))
-            return f"The estimated world position vector is: {world_pos}"
+        elif match.intent == "triangulation":
+            result = await self._triangulate(prompt)
+            history.add_result(prompt, "triangulation", position=result.position,
+                                    residual_px=result.residual_px, views=result.views,
+                                    error=result.error)
+            return self._describe_triangulation(result)
 
         # 3. ROBOT ARM -------------------------------------------------------
-        elif any(word in prompt_lc for word in ARM_KEYWORDS):
-            arm_result = handle_robot_arm_command(prompt)
-            self._remember(prompt, arm_result)
+        elif match.intent == "arm":
+            arm_result = await ahandle_robot_arm_command(prompt)
+            history.add_result(prompt, "arm", result=arm_result)
             return f"[Robot Arm]: {arm_result}"
 
-        # 4. GENERAL LLM -----------------------------------------------------
+        # 4. MOTION (local index) --------------------------------------------
+        elif match.intent == "motion":
+            return await self._motion_answer(prompt, match.camera, history, on_token)
+
+        # 5. GENERAL LLM -----------------------------------------------------
         personality = self.config_data.get("interface_personality", "")
         roles = self.config_data.get("interface_roles", "")
         personality_block = f"Personality: {personality}. " if personality else ""
@@ -79,21 +174,288 @@ class InterfaceAIRouter:
             )
         }
 
-        messages = [system_message] + self.conversation_history + [{"role": "user", "content": prompt}]
-        reply = self.interface_ai.chat(messages)
-        if isinstance(reply, dict):  # safeguard
-            reply = reply.get("content", str(reply))
-        self._remember(prompt, reply)
+        messages = [system_message] + history.messages() + [{"role": "user", "content": prompt}]
+        reply = await self._chat_with_tools(messages, on_token)
+        history.add(prompt, reply)
         return reply
 
     # ---------------------------------------------------------------------
+    async def _chat_with_tools(self, messages, on_token=None):
+        """General chat plus the CALL_* tool loop.
+
+        Every tool call in a reply is executed (independent calls
+        concurrently, arm commands in order) and all results go back in one
+        TOOL_RESULT turn, so a multi-tool turn costs one extra round trip.
+        Bounded by ``tool_max_iterations`` rounds and ``tool_budget_s``
+        seconds of tool time.
+
+        The answer is the text shown of every round (what precedes its
+        first ``CALL_``), one line apart; streamed or not, it is the same
+        text that is returned and remembered.
+        """
+        max_rounds = self.config_data.typed.tool_max_iterations
+        deadline = time.monotonic() + self.config_data.typed.tool_budget_s
+        messages = list(messages)
+        shown = []
+
+        def answer():
+            return "\n".join(text for text in shown if text)
+
+        for round_no in range(max_rounds + 1):
+            stream = ToolCallFilter(on_token, prefix="\n" if answer() else "") if on_token else None
+            if stream:
+                reply = await self._drain(self.interface_ai.achat_stream(messages), stream.push)
+                stream.flush()
+            else:
+                reply = await self.interface_ai.achat(messages)
+            if isinstance(reply, dict):  # safeguard
+                reply = reply.get("content", str(reply))
+
+            shown.append(visible_text(reply))
+            calls = parse_tool_calls(reply)
+            if not calls:
+                return answer()
+            if round_no == max_rounds or time.monotonic() >= deadline:
+                return answer() or "[Tool budget exhausted before an answer.]"
+
+            results = await self._run_tools(calls, deadline)
+            messages.append({"role": "assistant", "content": reply})
+            messages.append({"role": "user", "content": format_tool_results(results)})
+        return answer()
+
+    async def _run_tools(self, calls, deadline):
+        async def run_one(call):
+            if call.tool == "CAMERA":
+                match = intent_router.route(call.arg, self._camera_names(self.camera_ais))
+                cam_id = match.camera if match.camera is not None else 0
+                answer, _ = await self._camera_answer(call.arg, cam_id)
+                return answer
+            if call.tool == "TRIANGULATE":
+                return self._describe_triangulation(await self._triangulate(call.arg))
+            return await ahandle_robot_arm_command(call.arg, timeout=max(0.0, deadline - time.monotonic()))
+
+        async def run_arm_in_order(arm_calls):
+            return [await run_one(call) for call in arm_calls]
+
+        arm_calls = [c for c in calls if c.tool == "ARM"]
+        others = [c for c in calls if c.tool != "ARM"]
+        jobs = [asyncio.ensure_future(run_one(c)) for c in others]
+        if arm_calls:
+            jobs.append(asyncio.ensure_future(run_arm_in_order(arm_calls)))
+
+        done, pending = await asyncio.wait(jobs, timeout=max(0.0, deadline - time.monotonic()))
+        for job in pending:
+            job.cancel()
+
+        def outcome(job):
+            if job in pending:
+                return "[timed out]"
+            if job.exception() is not None:
+                return f"[error: {job.exception()}]"
+            return job.result()
+
+        results = [(call, outcome(job)) for call, job in zip(others, jobs)]
+        if arm_calls:
+            arm_job = jobs[-1]
+            arm_results = outcome(arm_job)
+            if not isinstance(arm_results, list):
+                arm_results = [arm_results] * len(arm_calls)
+            results.extend(zip(arm_calls, arm_results))
+        order = {id(c): i for i, c in enumerate(calls)}
+        return sorted(results, key=lambda r: order[id(r[0])])
+
+    async def _camera_answer(self, prompt, cam_id, on_token=None):
+        """Ask one camera about its newest frame.  Returns (answer, ok)."""
+        cam_ai = self.camera_ais.get(cam_id)
+        if cam_ai is None:
+            return "[Error: No camera available.]", False
+        view = self.app.frames.read(cam_id)
+        if view is None:
+            return "[Error: Could not capture camera frame.]", False
+        with view:
+            if on_token:
+                answer = await self._drain(cam_ai.aquery_stream(
+                    prompt, image=view.frame, seq=view.seq), on_token)
+            else:
+                answer = await cam_ai.aquery(prompt, image=view.frame, seq=view.seq)
+        return answer, True
+
+    async def _motion_answer(self, prompt, cam_id, history, on_token=None):
+        """Answer from the motion index; ask a camera AI only to describe what moves."""
+        motion = getattr(self.app, "motion", None)
+        if motion is None:  # no detector running: fall back to looking at a frame
+            answer, ok = await self._camera_answer(prompt, cam_id or 0, on_token)
+            if ok:
+                history.add(prompt, answer)
+            return answer
+        cam_ids = [cam_id] if cam_id is not None else self.app.frames.cameras()
+        window_s = self.config_data.typed.motion_window_s
+
+        if describe_router.route(prompt).intent == "describe":
+            event = motion.latest(cam_ids)
+            target = event.cam_id if event else (cam_id or 0)
+            hint = ""
+            if event:
+                x, y, w, h = event.region
+                hint = (f" Motion was detected {time.time() - event.end:.0f}s ago in the "
+                        f"region x={x}, y={y}, w={w}, h={h} (pixels).")
+            answer, ok = await self._camera_answer(prompt + hint, target, on_token)
+            if ok:
+                history.add(prompt, answer)
+            return answer
+
+        answer = motion.summary(sorted(cam_ids), self._camera_names({c: None for c in cam_ids}),
+                                window_s)
+        event = motion.latest(cam_ids)
+        history.add_result(prompt, "motion", moving=[c for c in cam_ids if motion.moving(c)],
+                                last_event=None if event is None else
+                                {"camera": event.cam_id, "where": event.where(),
+                                 "seconds_ago": round(time.time() - event.end)})
+        return answer
+
+    async def _triangulate(self, object_name):
+        """Locate an object in all cameras and triangulate (TriangulationResult).
+
+        Cameras whose local detector knows the object answer first; the camera
+        AIs are only asked when that leaves fewer than
+        ``triangulation_min_views`` views.
+        """
+        min_views = self.config_data.typed.triangulation_min_views
+        pixel_coords = await self._detect_in_cameras(object_name)
+        if len(pixel_coords) < min_views:
+            remaining = {cid: ai for cid, ai in self.camera_ais.items() if cid not in pixel_coords}
+            located = await self._locate_in_cameras(remaining, object_name,
+                                                    min_views - len(pixel_coords))
+            pixel_coords.update({cid: p for cid, p in located.items() if p})
+        return triangulate_3d_position(self.camera_calibration, pixel_coords)
+
+    @staticmethod
+    def _describe_triangulation(result):
+        if not result.ok:
+            return result.error
+        text = (f"The estimated world position vector is: {result.position} "
+                f"(reprojection error {result.residual_px} px over {len(result.views)} cameras")
+        if result.rejected:
+            text += f", ignored outlier camera(s) {result.rejected}"
+        return text + ")"
+
+    # ---------------------------------------------------------------------
+    def refresh_camera_ais(self):
+        """Re-read camera settings; only cameras whose endpoint/key/model changed are rebuilt."""
+        changed = camera_registry.sync(self.config_data)
+        self.camera_ais = camera_registry.cameras()
+        object_detector.sync(self.config_data)
+        arm_driver.sync(self.config_data)
+        arm_motion.sync(self.config_data)
+        return changed
+
+    def _camera_names(self, camera_ais):
+        return {idx: self.config_data.get(f"camera_name_{idx}", f"camera {idx+1}")
+                for idx in camera_ais}
+
+    async def _detect_in_cameras(self, object_name):
+        """Pixel centres from the local detector for cameras with a matching bbox label."""
+        if not object_detector.enabled:
+            return {}
+        jobs = {}
+        for cam_id in self.camera_calibration:
+            label = match_label(detection_labels(self.config_data, cam_id), object_name)
+            if label is None:
+                continue
+            view = self.app.frames.read(cam_id)
+            if view is not None:
+                jobs[cam_id] = asyncio.to_thread(self._detect_in_view, cam_id, view, label,
+                                                 detection_conf(self.config_data, cam_id))
+        found = await asyncio.gather(*jobs.values())
+        return {cam_id: center for cam_id, center in zip(jobs, found) if center}
+
+    @staticmethod
+    def _detect_in_view(cam_id, view, label, min_conf):
+        with view, metrics.timer("detect", cam=cam_id):
+            return object_detector.locate(cam_id, view.frame, label, view.seq, min_conf)
+
+    async def _locate_in_cameras(self, camera_ais, object_name, min_views=None):
+        """Ask every camera for the object's pixel position concurrently.
+
+        Once ``triangulation_min_views`` cameras gave usable coordinates, the
+        rest get at most ``triangulation_grace_s`` more to add views (more
+        views -> better fix); the overall ``triangulation_deadline`` always
+        applies.  Cameras that have not answered by then are cancelled (None).
+        """
+        call_timeout = self.config_data.typed.triangulation_call_timeout
+        deadline = time.monotonic() + self.config_data.typed.triangulation_deadline
+        if min_views is None:
+            min_views = self.config_data.typed.triangulation_min_views
+        grace = self.config_data.typed.triangulation_grace_s
+        question = f"Locate the {object_name}. Give only x,y pixel coordinates."
+
+        pixel_coords, pending = {}, {}
+        for cam_id, cam_ai in camera_ais.items():
+            pixel_coords[cam_id] = None
+            view = self.app.frames.read(cam_id)
+            if view is not None:
+                task = asyncio.ensure_future(self._locate_in_view(cam_ai, view, question, call_timeout))
+                # A task cancelled before it started never enters ``with view``
+                task.add_done_callback(lambda _, view=view: view.release())
+                pending[task] = cam_id
+
+        valid = 0
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(pending, timeout=remaining,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    coords = task.result()
+                    pixel_coords[pending.pop(task)] = coords
+                    if coords is not None:
+                        valid += 1
+                        if valid == min_views:
+                            deadline = min(deadline, time.monotonic() + grace)
+        finally:
+            for task in pending:  # stragglers (or our own cancellation)
+                task.cancel()
+        return pixel_coords
+
+    async def _locate_in_view(self, cam_ai, view, question, timeout):
+        with view:  # frame stays pinned until this camera's query is done
+            try:
+                reply = await asyncio.wait_for(
+                    cam_ai.aquery(question, image=view.frame, timeout=timeout, seq=view.seq), timeout)
+            except asyncio.TimeoutError:
+                return None
+        try:
+            return self._parse_coords(reply)
+        except ValueError:
+            return None
+
+    @staticmethod
+    async def _drain(deltas, on_token):
+        """Forward streamed deltas to ``on_token`` and return the joined text."""
+        parts = []
+        async for delta in deltas:
+            parts.append(delta)
+            on_token(delta)
+        return "".join(parts)
+
     def _parse_coords(self, reply: str):
-        matches = re.findall(r"(\d+)", reply)
+        with metrics.timer("parse_coords"):
+            matches = re.findall(r"(\d+)", reply)
         if len(matches) >= 2:
             return int(matches[0]), int(matches[1])
         raise ValueError("No coordinates found.")
 
-    def _remember(self, user_msg: str, ai_msg: str):
-        """Append to shared history for better conversation context."""
-        self.conversation_history.append({"role": "user", "content": user_msg})
-        self.conversation_history.append({"role": "assistant", "content": ai_msg})
+    def conversation_history(self, client=None):
+        """Messages currently sent as ``client``'s context (summary + recent turns)."""
+        return self.history_for(client).messages()
+
+    async def _summarize_history(self, summary, transcript, max_tokens):
+        """Background compaction: fold old turns into the running summary."""
+        return await self.interface_ai.achat([
+            {"role": "system", "content": (
+                "Update the running summary of a conversation between a user and a robot "
+                f"assistant. Keep facts, names, positions and decisions. At most {max_tokens * 3 // 4} words.")},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"},
+        ])
@@ -0,0 +1,294 @@
+"""Rate-controlled arm motion on top of ``arm_transport``.
+
+``arm_motion.move_to((x, y, z))`` returns a ``MotionHandle`` at once.  One
+motion thread streams ``MOVE x,y,z`` waypoints at ``arm_rate_hz``, moving
+the commanded pose towards the newest target with the speed limited to
+``arm_max_speed`` and the acceleration to ``arm_max_accel`` (units of the
+MOVE coordinates per second / per second²).  The result is a trapezoidal
+speed profile along the path.
+
+A new target supersedes the current one without stopping: the old handle
+ends as "superseded" and the arm bends towards the new target from its
+current velocity, so a tracking loop can send targets as often as it likes.
+A waypoint is dropped rather than queued while the driver still has a full
+ack window outstanding, so the link never backs up; the final waypoint is
+always sent and a move is "reached" once the arm acknowledged it.
+"""
+import asyncio, functools, threading, time
+from concurrent.futures import Future
+
+import numpy as np
+
+from arm_transport import arm_driver, ArmError
+from config_store import ConfigStore
+
+# MotionHandle states
+PENDING, MOVING, REACHED, SUPERSEDED, CANCELLED, FAILED = (
+    "pending", "moving", "reached", "superseded", "cancelled", "failed")
+_FINAL = (REACHED, SUPERSEDED, CANCELLED, FAILED)
+
+
+class MotionHandle:
+    """One requested move; ``wait()`` for it or ``cancel()`` it."""
+
+    def __init__(self, motion, target):
+        self.target = target
+        self.state = PENDING
+        self.error = None
+        self.created_at = time.monotonic()
+        self.finished_at = None
+        self._motion = motion
+        self._done = threading.Event()
+        self.future = Future()  # result: the final state
+
+    def wait(self, timeout=None):
+        """Block until the move ended; True when the target was reached."""
+        self._done.wait(timeout)
+        return self.state == REACHED
+
+    async def wait_async(self, timeout=None):
+        """``wait`` for coroutines; cancelling the caller does not cancel the move."""
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.future)), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.state == REACHED
+
+    def cancel(self):
+        """Stop this move (the arm brakes to a halt); no-op once it ended."""
+        self._motion._cancel(self)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def _finish(self, state, error=None):
+        if self.state in _FINAL:
+            return
+        self.state, self.error = state, error
+        self.finished_at = time.monotonic()
+        self._done.set()
+        if not self.future.done():
+            self.future.set_result(state)
+
+
+class ArmMotion:
+    """Streams waypoints for the newest target at a fixed rate."""
+
+    def __init__(self, driver=arm_driver, rate_hz=50.0, max_speed=0.25, max_accel=0.5,
+                 tolerance=1e-3, home=(0.0, 0.0, 0.0)):
+        self.driver = driver
+        self.rate_hz = rate_hz
+        self.max_speed = max_speed
+        self.max_accel = max_accel
+        self.tolerance = tolerance
+        self.position = np.array(home, dtype=float)   # last commanded pose
+        self.velocity = np.zeros(3)
+        self.stats = {"moves": 0, "superseded": 0, "waypoints": 0, "waypoints_dropped": 0}
+        self._handle = None       # current move
+        self._target = None
+        self._final = None        # ArmCommand of the last waypoint of the current move
+        self._failure = None      # error reported by a waypoint's ack
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def sync(self, config_data):
+        """Apply ``arm_rate_hz``, ``arm_max_speed``, ``arm_max_accel`` and
+        ``arm_tolerance``; ``arm_home`` is the pose assumed before the first move."""
+        typed = ConfigStore.wrap(config_data).typed
+        self.rate_hz = max(1.0, typed.arm_rate_hz)
+        self.max_speed = max(1e-6, typed.arm_max_speed)
+        self.max_accel = max(1e-6, typed.arm_max_accel)
+        self.tolerance = typed.arm_tolerance
+        if self._thread is None and "arm_home" in config_data:
+            home = [float(v) for v in str(config_data["arm_home"]).split(",")]
+            if len(home) == 3:
+                self.position = np.array(home)
+
+    # ---------------------------------------------------------------- public
+    def move_to(self, target):
+        """Start moving to ``target`` (x, y, z); returns its ``MotionHandle``."""
+        target = np.asarray(target, dtype=float).reshape(3)
+        with self._cond:
+            handle = MotionHandle(self, target)
+            previous, self._handle, self._target = self._handle, handle, target
+            self._final = self._failure = None
+            self.stats["moves"] += 1
+            if previous is not None and not previous.done:
+                self.stats["superseded"] += 1
+                previous._finish(SUPERSEDED)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="arm-motion", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return handle
+
+    def cancel(self):
+        """Cancel whatever move is running."""
+        with self._cond:
+            handle = self._handle
+        if handle is not None:
+            self._cancel(handle)
+
+    def wait_idle(self, timeout=None):
+        """Wait until no move is running, following any move that supersedes
+        the one waited on.  Returns the last move's handle (None if none was
+        running); it is not ``done`` when ``timeout`` ran out first."""
+        end = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while True:
+            with self._cond:
+                handle = self._handle
+            if handle is None:
+                return last
+            last = handle
+            if not handle._done.wait(None if end is None else max(0.0, end - time.monotonic())):
+                return handle
+
+    async def wait_idle_async(self, timeout=None):
+        """``wait_idle`` for coroutines (on the event loop, cancellable)."""
+        end = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while True:
+            with self._cond:
+                handle = self._handle
+            if handle is None:
+                return last
+            last = handle
+            await handle.wait_async(None if end is None else max(0.0, end - time.monotonic()))
+            if not handle.done:
+                return handle
+
+    def stop(self, timeout=1.0):
+        self.cancel()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def snapshot(self):
+        with self._cond:
+            handle = self._handle
+        return {"position": [round(float(v), 4) for v in self.position],
+                "speed": round(float(np.linalg.norm(self.velocity)), 4),
+                "state": handle.state if handle else None, **self.stats}
+
+    def _cancel(self, handle):
+        with self._cond:
+            if handle is not self._handle or handle.done:
+                return
+            handle._finish(CANCELLED)
+            # Brake along the current direction instead of stopping dead
+            speed = float(np.linalg.norm(self.velocity))
+            if speed > 0:
+                self._handle = MotionHandle(self, self.position + self.velocity * speed / (2 * self.max_accel))
+                self._target = self._handle.target
+            else:
+                self._handle = self._target = None
+            self._final = None
+            self._cond.notify_all()
+
+    # ---------------------------------------------------------------- worker
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            with self._cond:
+                while self._target is None and not self._stopping:
+                    self._cond.wait()
+                    next_tick = time.monotonic()
+                if self._stopping:
+                    return
+                handle, target, final = self._handle, self._target, self._final
+                failure, self._failure = self._failure, None
+
+            if failure is not None:
+                self._abort(handle, failure)
+                continue
+            if final is not None:  # last waypoint sent, waiting for its ack
+                if final.future.done():
+                    self._settle(handle, final)
+            else:
+                self._step(handle, target, 1.0 / self.rate_hz)
+
+            next_tick += 1.0 / self.rate_hz
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()  # fell behind, don't try to catch up
+
+    def _step(self, handle, target, dt):
+        """Advance the commanded pose one tick and send it as a waypoint."""
+        offset = target - self.position
+        distance = float(np.linalg.norm(offset))
+        speed = float(np.linalg.norm(self.velocity))
+        arrived = distance <= self.tolerance and speed <= self.max_accel * dt
+        if arrived:
+            self.position, self.velocity = target.copy(), np.zeros(3)
+        else:
+            # Fastest speed that can still brake to zero over the remaining distance
+            cruise = min(self.max_speed, (2 * self.max_accel * distance) ** 0.5)
+            desired = offset / distance * cruise if distance > 0 else np.zeros(3)
+            change = desired - self.velocity
+            limit = self.max_accel * dt
+            norm = float(np.linalg.norm(change))
+            if norm > limit:
+                change *= limit / norm
+            self.velocity = self.velocity + change
+            step = self.velocity * dt
+            if float(np.linalg.norm(step)) >= distance:  # would overshoot: land on it
+                self.position, self.velocity, arrived = target.copy(), np.zeros(3), True
+            else:
+                self.position = self.position + step
+
+        if handle is not None and handle.state == PENDING:
+            handle.state = MOVING
+        if not arrived and self.driver.pending() >= self.driver.window:
+            self.stats["waypoints_dropped"] += 1  # link busy: the next waypoint supersedes this one
+            return
+        try:
+            cmd = self.driver.send("MOVE " + ",".join(f"{v:.4f}" for v in self.position), timeout=0)
+        except ArmError:  # queue full; a final waypoint is simply retried next tick
+            if not arrived:
+                self.stats["waypoints_dropped"] += 1
+            return
+        self.stats["waypoints"] += 1
+        cmd.future.add_done_callback(functools.partial(self._waypoint_done, handle))
+        if arrived:
+            with self._cond:
+                if self._handle is handle:
+                    self._final = cmd
+
+    def _waypoint_done(self, handle, future):
+        error = future.exception()
+        if error is not None:
+            with self._cond:
+                # A late failure of a superseded move must not abort the current one
+                if handle is self._handle:
+                    self._failure = error
+
+    def _settle(self, handle, final):
+        with self._cond:
+            if handle is not self._handle:
+                return
+            self._handle = self._target = self._final = None
+        error = final.future.exception()
+        if handle is not None:
+            handle._finish(REACHED if error is None else FAILED, error)
+
+    def _abort(self, handle, error):
+        """A waypoint failed: the pose is no longer known to be in sync, stop."""
+        with self._cond:
+            if handle is self._handle:
+                self._handle = self._target = self._final = None
+        self.velocity = np.zeros(3)
+        if handle is not None:
+            handle._finish(FAILED, error)
+
+
+arm_motion = ArmMotion()
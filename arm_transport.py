@@ -0,0 +1,520 @@
+"""Ordered, acknowledged transport to the robot arm.
+
+One ``ArmDriver`` owns a persistent connection and a single worker thread.
+Commands go into a bounded FIFO and are written in order; up to
+``arm_window`` of them may be on the wire waiting for their acknowledgement
+(pipelining), each with its own ``arm_ack_timeout``.  A reader thread tied
+to the connection only splits incoming bytes into lines for the worker.
+
+Wire protocol, one ASCII line per message:
+    host -> arm   CLAW OPEN              (with arm_tagged: "#17 CLAW OPEN")
+    arm  -> host  OK [text] | ERR [text] (optionally prefixed "#17 ")
+An untagged ack completes the oldest command in flight (the arm executes in
+order); a tagged one completes its own command, so a lost ack cannot shift
+the others.  Any other line is printed as arm output.
+
+``arm_transport`` picks the connection:
+    log                       no arm: print commands, ack at once (default)
+    tcp:HOST:PORT             TCP socket (a network bridge or a simulator)
+    serial:/dev/ttyUSB0       serial port or pty, optional @baud, e.g.
+                              serial:/dev/ttyACM0@57600 or serial:COM3@115200
+Serial ports use pyserial when it is installed, otherwise termios (POSIX).
+"""
+import itertools, os, queue, re, select, socket, sys, threading, time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from config_store import ConfigStore
+from metrics import metrics
+
+try:
+    import serial  # pyserial, optional
+except ImportError:
+    serial = None
+
+READ_POLL_S = 0.2      # reader threads check for shutdown this often
+RECONNECT_S = 1.0      # at most one connection attempt per interval
+_ACK = re.compile(r"^(?:#(\d+)\s+)?(OK|ERR)\b\s*(.*)$", re.IGNORECASE)
+
+
+class ArmError(Exception):
+    """A command was not executed (no connection, closed driver, ...)."""
+
+
+class ArmQueueFull(ArmError):
+    pass
+
+
+class ArmTimeout(ArmError):
+    pass
+
+
+class ArmRejected(ArmError):
+    """The arm answered ERR."""
+
+
+class ArmCommand:
+    """One queued command; ``result()`` blocks until it was acknowledged."""
+
+    def __init__(self, cmd_id, text):
+        self.id = cmd_id
+        self.text = text
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.sent_at = None
+        self.acked_at = None
+        self.deadline = None
+
+    def result(self, timeout=None):
+        """The arm's ack text; raises ``ArmError`` subclasses on failure."""
+        return self.future.result(timeout)
+
+    @property
+    def latency_ms(self):
+        """Send -> ack time (None until acknowledged)."""
+        if self.acked_at is None or self.sent_at is None:
+            return None
+        return (self.acked_at - self.sent_at) * 1e3
+
+    @property
+    def queue_ms(self):
+        if self.sent_at is None:
+            return None
+        return (self.sent_at - self.queued_at) * 1e3
+
+    def _fail(self, error):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+# -----------------------------------------------------------------------------
+# Transports: open(), write(bytes), read() -> bytes (b"" after READ_POLL_S),
+# close().  read() raises ConnectionError once the other side is gone.
+# -----------------------------------------------------------------------------
+class LogTransport:
+    """No arm attached: print each command and acknowledge it at once."""
+
+    spec = "log"
+
+    def __init__(self):
+        self._acks = queue.SimpleQueue()
+
+    def open(self):
+        pass
+
+    def write(self, data):
+        for line in data.decode().splitlines():
+            print(f"[ARM] {line}", file=sys.stderr)
+            tag = line.split(" ", 1)[0] if line.startswith("#") else None
+            self._acks.put(f"{tag} OK\n" if tag else "OK\n")
+
+    def read(self):
+        try:
+            return self._acks.get(timeout=READ_POLL_S).encode()
+        except queue.Empty:
+            return b""
+
+    def close(self):
+        pass
+
+
+class SocketTransport:
+    def __init__(self, host, port, connect_timeout=3.0):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.sock = None
+        self.spec = f"tcp:{host}:{port}"
+
+    def open(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(READ_POLL_S)
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def read(self):
+        try:
+            data = self.sock.recv(4096)
+        except socket.timeout:
+            return b""
+        if not data:
+            raise ConnectionError("arm closed the connection")
+        return data
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+
+
+class SerialTransport:
+    def __init__(self, device, baud=115200):
+        self.device = device
+        self.baud = baud
+        self.port = None
+        self.fd = None
+        self.spec = f"serial:{device}@{baud}"
+
+    def open(self):
+        if serial is not None:
+            self.port = serial.Serial(self.device, self.baud, timeout=READ_POLL_S, write_timeout=2)
+            return
+        try:
+            import termios, tty
+        except ImportError:
+            raise ArmError("serial arms need pyserial on this platform (pip install pyserial)")
+        self.fd = os.open(self.device, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self.fd)
+        attrs = termios.tcgetattr(self.fd)
+        speed = getattr(termios, f"B{self.baud}", termios.B115200)
+        attrs[4] = attrs[5] = speed
+        termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+
+    def write(self, data):
+        if self.port is not None:
+            self.port.write(data)
+            return
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def read(self):
+        if self.port is not None:
+            return self.port.read(max(1, self.port.in_waiting))
+        ready, _, _ = select.select([self.fd], [], [], READ_POLL_S)
+        if not ready:
+            return b""
+        try:
+            data = os.read(self.fd, 4096)
+        except OSError as e:  # pty master gone (EIO) or device unplugged
+            raise ConnectionError(str(e))
+        if not data:
+            raise ConnectionError("serial device closed")
+        return data
+
+    def close(self):
+        if self.port is not None:
+            self.port.close()
+            self.port = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def open_transport(spec):
+    """Transport for an ``arm_transport`` spec (not yet connected)."""
+    kind, _, arg = (spec or "log").strip().partition(":")
+    kind = kind.strip().lower()
+    if kind in ("", "log"):
+        return LogTransport()
+    if kind == "tcp":
+        host, _, port = arg.rpartition(":")
+        return SocketTransport(host or "127.0.0.1", int(port))
+    if kind == "serial":
+        device, _, baud = arg.partition("@")
+        return SerialTransport(device.strip(), int(baud or 115200))
+    raise ValueError(f"Unknown arm transport {spec!r}; expected log, tcp:HOST:PORT or serial:DEVICE[@baud]")
+
+
+# -----------------------------------------------------------------------------
+# Driver
+# -----------------------------------------------------------------------------
+_LOST = object()  # reader -> worker: the connection dropped
+
+
+class ArmDriver:
+    """Bounded FIFO of arm commands, written in order by one worker thread."""
+
+    def __init__(self, transport=None, queue_size=32, window=4, ack_timeout=2.0, tagged=False):
+        self.transport = transport or LogTransport()
+        self.spec = self.transport.spec  # as configured (arm_transport)
+        self.queue_size = queue_size
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.tagged = tagged
+        self.stats = {"sent": 0, "acked": 0, "rejected": 0, "timeouts": 0, "failed": 0,
+                      "queue_full": 0, "reconnects": 0}
+        self.latencies = deque(maxlen=256)  # recent send -> ack times, ms
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._lines = deque()
+        self._inflight = OrderedDict()  # worker thread only
+        self._ids = itertools.count(1)
+        self._worker = None       # the one worker thread; cleared by the worker as it exits
+        self._stop = None         # its stop event
+        self._conn = None         # transport the worker is connected over
+        self._connected = False
+        self._generation = 0
+        self._retry_at = 0.0
+        self._last_error = None
+
+    def sync(self, config_data):
+        """Apply ``arm_transport``, ``arm_window``, ``arm_queue_size``,
+        ``arm_ack_timeout`` and ``arm_tagged``; a new transport reconnects."""
+        typed = ConfigStore.wrap(config_data).typed
+        self.window = max(1, typed.arm_window)
+        self.queue_size = max(1, typed.arm_queue_size)
+        self.ack_timeout = typed.arm_ack_timeout
+        self.tagged = typed.arm_tagged
+        spec = str(config_data.get("arm_transport") or "log").strip()
+        if spec != self.spec:
+            try:
+                transport = open_transport(spec)
+            except ValueError as e:
+                print(f"[ARM] {e}")
+                return
+            self.close()
+            self.transport, self.spec = transport, spec
+            self._retry_at, self._last_error = 0.0, None
+
+    # ---------------------------------------------------------------- public
+    def send(self, text, timeout=None):
+        """Queue ``text``; returns its ``ArmCommand`` without waiting for the ack.
+
+        Blocks up to ``timeout`` (default ``ack_timeout``) while the queue is
+        full, then raises ``ArmQueueFull``.
+        """
+        cmd = ArmCommand(next(self._ids), " ".join(text.split()))  # one line on the wire
+        end = time.monotonic() + (self.ack_timeout if timeout is None else timeout)
+        with self._cond:
+            while len(self._queue) >= self.queue_size:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    self.stats["queue_full"] += 1
+                    raise ArmQueueFull(f"arm queue full ({self.queue_size} commands waiting)")
+                self._cond.wait(remaining)
+            cmd.queued_at = time.monotonic()
+            self._queue.append(cmd)
+            if self._worker is None:
+                self._start_worker()
+            # else: a stopping worker starts its successor as it exits
+            self._cond.notify_all()
+        return cmd
+
+    def command(self, text):
+        """Send ``text`` and wait for its acknowledgement; returns the ArmCommand.
+
+        Every command ends in an ack, ERR, ack timeout or connection error, so
+        this does not block indefinitely.
+        """
+        cmd = self.send(text)
+        cmd.result()
+        return cmd
+
+    def close(self, timeout=2.0):
+        """Fail queued and unacknowledged commands and drop the connection.
+
+        The driver stays usable: the next ``send`` reconnects.  A worker
+        still busy (e.g. inside a slow connect) after ``timeout`` writes
+        nothing more and hands over to a new worker once it has exited.
+        """
+        with self._cond:
+            if self._stop is not None:
+                self._stop.set()
+            queued = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+            worker = self._worker
+        self._fail_all(queued, ArmError("arm driver stopped"))
+        if worker is not None:
+            worker.join(timeout)
+        self._retry_at = 0.0  # the reconnect backoff is for failed connects only
+
+    def pending(self):
+        """Commands queued or waiting for their ack."""
+        return len(self._queue) + len(self._inflight)
+
+    def snapshot(self):
+        recent = sorted(self.latencies)
+        return {"transport": self.transport.spec, "connected": self._connected,
+                "queued": len(self._queue), "in_flight": len(self._inflight),
+                "ack_p50_ms": round(recent[len(recent) // 2], 2) if recent else None,
+                "last_error": self._last_error, **self.stats}
+
+    # ---------------------------------------------------------------- worker
+    def _start_worker(self):
+        """Start a worker (lock held, no worker running)."""
+        self._stop = stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, args=(stop,), name="arm-driver", daemon=True)
+        self._worker.start()
+
+    def _run(self, stop):
+        try:
+            while True:
+                with self._cond:
+                    while not self._ready(stop):
+                        self._cond.wait(self._wait_time())
+                    if stop.is_set():
+                        break
+                    lines = list(self._lines)
+                    self._lines.clear()
+                    batch = []
+                    while self._queue and len(self._inflight) + len(batch) < self.window:
+                        batch.append(self._queue.popleft())
+                    if batch:
+                        self._cond.notify_all()  # room in the queue again
+                for line in lines:
+                    self._on_line(line)
+                self._expire()
+                if batch:
+                    self._write(batch, stop)
+        finally:
+            self._fail_all(list(self._inflight.values()), ArmError("arm driver stopped"))
+            self._inflight.clear()
+            self._disconnect()
+            with self._cond:
+                self._worker = None
+                self._lines.clear()
+                if self._queue:  # sent after close(): hand over to a new worker
+                    self._start_worker()
+
+    def _ready(self, stop):
+        if stop.is_set() or self._lines:
+            return True
+        if self._queue and len(self._inflight) < self.window:
+            return True
+        deadline = self._next_deadline()
+        return deadline is not None and deadline <= time.monotonic()
+
+    def _next_deadline(self):
+        return next(iter(self._inflight.values())).deadline if self._inflight else None
+
+    def _wait_time(self):
+        deadline = self._next_deadline()
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _write(self, batch, stop):
+        if not self._connected and not self._connect(stop):
+            error = "arm driver stopped" if stop.is_set() else f"arm not connected: {self._last_error}"
+            self._fail_all(batch, ArmError(error))
+            return
+        for i, cmd in enumerate(batch):
+            if stop.is_set():  # close() came in meanwhile: nothing more goes out
+                self._fail_all(batch[i:], ArmError("arm driver stopped"))
+                return
+            line = f"#{cmd.id} {cmd.text}\n" if self.tagged else f"{cmd.text}\n"
+            try:
+                self._conn.write(line.encode())
+            except (OSError, ArmError) as e:
+                self._last_error = str(e)
+                self._lost(ArmError(f"arm connection lost: {e}"), extra=batch[i:])
+                return
+            cmd.sent_at = time.monotonic()
+            cmd.deadline = cmd.sent_at + self.ack_timeout
+            self._inflight[cmd.id] = cmd
+            self.stats["sent"] += 1
+
+    def _on_line(self, line):
+        if line is _LOST:
+            self._lost(ArmError(f"arm connection lost: {self._last_error}"))
+            return
+        m = _ACK.match(line)
+        if not m:
+            print(f"[ARM] < {line}")
+            return
+        tag, status, text = m.groups()
+        if tag is not None:
+            cmd = self._inflight.pop(int(tag), None)
+        else:
+            cmd = self._inflight.popitem(last=False)[1] if self._inflight else None
+        if cmd is None:
+            return  # late ack of a command that already timed out
+        cmd.acked_at = time.monotonic()
+        if status.upper() == "OK":
+            self.stats["acked"] += 1
+            self.latencies.append(cmd.latency_ms)
+            metrics.observe("arm_ack", cmd.acked_at - cmd.sent_at)
+            cmd.future.set_result(text)
+        else:
+            self.stats["rejected"] += 1
+            cmd._fail(ArmRejected(text or "rejected"))
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._inflight:
+            cmd = next(iter(self._inflight.values()))
+            if cmd.deadline > now:
+                break
+            del self._inflight[cmd.id]
+            self.stats["timeouts"] += 1
+            cmd._fail(ArmTimeout(f"no ack for {cmd.text!r} within {self.ack_timeout:g}s"))
+
+    # ------------------------------------------------------------ connection
+    def _connect(self, stop):
+        now = time.monotonic()
+        if now < self._retry_at:
+            return False
+        self._retry_at = now + RECONNECT_S
+        transport = self.transport
+        try:
+            transport.open()
+        except (OSError, ArmError, ValueError) as e:
+            self._last_error = str(e)
+            return False
+        if stop.is_set():  # closed while connecting (the transport may have been swapped)
+            try:
+                transport.close()
+            except OSError:
+                pass
+            return False
+        self._conn = transport
+        if self._generation:
+            self.stats["reconnects"] += 1
+        self._generation += 1
+        self._connected = True
+        self._last_error = None
+        threading.Thread(target=self._read_loop, args=(transport, self._generation),
+                         name="arm-reader", daemon=True).start()
+        return True
+
+    def _read_loop(self, transport, generation):
+        buffer = b""
+        while self._connected and self._generation == generation:
+            try:
+                data = transport.read()
+            except (OSError, ArmError) as e:
+                if self._generation == generation:
+                    self._last_error = str(e)
+                    with self._cond:
+                        self._lines.append(_LOST)
+                        self._cond.notify_all()
+                return
+            if not data:
+                continue
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            lines = [l.decode(errors="replace").strip() for l in lines]
+            lines = [l for l in lines if l]
+            if lines:
+                with self._cond:
+                    self._lines.extend(lines)
+                    self._cond.notify_all()
+
+    def _lost(self, error, extra=()):
+        self._fail_all(list(self._inflight.values()) + list(extra), error)
+        self._inflight.clear()
+        self._disconnect()
+
+    def _disconnect(self):
+        if self._connected:
+            self._connected = False
+            self._generation += 1  # retire the reader
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def _fail_all(self, commands, error):
+        for cmd in commands:
+            self.stats["failed"] += 1
+            cmd._fail(error)
+
+
+arm_driver = ArmDriver()
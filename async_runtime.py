@@ -0,0 +1,84 @@
+"""Dedicated asyncio event-loop thread.
+
+The router, camera AIs and interface AI run their network I/O as coroutines
+on this one loop, so many prompts can be in flight without tying up a thread
+each.  Synchronous callers (Tk, scripts) hand coroutines over with ``submit``
+or ``run``.
+"""
+import asyncio
+import threading
+
+
+class EventLoopThread:
+    def __init__(self, name="waldo-async"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return self
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def in_loop_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Schedule a coroutine; returns a ``concurrent.futures.Future``.
+
+        Cancelling that future cancels the task on the loop.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine to completion from a non-loop thread and return its result."""
+        if self.in_loop_thread():
+            raise RuntimeError("EventLoopThread.run() called from its own loop; await instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def call_soon(self, fn, *args):
+        self.start()
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self, timeout=2.0):
+        with self._lock:
+            thread = self._thread
+            if not thread or not thread.is_alive():
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        thread.join(timeout)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_runtime():
+    """Process-wide event-loop thread, started on first use."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = EventLoopThread()
+        return _default.start()
@@ -0,0 +1,181 @@
+"""Periodic per-camera auto prompts (``autoprompt_N`` / ``autointerval_N``).
+
+Each enabled camera gets one coroutine on the router's event loop.  Every
+``autointerval_N`` seconds it looks at the camera's newest frame and asks the
+camera AI about it, with three guards so slow endpoints never build a queue:
+
+* change gating: the frame's dHash is compared with the one last prompted
+  on; a tick is skipped unless more than ``autoprompt_change_bits`` bits
+  differ (or ``autoprompt_max_skips`` ticks in a row were skipped),
+* per-endpoint limit: at most ``endpoint_concurrency`` auto prompts share
+  one endpoint at a time,
+* coalescing: a camera has at most one auto prompt in flight; ticks that
+  fall due meanwhile are merged into a single catch-up tick.
+
+Replies go to ``post``; unless ``interface_verbose`` is set, a reply is only
+posted when it differs from that camera's previous one.
+"""
+import asyncio
+import contextlib
+import functools
+import threading
+import time
+
+from async_runtime import get_runtime
+from camera_handler import camera_registry, is_error_reply
+from config_store import ConfigStore
+from response_cache import frame_hash, hash_distance, normalize_prompt
+
+DEFAULT_PROMPT = "Briefly describe anything notable in the scene right now."
+
+
+class _EndpointSlots:
+    """In-flight count for one endpoint; the limit is read at admission time."""
+
+    def __init__(self):
+        self.cond = asyncio.Condition()
+        self.active = 0
+        self.users = 0  # holders + waiters; the entry is dropped at zero
+
+
+class AutoPromptScheduler:
+    def __init__(self, frames, post, runtime=None):
+        self.frames = frames
+        self.post = post  # called from the loop thread with one status line
+        self.runtime = runtime or get_runtime()
+        self.config_data = ConfigStore()
+        self.stats = {"sent": 0, "unchanged": 0, "coalesced": 0, "errors": 0}
+        self._loops = {}       # cam_id -> (settings, concurrent future)
+        self._lock = threading.Lock()  # guards _loops (sync thread vs. loop thread)
+        self._limit = max(1, self.config_data.typed.endpoint_concurrency)
+        self._slots = {}  # endpoint -> _EndpointSlots; loop thread only
+        self._last_reply = {}
+
+    @staticmethod
+    def _settings(config_data, cam_id):
+        typed = config_data.typed
+        if not getattr(typed, f"autoprompt_{cam_id}"):
+            return None
+        interval = getattr(typed, f"autointerval_{cam_id}")
+        roles = (config_data.get(f"roles_{cam_id}") or "").strip()
+        prompt = f"Your role: {roles}. {DEFAULT_PROMPT}" if roles else DEFAULT_PROMPT
+        return max(1.0, interval), prompt
+
+    def sync(self, config_data):
+        """Start, restart or stop camera loops to match the config."""
+        self.config_data = config_data = ConfigStore.wrap(config_data)
+        camera_registry.sync(config_data)
+        limit = max(1, config_data.typed.endpoint_concurrency)
+        if limit != self._limit:
+            # Prompts already holding a slot finish; new ones are admitted
+            # only while fewer than the new limit are in flight.
+            self._limit = limit
+            self.runtime.submit(self._wake_waiters())
+        wanted = {cam_id: self._settings(config_data, cam_id)
+                  for cam_id in camera_registry.cameras()}
+        started = []
+        with self._lock:
+            stale = [self._loops.pop(cam_id)[1] for cam_id in list(self._loops)
+                     if wanted.get(cam_id) != self._loops[cam_id][0]]
+            for cam_id, settings in wanted.items():
+                if settings is not None and cam_id not in self._loops:
+                    future = self.runtime.submit(self._camera_loop(cam_id, *settings))
+                    self._loops[cam_id] = (settings, future)
+                    started.append((cam_id, future))
+        for future in stale:
+            future.cancel()
+        for cam_id, future in started:
+            future.add_done_callback(functools.partial(self._loop_done, cam_id))
+
+    def stop(self):
+        with self._lock:
+            loops, self._loops = self._loops, {}
+        for _, future in loops.values():
+            future.cancel()
+
+    def _loop_done(self, cam_id, future):
+        """Forget a loop that ended on its own so the next ``sync`` restarts it."""
+        with self._lock:
+            if self._loops.get(cam_id, (None, None))[1] is future:
+                del self._loops[cam_id]
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[Auto] camera {cam_id} loop stopped: {future.exception()!r}")
+
+    # ------------------------------------------------------------------ loop
+    @contextlib.asynccontextmanager
+    async def _endpoint_slot(self, endpoint):
+        """Hold one of ``endpoint_concurrency`` slots for ``endpoint``."""
+        slots = self._slots.get(endpoint)
+        if slots is None:
+            slots = self._slots[endpoint] = _EndpointSlots()
+        slots.users += 1
+        try:
+            async with slots.cond:
+                await slots.cond.wait_for(lambda: slots.active < self._limit)
+                slots.active += 1
+            try:
+                yield
+            finally:
+                async with slots.cond:
+                    slots.active -= 1
+                    slots.cond.notify_all()
+        finally:
+            slots.users -= 1
+            if not slots.users and self._slots.get(endpoint) is slots:
+                del self._slots[endpoint]
+
+    async def _wake_waiters(self):
+        """Let waiters re-check the limit after ``sync`` raised it."""
+        for slots in list(self._slots.values()):
+            async with slots.cond:
+                slots.cond.notify_all()
+
+    async def _camera_loop(self, cam_id, interval, prompt):
+        last_hash, skips = None, 0
+        next_tick = time.monotonic() + interval
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            cam_ai = camera_registry.cameras().get(cam_id)
+            if cam_ai is None:
+                return
+            async with self._endpoint_slot(cam_ai.endpoint):
+                view = self.frames.read(cam_id)
+                if view is not None:
+                    with view:
+                        fhash = await asyncio.to_thread(frame_hash, view.frame)
+                        changed = (last_hash is None
+                                   or hash_distance(fhash, last_hash)
+                                   > self.config_data.typed.autoprompt_change_bits)
+                        if changed or skips >= self.config_data.typed.autoprompt_max_skips:
+                            last_hash, skips = fhash, 0
+                            await self._ask(cam_id, cam_ai, prompt, view)
+                        else:
+                            skips += 1
+                            self.stats["unchanged"] += 1
+
+            # Ticks that fell due while we were busy collapse into one
+            next_tick += interval
+            now = time.monotonic()
+            if next_tick < now:
+                self.stats["coalesced"] += int((now - next_tick) // interval) + 1
+                next_tick = now
+
+    async def _ask(self, cam_id, cam_ai, prompt, view):
+        try:
+            reply = await asyncio.wait_for(
+                cam_ai.aquery(prompt, image=view.frame, seq=view.seq),
+                self.config_data.typed.autoprompt_timeout)
+        except asyncio.TimeoutError:
+            self.stats["errors"] += 1
+            return
+        if is_error_reply(reply):
+            self.stats["errors"] += 1
+            return
+        self.stats["sent"] += 1
+        if not reply:
+            return
+        key = normalize_prompt(reply)
+        if self.config_data.typed.interface_verbose or key != self._last_reply.get(cam_id):
+            name = self.config_data.get(f"camera_name_{cam_id}", f"camera {cam_id + 1}")
+            self.post(f"[Auto · {name}] {reply}")
+        self._last_reply[cam_id] = key
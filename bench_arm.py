@@ -0,0 +1,155 @@
+"""Arm transport benchmark against a local stand-in arm.
+
+``ArmStandIn`` pretends to be the arm on a TCP port or a pty: it executes
+commands one at a time (``exec_ms`` each), answers ``OK`` after a simulated
+link delay (``link_ms``) and records the order it received them in.  The
+bench pushes a burst of commands through ``ArmDriver`` for each ack window
+and reports ack latency, throughput, failures and whether the order held.
+
+    python bench_arm.py [--transport tcp|pty|both] [--commands 200] [--exec-ms 2]
+                        [--link-ms 5] [--windows 1,4,8] [--tagged] [--drop-every 0]
+"""
+import argparse, json, os, queue, socket, threading, time
+
+from arm_transport import ArmDriver, ArmError, SerialTransport, SocketTransport
+
+
+class ArmStandIn:
+    """Fake arm speaking the ``arm_transport`` line protocol."""
+
+    def __init__(self, mode="tcp", exec_ms=2.0, link_ms=5.0, drop_every=0):
+        self.mode = mode
+        self.exec_ms = exec_ms
+        self.link_ms = link_ms
+        self.drop_every = drop_every  # never ack every Nth command (0: ack all)
+        self.received = []
+        self._replies = queue.SimpleQueue()
+        self._stop = threading.Event()
+        if mode == "tcp":
+            self._server = socket.create_server(("127.0.0.1", 0))
+            self.spec = f"tcp:127.0.0.1:{self._server.getsockname()[1]}"
+        else:
+            self._master, slave = os.openpty()
+            self.device = os.ttyname(slave)
+            self._slave = slave  # keep the pty alive until the driver opens it
+            self.spec = f"serial:{self.device}"
+
+    def transport(self):
+        if self.mode == "tcp":
+            return SocketTransport("127.0.0.1", self._server.getsockname()[1])
+        return SerialTransport(self.device)
+
+    def start(self):
+        threading.Thread(target=self._serve, name="arm-standin", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._replies.put(None)
+        if self.mode == "tcp":
+            self._server.close()
+        else:
+            for fd in (self._master, self._slave):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def _serve(self):
+        if self.mode == "tcp":
+            conn, _ = self._server.accept()
+            read, write = (lambda: conn.recv(4096)), conn.sendall
+        else:
+            read, write = (lambda: os.read(self._master, 4096)), (lambda b: os.write(self._master, b))
+        threading.Thread(target=self._send_replies, args=(write,), daemon=True).start()
+        buffer = b""
+        while not self._stop.is_set():
+            try:
+                data = read()
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                self._execute(line.decode().strip())
+
+    def _execute(self, line):
+        if not line:
+            return
+        tag, text = (line.split(" ", 1) if line.startswith("#") else (None, line))
+        self.received.append(text)
+        time.sleep(self.exec_ms / 1000)
+        if self.drop_every and len(self.received) % self.drop_every == 0:
+            return
+        reply = f"{tag} OK\n" if tag else "OK\n"
+        self._replies.put((time.monotonic() + self.link_ms / 1000, reply.encode()))
+
+    def _send_replies(self, write):
+        while True:
+            item = self._replies.get()
+            if item is None:
+                return
+            due, reply = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                write(reply)
+            except OSError:
+                return
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))], 2)
+
+
+def run(mode, window, args):
+    arm = ArmStandIn(mode, args.exec_ms, args.link_ms, args.drop_every).start()
+    driver = ArmDriver(arm.transport(), queue_size=args.commands, window=window,
+                       ack_timeout=args.ack_timeout, tagged=args.tagged)
+    sent = [f"MOVE {i},{i % 7},{i % 11}" for i in range(args.commands)]
+    start = time.perf_counter()
+    commands = [driver.send(text) for text in sent]
+    failures = 0
+    for cmd in commands:
+        try:
+            cmd.result()
+        except ArmError:
+            failures += 1
+    elapsed = time.perf_counter() - start
+    latencies = [c.latency_ms for c in commands if c.latency_ms is not None]
+    stats = driver.snapshot()
+    driver.close()
+    arm.stop()
+    return {"bench": "arm", "transport": mode, "window": window, "tagged": args.tagged,
+            "commands": args.commands, "exec_ms": args.exec_ms, "link_ms": args.link_ms,
+            "ack_p50_ms": percentile(latencies, 50), "ack_p95_ms": percentile(latencies, 95),
+            "commands_per_s": round(args.commands / elapsed, 1), "failures": failures,
+            "timeouts": stats["timeouts"], "in_order": arm.received == sent}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transport", choices=("tcp", "pty", "both"), default="both")
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--exec-ms", type=float, default=2.0)
+    parser.add_argument("--link-ms", type=float, default=5.0)
+    parser.add_argument("--windows", default="1,4,8")
+    parser.add_argument("--ack-timeout", type=float, default=1.0)
+    parser.add_argument("--tagged", action="store_true")
+    parser.add_argument("--drop-every", type=int, default=0, help="stand-in never acks every Nth command")
+    args = parser.parse_args()
+
+    modes = ("tcp", "pty") if args.transport == "both" else (args.transport,)
+    for mode in modes:
+        for window in (int(w) for w in args.windows.split(",")):
+            print(json.dumps(run(mode, window, args)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Capture-path benchmark on synthetic or recorded sources.
+
+Runs N capture workers into a shared FrameStore for a few seconds and
+reports the achieved rate per camera, the age of the newest frame when a
+consumer reads it, and how long a read + dHash of that frame takes.  No
+camera hardware is needed, so numbers are comparable between machines.
+
+    python bench_capture.py [--cameras 4] [--source synthetic:1280x720@30] [--seconds 5] [--json]
+"""
+import argparse, json, time
+
+from camera_capture import CaptureManager
+from frame_sources import open_source
+from response_cache import frame_hash
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--source", default="synthetic:640x480@30+noise")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    capture = CaptureManager()
+    for cam_idx in range(args.cameras):
+        source = open_source(args.source, cam_idx)
+        if source is None:
+            raise SystemExit(f"could not open {args.source!r}")
+        capture.add(cam_idx, source, fps=source.fps or 30)
+
+    ages, reads = {c: [] for c in range(args.cameras)}, []
+    start = time.monotonic()
+    first_seq = {c: capture.frames.latest_seq(c) for c in range(args.cameras)}
+    while time.monotonic() - start < args.seconds:
+        for cam_idx in range(args.cameras):
+            t0 = time.perf_counter()
+            view = capture.frames.read(cam_idx)
+            if view is None:
+                continue
+            with view:
+                ages[cam_idx].append(time.monotonic() - view.timestamp)
+                frame_hash(view.frame)
+            reads.append(time.perf_counter() - t0)
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+    frames = {c: capture.frames.latest_seq(c) - first_seq[c] for c in range(args.cameras)}
+    capture.stop_all()
+
+    for cam_idx in range(args.cameras):
+        a = sorted(ages[cam_idx]) or [0.0]
+        row = {
+            "camera": cam_idx,
+            "source": args.source,
+            "fps": round(frames[cam_idx] / elapsed, 1),
+            "frame_age_p50_ms": round(a[len(a) // 2] * 1e3, 2),
+            "frame_age_p95_ms": round(a[int(len(a) * 0.95)] * 1e3, 2),
+        }
+        print(json.dumps(row) if args.json else
+              f"camera {cam_idx}: {row['fps']:6.1f} fps  frame age p50 {row['frame_age_p50_ms']:6.2f} ms"
+              f"  p95 {row['frame_age_p95_ms']:6.2f} ms")
+    reads.sort()
+    summary = {"read_hash_p50_ms": round(reads[len(reads) // 2] * 1e3, 3),
+               "read_hash_p95_ms": round(reads[int(len(reads) * 0.95)] * 1e3, 3)}
+    print(json.dumps(summary) if args.json else
+          f"read + dHash: p50 {summary['read_hash_p50_ms']} ms  p95 {summary['read_hash_p95_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""End-to-end benchmark: the headless service against a local stub model.
+
+Starts ``bench_stub_server`` and a ``WaldoService`` with four synthetic
+cameras, then drives every route (camera, triangulation, arm, general chat)
+with a fixed number of prompts at a fixed concurrency.  Also measures
+capture FPS, frame encode time and batch triangulation throughput, and dumps
+the per-stage timings the service recorded (``metrics``).  Every
+result is one JSON line tagged with the git commit, so runs of two commits
+can be diffed directly.
+
+    python bench_e2e.py [--requests 40] [--concurrency 8] [--latency-ms 200]
+                        [--jitter-ms 40] [--token-ms 10] [--error-rate 0]
+                        [--stream] [--out bench_results.jsonl]
+"""
+import argparse, json, os, subprocess, threading, time
+
+import numpy as np
+
+from bench_stub_server import StubServer, StubSettings
+from bench_triangulation import CALIBRATION, make_scene
+from frame_encoder import EncodeParams, encode_frame
+from intent_router import intent_router
+from metrics import metrics
+from my_interface_ai_handler import InterfaceAI
+from triangulation import projection_matrices, triangulate_batch
+from waldo_service import WaldoService
+
+ROUTE_PROMPTS = {
+    "camera": "what do you see on camera 1",
+    "triangulation": "triangulate the cube",
+    "arm": "open the claw",
+    "chat": "tell me a joke",
+}
+TARGET = np.array([0.2, 0.1, 3.0])  # where the stub "sees" the cube
+CAMERAS = 4
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1e3, 2)
+
+
+def stub_coords():
+    """Pixel position of TARGET in each bench camera, keyed by model name."""
+    coords = {}
+    for cam_id, P in projection_matrices(CALIBRATION).items():
+        u, v, w = P @ np.append(TARGET, 1.0)
+        coords[f"bench-cam-{cam_id}"] = f"{round(u / w)}, {round(v / w)}"
+    return coords
+
+
+def bench_config(endpoint):
+    cfg = {"interface_model": "bench-interface", "prompt_timeout": "30",
+           "supersede_prompts": False, "triangulation_min_views": "2", "metrics_enabled": True}
+    for c in range(CAMERAS):
+        cfg.update({f"source_{c}": "synthetic:640x480@30+noise", f"model_{c}": f"bench-cam-{c}",
+                    f"apikey_{c}": "bench", f"llava_endpoint_{c}": endpoint,
+                    f"camera_name_{c}": f"bench {c + 1}"})
+    return cfg
+
+
+def failed(route, answer):
+    """Whether a route's answer is an error rather than a result."""
+    answer = str(answer)
+    if "[Error" in answer or "] Error" in answer or "Error in interface AI" in answer:
+        return True
+    if route == "triangulation":
+        return "position vector" not in answer
+    if route == "arm":
+        return "did not" in answer or "not recognized" in answer
+    return False
+
+
+def run_route(service, route, prompt, requests, concurrency, stream):
+    """Fire ``requests`` prompts keeping ``concurrency`` in flight."""
+    slots = threading.BoundedSemaphore(concurrency)
+    lock = threading.Lock()
+    latencies, first_tokens, failures = [], [], [0]
+    all_done = threading.Event()
+    remaining = [requests]
+
+    def launch():
+        start = time.perf_counter()
+        first = []
+
+        def on_token(_delta):
+            if not first:
+                first.append(time.perf_counter() - start)
+
+        def done(future):
+            elapsed = time.perf_counter() - start
+            ok = not future.cancelled() and future.exception() is None
+            answer = future.result() if ok else ""
+            with lock:
+                latencies.append(elapsed)
+                if first:
+                    first_tokens.append(first[0])
+                if not ok or failed(route, answer):
+                    failures[0] += 1
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    all_done.set()
+            slots.release()
+
+        future = service.submit_prompt(prompt, on_token=on_token if stream else None)
+        future.add_done_callback(done)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        slots.acquire()
+        launch()
+    all_done.wait()
+    elapsed = time.perf_counter() - start
+    return {
+        "bench": "route", "route": route,
+        "intent": intent_router.route(prompt).intent,
+        "requests": requests, "concurrency": concurrency, "stream": stream,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "ttft_p50_ms": _ms(percentile(first_tokens, 50)),
+        "throughput_rps": round(requests / elapsed, 2),
+        "failures": failures[0],
+    }
+
+
+def bench_encode(service, repeat=30):
+    params = EncodeParams()
+    times = []
+    for cam_idx in service.camera_indices:
+        view = service.frames.read(cam_idx)
+        if view is None:
+            continue
+        with view:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                encode_frame(view.frame, params)
+                times.append(time.perf_counter() - t0)
+    return {"bench": "encode", "params": params._asdict(),
+            "p50_ms": _ms(percentile(times, 50)), "p95_ms": _ms(percentile(times, 95))}
+
+
+def bench_triangulation(points=10_000):
+    _, pixels, mask = make_scene(points, np.random.default_rng(0))
+    t0 = time.perf_counter()
+    triangulate_batch(CALIBRATION, pixels, mask)
+    elapsed = time.perf_counter() - t0
+    return {"bench": "triangulation", "points": points, "ms": _ms(elapsed),
+            "points_per_s": round(points / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--token-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true", help="stream camera / chat replies")
+    parser.add_argument("--routes", default=",".join(ROUTE_PROMPTS))
+    parser.add_argument("--out", help="also append the JSON lines to this file")
+    args = parser.parse_args()
+
+    stub = StubServer(StubSettings(args.latency_ms, args.jitter_ms, args.token_ms,
+                                   args.error_rate, coords=stub_coords())).start()
+    config = bench_config(stub.base_url)
+    interface_ai = InterfaceAI(api_key="bench", model=config["interface_model"], endpoint=stub.base_url)
+    service = WaldoService(config, interface_ai, CALIBRATION).start()
+
+    tag = {"commit": _commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "stub": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "token_ms": args.token_ms, "error_rate": args.error_rate}}
+    out = open(args.out, "a") if args.out else None
+
+    def emit(result):
+        line = json.dumps({**tag, **result})
+        print(line, flush=True)
+        if out:
+            out.write(line + "\n")
+
+    try:
+        time.sleep(0.5)  # first frames
+        seq0 = {c: service.frames.latest_seq(c) for c in service.camera_indices}
+        t0 = time.monotonic()
+        for route in args.routes.split(","):
+            emit(run_route(service, route, ROUTE_PROMPTS[route], args.requests,
+                           args.concurrency, args.stream))
+        elapsed = time.monotonic() - t0
+        emit({"bench": "capture", "seconds": round(elapsed, 1),
+              "fps": {str(c): round((service.frames.latest_seq(c) - seq0[c]) / elapsed, 1)
+                      for c in service.camera_indices}})
+        emit(bench_encode(service))
+        emit(bench_triangulation())
+        emit({"bench": "stages", "stages": metrics.snapshot()["stages"]})
+        emit({"bench": "stub", "requests": stub.settings.requests, "errors": stub.settings.errors})
+    finally:
+        if out:
+            out.close()
+        service.stop()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Micro-benchmark and labeled accuracy check for prompt routing.
+
+Compares the old linear ``any(word in prompt ...)`` chain against the
+compiled ``IntentRouter`` on a labeled prompt set, then shows how routing
+cost scales when the keyword dictionaries grow.
+
+    python bench_intent_router.py [--json]
+"""
+import json, random, string, sys, time
+
+from dictionary import CAMERA_KEYWORDS, TRIANGULATION_KEYWORDS, ARM_KEYWORDS
+from intent_router import IntentRouter, INTENT_KEYWORDS
+
+CAMERA_NAMES = {0: "front door", 1: "workbench"}
+
+# (prompt, expected intent or None for general chat, expected camera or None)
+LABELED_PROMPTS = [
+    ("what do you see", "camera", None),
+    ("What do you see on camera 2?", "camera", 1),
+    ("describe the scene at the front door", "camera", 0),
+    ("is anything moving on the workbench", "motion", 1),
+    ("can you see my keys", "camera", None),
+    ("look at camera 1 and tell me what's there", "camera", 0),
+    ("count objects on the table", "camera", None),
+    ("identify the person in view", "camera", None),
+    ("scan the room", "camera", None),
+    ("show me the live feed", "camera", None),
+    ("what is happening right now", "camera", None),
+    ("find my phone", "camera", None),
+    ("spot the red ball", "camera", None),
+    ("any people visible on the workbench camera?", "camera", 1),
+    ("recognize the logo", "camera", None),
+    ("where is the red cup", "triangulation", None),
+    ("locate the screwdriver", "triangulation", None),
+    ("triangulate the ball", "triangulation", None),
+    ("what is the 3d position of the bottle", "triangulation", None),
+    ("how far is the box from the robot", "triangulation", None),
+    ("estimate distance to the mug", "triangulation", None),
+    ("get position of the marker", "triangulation", None),
+    ("measure the distance between the two cups", "triangulation", None),
+    ("give me world coordinates of the pen", "triangulation", None),
+    ("any movement at the front door?", "motion", 0),
+    ("what is moving", "motion", None),
+    ("has anything moved in the last minute", "motion", None),
+    ("move to 0.1 0.2 0.3", "arm", None),
+    ("open the claw", "arm", None),
+    ("close the gripper", "arm", None),
+    ("stop the arm", "arm", None),
+    ("pick up the cup", "arm", None),
+    ("grab the bottle", "arm", None),
+    ("rotate wrist 90 degrees", "arm", None),
+    ("move the arm to the left", "arm", None),
+    ("put down the block", "arm", None),
+    ("reach for the screwdriver", "arm", None),
+    ("lift the box", "arm", None),
+    ("drop it", "arm", None),
+    ("hello there", None, None),
+    ("tell me a joke", None, None),
+    ("what's your name", None, None),
+    ("thanks, that was helpful", None, None),
+    ("how are you today", None, None),
+    ("what can you do", None, None),
+    ("that was a scandal", None, None),
+    ("summarize our conversation", None, None),
+]
+
+
+def legacy_route(prompt):
+    """The original if/elif substring chain from process_prompt."""
+    prompt_lc = prompt.lower()
+    cam_id = None
+    for idx, name in CAMERA_NAMES.items():
+        if f"camera {idx+1}" in prompt_lc or name.lower() in prompt_lc:
+            cam_id = idx
+            break
+    if any(word in prompt_lc for word in CAMERA_KEYWORDS):
+        return "camera", cam_id
+    if any(word in prompt_lc for word in TRIANGULATION_KEYWORDS):
+        return "triangulation", cam_id
+    if any(word in prompt_lc for word in ARM_KEYWORDS):
+        return "arm", cam_id
+    return None, cam_id
+
+
+def _time_per_prompt(fn, prompts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for p in prompts:
+            fn(p)
+    return (time.perf_counter() - start) / (repeat * len(prompts)) * 1e6  # µs
+
+
+def _accuracy(fn):
+    intent_ok = camera_ok = 0
+    misses = []
+    for prompt, intent, camera in LABELED_PROMPTS:
+        got_intent, got_camera = fn(prompt)
+        intent_ok += got_intent == intent
+        camera_ok += camera is None or got_camera == camera
+        if got_intent != intent:
+            misses.append((prompt, intent, got_intent))
+    n = len(LABELED_PROMPTS)
+    return intent_ok / n, camera_ok / n, misses
+
+
+def _random_words(rng, n):
+    return [" ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+                     for _ in range(rng.randint(1, 3))) for _ in range(n)]
+
+
+def main():
+    as_json = "--json" in sys.argv
+    router = IntentRouter()
+    router.route("", CAMERA_NAMES)
+
+    def compiled(prompt):
+        m = router.route(prompt, CAMERA_NAMES)
+        return m.intent, m.camera
+
+    prompts = [p for p, _, _ in LABELED_PROMPTS]
+    results = {"prompts": len(prompts)}
+    for name, fn in (("legacy", legacy_route), ("compiled", compiled)):
+        intent_acc, camera_acc, misses = _accuracy(fn)
+        results[name] = {
+            "us_per_prompt": round(_time_per_prompt(fn, prompts, 200), 2),
+            "intent_accuracy": round(intent_acc, 3),
+            "camera_accuracy": round(camera_acc, 3),
+            "misses": misses,
+        }
+
+    # Scaling: pad every intent with random filler keywords
+    rng = random.Random(0)
+    scaling = []
+    for factor in (1, 10, 100):
+        grown = {intent: list(kws) + _random_words(rng, len(kws) * (factor - 1))
+                 for intent, kws in INTENT_KEYWORDS.items()}
+        big = IntentRouter(grown)
+        big.route("", CAMERA_NAMES)  # build the camera-aware automaton outside the timing
+        keywords = sum(len(k) for k in grown.values())
+
+        def legacy_big(prompt, grown=grown):
+            prompt_lc = prompt.lower()
+            for kws in grown.values():
+                if any(word in prompt_lc for word in kws):
+                    return
+        scaling.append({
+            "keywords": keywords,
+            "legacy_us": round(_time_per_prompt(legacy_big, prompts, 20), 2),
+            "compiled_us": round(_time_per_prompt(lambda p: big.route(p, CAMERA_NAMES), prompts, 20), 2),
+        })
+    results["scaling"] = scaling
+
+    if as_json:
+        print(json.dumps(results))
+        return
+    for name in ("legacy", "compiled"):
+        r = results[name]
+        print(f"{name:9s} {r['us_per_prompt']:8.2f} µs/prompt  intent acc {r['intent_accuracy']:.1%}"
+              f"  camera acc {r['camera_accuracy']:.1%}")
+        for prompt, want, got in r["misses"]:
+            print(f"    miss: {prompt!r}: expected {want}, got {got}")
+    print("\nkeywords   legacy µs   compiled µs")
+    for row in scaling:
+        print(f"{row['keywords']:8d} {row['legacy_us']:11.2f} {row['compiled_us']:13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Local OpenAI-compatible stub for benchmarks and offline runs.
+
+Serves ``POST /v1/chat/completions`` (plain and ``stream=True``) with a
+configurable response latency, jitter, per-token streaming delay and error
+rate, so the camera, interface and router paths can be timed without a
+remote model.  Replies are canned:
+
+* a prompt asking for "pixel coordinates" gets ``coords[model]`` (or the
+  image centre), so triangulation has something consistent to work with,
+* anything else gets ``reply`` (default: a short scene description).
+
+    python bench_stub_server.py [--port 8900] [--latency-ms 300] [--jitter-ms 50]
+                                [--token-ms 15] [--error-rate 0.0]
+"""
+import argparse, itertools, json, random, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "I can see a small white cube on a gray table near the centre of the view."
+
+
+class StubSettings:
+    def __init__(self, latency_ms=300.0, jitter_ms=50.0, token_ms=15.0, error_rate=0.0,
+                 reply=DEFAULT_REPLY, coords=None, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_ms = token_ms
+        self.error_rate = error_rate
+        self.reply = reply
+        self.coords = coords or {}  # model -> "x, y"
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def delay(self):
+        with self.lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            failed = self.rng.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+
+def _last_user_text(messages):
+    for msg in reversed(messages or []):
+        if msg.get("role") != "user":
+            continue
+        content = msg.get("content")
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        return str(content or "")
+    return ""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real endpoint
+    _ids = itertools.count()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        settings = self.server.settings
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._json(400, {"error": {"message": "invalid JSON"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+
+        time.sleep(settings.delay())
+        if settings.should_fail():
+            return self._json(500, {"error": {"message": "stub: injected failure", "type": "server_error"}})
+
+        model = request.get("model", "stub")
+        prompt = _last_user_text(request.get("messages"))
+        if "pixel coordinates" in prompt.lower():
+            text = settings.coords.get(model, "320, 240")
+        else:
+            text = settings.reply
+        rid = f"chatcmpl-stub-{next(self._ids)}"
+        created = int(time.time())
+
+        if not request.get("stream"):
+            return self._json(200, {
+                "id": rid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split()),
+                          "total_tokens": len(prompt.split()) + len(text.split())},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            delta = word if i == len(words) - 1 else word + " "
+            chunk = {"id": rid, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            if settings.token_ms:
+                time.sleep(settings.token_ms / 1000.0)
+        done = {"id": rid, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.settings = settings or StubSettings()
+
+    def handle_error(self, request, client_address):
+        # Clients cancelling slow requests (e.g. triangulation stragglers) are expected
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="stub-llm", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--token-ms", type=float, default=15)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubServer(StubSettings(args.latency_ms, args.jitter_ms, args.token_ms, args.error_rate),
+                        args.host, args.port)
+    print(f"[Stub] OpenAI-compatible endpoint on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Throughput benchmark for batched triangulation.
+
+Projects random world points into a four-camera rig, hides ~25% of the
+views, then times ``triangulate_batch`` from 1 to 10^5 points against a
+loop of single-point ``triangulate_3d_position`` calls.
+
+    python bench_triangulation.py [--json]
+"""
+import json, sys, time
+
+import numpy as np
+
+from triangulation import projection_matrices, triangulate_3d_position, triangulate_batch
+
+CALIBRATION = {
+    0: {"pos": [0.0, 0.0, 0.0]},
+    1: {"pos": [0.5, 0.0, 0.0]},
+    2: {"pos": [0.0, 0.5, 0.0], "focal_length": 800},
+    3: {"pos": [0.5, 0.5, 0.0], "rvec": [0.0, -0.1, 0.0]},
+}
+SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+LOOP_LIMIT = 1_000  # the per-point loop gets slow; only time it up to here
+
+
+def make_scene(n, rng):
+    world = rng.uniform([-1, -1, 2], [1, 1, 5], (n, 3))
+    mats = projection_matrices(CALIBRATION)
+    homog = np.hstack([world, np.ones((n, 1))])
+    pixels = np.stack([(lambda p: p[:, :2] / p[:, 2:])(homog @ mats[c].T) for c in sorted(CALIBRATION)], axis=1)
+    pixels += rng.normal(0, 0.5, pixels.shape)
+    mask = rng.random((n, len(CALIBRATION))) > 0.25
+    return world, pixels, mask
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    as_json = "--json" in sys.argv
+    rng = np.random.default_rng(0)
+    rows = []
+    for n in SIZES:
+        world, pixels, mask = make_scene(n, rng)
+        batch_s = _best_of(lambda: triangulate_batch(CALIBRATION, pixels, mask), 5 if n < 10_000 else 2)
+        positions, _ = triangulate_batch(CALIBRATION, pixels, mask)
+        ok = np.isfinite(positions).all(axis=1)
+        row = {
+            "points": n,
+            "batch_ms": round(batch_s * 1e3, 3),
+            "batch_points_per_s": round(n / batch_s),
+            "solved": int(ok.sum()),
+            "median_error_m": round(float(np.median(np.linalg.norm(positions[ok] - world[ok], axis=1))), 4),
+        }
+        if n <= LOOP_LIMIT:
+            views = [{c: tuple(pixels[i, c]) if mask[i, c] else None for c in range(pixels.shape[1])}
+                     for i in range(n)]
+            loop_s = _best_of(lambda: [triangulate_3d_position(CALIBRATION, v) for v in views], 2)
+            row["loop_ms"] = round(loop_s * 1e3, 3)
+            row["speedup"] = round(loop_s / batch_s, 1)
+        rows.append(row)
+        if as_json:
+            print(json.dumps(row))
+
+    if as_json:
+        return
+    print(f"{'points':>8} {'batch ms':>10} {'points/s':>12} {'loop ms':>10} {'speedup':>8} {'median err m':>13}")
+    for r in rows:
+        print(f"{r['points']:8d} {r['batch_ms']:10.3f} {r['batch_points_per_s']:12d} "
+              f"{r.get('loop_ms', float('nan')):10.3f} {r.get('speedup', float('nan')):8.1f} "
+              f"{r['median_error_m']:13.4f}")
+
+
+if __name__ == "__main__":
+    main()
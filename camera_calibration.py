@@ -1,3 +1,9 @@
+"""Per-camera calibration: position (m), focal length and principal point (px).
+
+Optional keys: "fx"/"fy", a full 3x3 "K", and a world->camera rotation as
+"R" (3x3) or "rvec" (Rodrigues).  Cameras default to looking down +Z.
+After editing it at runtime call ``triangulation.calibration_changed()``.
+"""
 camera_calibration = {
     0: {
         "pos": [0.0, 0.0, 0.0],  # meters (origin)
@@ -12,3 +18,7 @@ camera_calibration = {
         "cy": 240
     }
 }
+
+# Projection matrices are built once here and reused by every triangulation
+from triangulation import projection_matrices
+projection_matrices(camera_calibration)
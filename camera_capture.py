@@ -0,0 +1,102 @@
+"""Per-camera capture workers.
+
+Every camera gets its own thread that reads at the camera's configured FPS
+straight into the preallocated buffers of a shared ``FrameStore``.  Consumers
+(preview grid, router) only ever look at the newest completed frame, so a slow
+or stalled device no longer holds back the other feeds or the Tk event loop.
+"""
+import threading, time
+
+from frame_store import FrameStore
+from metrics import metrics
+
+
+class CameraWorker(threading.Thread):
+    """Reads one capture device in a loop, paced to its own FPS."""
+
+    def __init__(self, cam_idx, cap, frames, fps=30):
+        super().__init__(name=f"capture-{cam_idx}", daemon=True)
+        self.cam_idx = cam_idx
+        self.cap = cap
+        self.frames = frames
+        self.fps = fps
+        self.measured_fps = 0.0  # frames actually published, over the last second
+        self._stop_evt = threading.Event()
+
+    @property
+    def fps(self):
+        return self._fps
+
+    @fps.setter
+    def fps(self, value):
+        self._fps = max(1, int(value))
+        self._period = 1.0 / self._fps
+
+    def run(self):
+        next_tick = time.monotonic()
+        window_start, window_frames = next_tick, 0
+        while not self._stop_evt.is_set():
+            slot = self.frames.acquire_write(self.cam_idx)
+            # Decodes in place once the slot buffer matches the stream format
+            with metrics.timer("capture", cam=self.cam_idx):
+                ret, frame = self.cap.read(slot.buffer) if slot.buffer is not None else self.cap.read()
+            if ret:
+                self.frames.publish(self.cam_idx, slot, frame, time.monotonic())
+                window_frames += 1
+                now = time.monotonic()
+                if now - window_start >= 1.0:
+                    self.measured_fps = window_frames / (now - window_start)
+                    metrics.gauge("capture_fps", round(self.measured_fps, 2), cam=self.cam_idx)
+                    window_start, window_frames = now, 0
+            else:
+                self.frames.abandon(self.cam_idx, slot)
+                # Device hiccup – back off a little instead of spinning
+                self._stop_evt.wait(0.05)
+                next_tick = time.monotonic()
+                continue
+
+            next_tick += self._period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop_evt.wait(delay)
+            else:
+                next_tick = time.monotonic()  # fell behind, don't try to catch up
+
+    def stop(self):
+        self._stop_evt.set()
+
+
+class CaptureManager:
+    """Owns the capture workers, their devices and the shared frame store."""
+
+    def __init__(self, frames=None):
+        self.frames = frames if frames is not None else FrameStore()
+        self.workers = {}
+
+    def add(self, cam_idx, cap, fps=30):
+        worker = CameraWorker(cam_idx, cap, self.frames, fps)
+        self.workers[cam_idx] = worker
+        worker.start()
+        return worker
+
+    def set_fps(self, cam_idx, fps):
+        worker = self.workers.get(cam_idx)
+        if worker:
+            worker.fps = fps
+
+    def stop_all(self, timeout=1.0, release=True):
+        """Stop every worker.  With ``release=False`` the devices stay open and
+        are returned as ``{cam_idx: cap}`` for the next ``add``."""
+        for worker in self.workers.values():
+            worker.stop()
+        kept = {}
+        for worker in self.workers.values():
+            worker.join(timeout)
+            if worker.cap:
+                if release or worker.is_alive():
+                    worker.cap.release()
+                else:
+                    kept[worker.cam_idx] = worker.cap
+            self.frames.drop(worker.cam_idx)
+        self.workers.clear()
+        return kept
@@ -1,54 +1,228 @@
-import cv2
-import base64
-from openai import OpenAI
+import asyncio
+import re
+import threading
+import time
+
+from openai import NOT_GIVEN
+
+from ai_client_pool import get_client, get_async_client
+from config_store import ConfigStore
+from frame_encoder import EncodeParams, encode_cache, encode_params_from_config
+from metrics import metrics
+from response_cache import response_cache, frame_hash
+
+def _sdk_timeout(timeout):
+    """No ``timeout``: leave the client's default (an explicit None disables it)."""
+    return NOT_GIVEN if timeout is None else timeout
+
+
+_ERROR_REPLY = re.compile(r"\[Camera \d+\] Error: ")
+
+
+def is_error_reply(reply):
+    """True for the ``[Camera N] Error: ...`` text a failed request answers with."""
+    return bool(reply) and _ERROR_REPLY.match(reply) is not None
+
 
 class CameraAI:
-    def __init__(self, cam_id, model, api_key, endpoint):
+    def __init__(self, cam_id, model, api_key, endpoint, encode_params=None):
         self.cam_id = cam_id
         self.model = model
         self.api_key = api_key
         self.endpoint = endpoint
-        self.client = OpenAI(api_key=api_key, base_url=endpoint)
+        self.encode_params = encode_params or EncodeParams()
+        self.use_response_cache = False  # opt-in per camera (response_cache_N)
+        self.client = get_client(endpoint, api_key)  # shared per endpoint / key
+
+    def query(self, prompt, image=None, timeout=None, seq=None):
+        """Ask about a frame.  Pass the frame's ``seq`` to reuse a cached encode."""
+        frame = image
+        if frame is None:
+            return f"[Camera {self.cam_id}] No image available."
 
-    def query(self, prompt, image=None):
+        fhash, cached = self._cache_lookup(prompt, frame)
+        if cached is not None:
+            return cached
+
+        try:
+            messages = self._messages(prompt, frame, seq)
+            with metrics.timer("camera_request", cam=self.cam_id), metrics.inflight("camera_requests_in_flight"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=300,
+                    timeout=_sdk_timeout(timeout),
+                )
+        except Exception as e:
+            return f"[Camera {self.cam_id}] Error: {e}"
+        answer = response.choices[0].message.content
+        if fhash is not None and answer:
+            response_cache.store(self.cam_id, prompt, fhash, answer)
+        return answer
+
+    # Async variants (run on the router's event loop) ------------------
+    @property
+    def aclient(self):
+        return get_async_client(self.endpoint, self.api_key)
+
+    async def aquery(self, prompt, image=None, timeout=None, seq=None):
+        """Coroutine version of ``query``; hashing and encoding run off the loop."""
         frame = image
         if frame is None:
             return f"[Camera {self.cam_id}] No image available."
-        _, buffer = cv2.imencode('.jpg', frame)
-        img_b64 = base64.b64encode(buffer).decode()
 
-        messages = [
+        fhash, cached = await asyncio.to_thread(self._cache_lookup, prompt, frame)
+        if cached is not None:
+            return cached
+        messages = await asyncio.to_thread(self._messages, prompt, frame, seq)
+
+        try:
+            with metrics.timer("camera_request", cam=self.cam_id), metrics.inflight("camera_requests_in_flight"):
+                response = await self.aclient.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=300,
+                    timeout=_sdk_timeout(timeout),
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return f"[Camera {self.cam_id}] Error: {e}"
+        answer = response.choices[0].message.content
+        if fhash is not None and answer:
+            response_cache.store(self.cam_id, prompt, fhash, answer)
+        return answer
+
+    async def aquery_stream(self, prompt, image=None, timeout=None, seq=None):
+        """Like ``aquery`` but yields the answer as text deltas while they arrive."""
+        frame = image
+        if frame is None:
+            yield f"[Camera {self.cam_id}] No image available."
+            return
+
+        fhash, cached = await asyncio.to_thread(self._cache_lookup, prompt, frame)
+        if cached is not None:
+            yield cached
+            return
+        messages = await asyncio.to_thread(self._messages, prompt, frame, seq)
+
+        parts = []
+        try:
+            with metrics.timer("camera_request", cam=self.cam_id) as timer, \
+                    metrics.inflight("camera_requests_in_flight"):
+                stream = await self.aclient.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=300,
+                    timeout=_sdk_timeout(timeout),
+                    stream=True,
+                )
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if not parts:
+                            self._first_token(timer)
+                        parts.append(delta)
+                        yield delta
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield f"[Camera {self.cam_id}] Error: {e}"
+            return
+        if fhash is not None and parts:
+            response_cache.store(self.cam_id, prompt, fhash, "".join(parts))
+
+    # ------------------------------------------------------------------
+    def _first_token(self, timer):
+        """Record time to first token of a streamed reply (no-op timers have no start)."""
+        start = getattr(timer, "start", None)
+        if start is not None:
+            metrics.observe("camera_first_token", time.perf_counter() - start, cam=self.cam_id)
+
+    def _cache_lookup(self, prompt, frame):
+        if not self.use_response_cache:
+            return None, None
+        fhash = frame_hash(frame)
+        return fhash, response_cache.lookup(self.cam_id, prompt, fhash)
+
+    def _messages(self, prompt, frame, seq):
+        mime, img_b64 = encode_cache.get_or_encode(self.cam_id, seq, frame, self.encode_params)
+        return [
             {
                 "role": "user",
                 "content": [
                     {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}}
+                    {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{img_b64}"}}
                 ]
             }
         ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=300,
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"[Camera {self.cam_id}] Error: {e}"
+class CameraAIRegistry:
+    """Keeps one CameraAI per camera across prompts.
 
-def get_active_camera_ais(config_data):
-    # Build for as many cameras as you want
-    camera_ais = {}
-    # Example for 4 cameras (indices 0,1,2,3)
-    for cam_id in range(4):
+    Each entry is keyed by its (endpoint, api key, model) signature and is
+    only rebuilt when that signature changes, so unchanged cameras keep their
+    client and its warm connection pool.
+    """
+
+    def __init__(self, max_cameras=4):
+        self.max_cameras = max_cameras
+        self._entries = {}  # cam_id -> (signature, CameraAI)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(config_data, cam_id):
+        keys = (f"llava_endpoint_{cam_id}", f"apikey_{cam_id}", f"model_{cam_id}")
         # Only build if a config exists for this cam_id
-        if f"model_{cam_id}" in config_data and f"apikey_{cam_id}" in config_data and f"llava_endpoint_{cam_id}" in config_data:
-            ai = CameraAI(
-                cam_id=cam_id,
-                model=config_data.get(f"model_{cam_id}"),
-                api_key=config_data.get(f"apikey_{cam_id}"),
-                endpoint=config_data.get(f"llava_endpoint_{cam_id}")
-            )
-            camera_ais[cam_id] = ai
-    return camera_ais
+        if not all(k in config_data for k in keys):
+            return None
+        return tuple(config_data.get(k) for k in keys)
+
+    def sync(self, config_data):
+        """Bring the registry in line with the config; returns the changed cam ids."""
+        changed = []
+        with self._lock:
+            for cam_id in range(self.max_cameras):
+                sig = self._signature(config_data, cam_id)
+                entry = self._entries.get(cam_id)
+                if (entry[0] if entry else None) == sig:
+                    if entry:  # encode / cache settings are cheap to refresh in place
+                        self._apply_settings(entry[1], config_data)
+                    continue
+                changed.append(cam_id)
+                if sig is None:
+                    self._entries.pop(cam_id, None)
+                    continue
+                endpoint, api_key, model = sig
+                ai = CameraAI(cam_id=cam_id, model=model, api_key=api_key, endpoint=endpoint)
+                self._apply_settings(ai, config_data)
+                self._entries[cam_id] = (sig, ai)
+            response_cache.ttl = ConfigStore.wrap(config_data).typed.response_cache_ttl
+        return changed
+
+    @staticmethod
+    def _apply_settings(ai, config_data):
+        ai.encode_params = encode_params_from_config(config_data, ai.cam_id)
+        enabled = getattr(ConfigStore.wrap(config_data).typed, f"response_cache_{ai.cam_id}")
+        if ai.use_response_cache and not enabled:
+            response_cache.clear(ai.cam_id)
+        ai.use_response_cache = enabled
+
+    def invalidate(self, cam_ids=None):
+        """Forget the given cameras (or all) so the next sync rebuilds them."""
+        with self._lock:
+            for cam_id in (list(self._entries) if cam_ids is None else cam_ids):
+                self._entries.pop(cam_id, None)
+
+    def cameras(self):
+        with self._lock:
+            return {cam_id: ai for cam_id, (_, ai) in self._entries.items()}
+
+
+camera_registry = CameraAIRegistry()
+
+
+def get_active_camera_ais(config_data):
+    """Return {cam_id: CameraAI} for configured cameras, reusing pooled clients."""
+    camera_registry.sync(config_data)
+    return camera_registry.cameras()
@@ -0,0 +1,99 @@
+"""Preview rendering for the camera grid.
+
+The expensive full-resolution path (cvtColor -> PIL resize -> new PhotoImage
+per tick) is replaced by: cv2.resize straight from the pinned frame into a
+reused buffer, colour conversion at preview size, and ``PhotoImage.paste``
+into one image per label.  Frames whose sequence number has not changed are
+not redrawn at all, and ``PreviewGovernor`` backs off FPS / resolution when
+the Tk loop cannot keep up.
+"""
+import time
+
+import cv2
+from PIL import Image, ImageTk
+
+
+class PreviewRenderer:
+    """Draws one camera's frames into one Tk label."""
+
+    def __init__(self, label, size=(480, 320)):
+        self.label = label
+        self.base_size = size
+        self.scale = 1.0
+        self.last_seq = 0
+        self._photo = None
+        self._small = None
+        self._rgb = None
+        # Render cost bookkeeping (milliseconds)
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+
+    def _ensure_buffers(self, w, h):
+        if self._photo is None or self._photo.width() != w or self._photo.height() != h:
+            self._photo = ImageTk.PhotoImage("RGB", (w, h))
+            self.label.configure(image=self._photo)
+            self.label.imgtk = self._photo  # keep a reference
+            self._small = None
+            self._rgb = None
+
+    def render(self, frames, cam_idx):
+        """Draw the newest frame if it is new.  Returns True when something was drawn."""
+        seq = frames.latest_seq(cam_idx)
+        if seq == self.last_seq:
+            self.frames_skipped += 1
+            return False
+        view = frames.read(cam_idx)
+        if view is None:
+            return False
+
+        t0 = time.perf_counter()
+        w = max(16, int(self.base_size[0] * self.scale))
+        h = max(16, int(self.base_size[1] * self.scale))
+        self._ensure_buffers(w, h)
+        with view:
+            self._small = cv2.resize(view.frame, (w, h), dst=self._small,
+                                     interpolation=cv2.INTER_AREA)
+            self.last_seq = view.seq
+        self._rgb = cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        self._photo.paste(Image.fromarray(self._rgb))
+
+        self.last_ms = (time.perf_counter() - t0) * 1000.0
+        self.avg_ms = self.last_ms if self.frames_rendered == 0 else 0.9 * self.avg_ms + 0.1 * self.last_ms
+        self.frames_rendered += 1
+        return True
+
+
+class PreviewGovernor:
+    """Adapts preview delay and scale to how busy the Tk loop is.
+
+    ``update`` is fed the wall-clock cost of each preview tick and how late
+    the tick fired.  When the loop falls behind, preview FPS is lowered first,
+    then resolution; both recover once there is headroom again.
+    """
+
+    def __init__(self, target_delay_ms, max_delay_ms=500, min_scale=0.5):
+        self.target_delay_ms = target_delay_ms
+        self.max_delay_ms = max(max_delay_ms, target_delay_ms)
+        self.min_scale = min_scale
+        self.delay_ms = target_delay_ms
+        self.scale = 1.0
+        self._cost = 0.0
+        self._lag = 0.0
+
+    def update(self, tick_ms, lag_ms):
+        self._cost = 0.8 * self._cost + 0.2 * tick_ms
+        self._lag = 0.8 * self._lag + 0.2 * max(0.0, lag_ms)
+
+        if self._cost > 0.5 * self.delay_ms or self._lag > self.delay_ms:
+            if self.delay_ms < self.max_delay_ms:
+                self.delay_ms = min(self.max_delay_ms, int(self.delay_ms * 1.25) + 1)
+            elif self.scale > self.min_scale:
+                self.scale = max(self.min_scale, round(self.scale - 0.1, 2))
+        elif self._cost < 0.2 * self.delay_ms and self._lag < 0.25 * self.delay_ms:
+            if self.scale < 1.0:
+                self.scale = min(1.0, round(self.scale + 0.1, 2))
+            elif self.delay_ms > self.target_delay_ms:
+                self.delay_ms = max(self.target_delay_ms, int(self.delay_ms / 1.25))
+        return self.delay_ms, self.scale
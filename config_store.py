@@ -0,0 +1,285 @@
+"""Typed configuration store.
+
+``ConfigStore`` is the dict every module already reads with
+``config.get(key, default)``; raw values stay exactly as they are in
+``waldo_config.json`` (mostly strings such as ``"fps_0": "30"``).  In
+addition:
+
+* ``config.typed`` holds every key in ``SCHEMA`` parsed once, as plain
+  attributes (``config.typed.fps_0 == 30``,
+  ``config.typed.prompt_timeout == 60.0``).  Per-camera keys work for any
+  camera index (``fps_4`` after discovery found ``/dev/video4``); they are
+  parsed on first use.  ``typed`` is replaced on change, so hot paths read
+  attributes instead of parsing strings per frame or per call.
+* ``subscribe(callback, prefixes)`` calls ``callback({key: (old, new)})``
+  with the typed values of the keys that changed, once per update.
+* With a ``path``, changes are written back debounced, atomically (temp
+  file + rename, see ``config_utils.write_json_atomic``) and on a
+  background thread, never on the caller's (Tk) thread.  ``flush()``
+  writes pending changes immediately.
+"""
+import threading, time
+from collections.abc import MutableMapping
+
+from config_utils import write_json_atomic
+
+# key -> (type, default); "_N" keys exist once per camera index
+SCHEMA = {
+    # per camera
+    "fps_N": (int, 30),
+    "autoprompt_N": (bool, False),
+    "autointerval_N": (float, 10.0),
+    "response_cache_N": (bool, False),
+    "upload_max_side_N": (int, 640),
+    "upload_quality_N": (int, 85),
+    "bbox_conf_N": (float, 0.5),
+    # interface and routing
+    "interface_verbose": (bool, False),
+    "supersede_prompts": (bool, True),
+    "prompt_timeout": (float, 60.0),
+    "history_token_budget": (int, 1500),
+    "history_keep_turns": (int, 4),
+    "tool_max_iterations": (int, 2),
+    "tool_budget_s": (float, 20.0),
+    "triangulation_min_views": (int, 2),
+    "triangulation_call_timeout": (float, 8.0),
+    "triangulation_deadline": (float, 10.0),
+    "triangulation_grace_s": (float, 0.5),
+    # background jobs
+    "endpoint_concurrency": (int, 2),
+    "autoprompt_change_bits": (int, 6),
+    "autoprompt_max_skips": (int, 30),
+    "autoprompt_timeout": (float, 30.0),
+    "response_cache_ttl": (float, 30.0),
+    "motion_window_s": (float, 60.0),
+    "motion_rate_hz": (float, 5.0),
+    "motion_threshold": (int, 25),
+    "motion_min_area": (float, 0.005),
+    "detector_input_size": (int, 320),
+    "detector_scale": (float, 1 / 255),
+    "detector_swap_rb": (bool, True),
+    "detector_nms": (float, 0.4),
+    # metrics, arm, service
+    "metrics_enabled": (bool, False),
+    "metrics_overlay": (bool, False),
+    "metrics_log_interval": (float, 10.0),
+    "arm_window": (int, 4),
+    "arm_queue_size": (int, 32),
+    "arm_ack_timeout": (float, 2.0),
+    "arm_tagged": (bool, False),
+    "arm_rate_hz": (float, 50.0),
+    "arm_max_speed": (float, 0.25),
+    "arm_max_accel": (float, 0.5),
+    "arm_tolerance": (float, 1e-3),
+    "service_port": (int, 8765),
+}
+
+
+FIELDS = {key: spec for key, spec in SCHEMA.items() if not key.endswith("_N")}
+CAMERA_FIELDS = {key[:-2]: spec for key, spec in SCHEMA.items() if key.endswith("_N")}  # "fps" -> spec
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off", ""}
+
+
+def spec_for(key):
+    """``(type, default)`` of ``key`` (``fps_7`` uses the ``fps_N`` entry), or None."""
+    spec = FIELDS.get(key)
+    if spec is None:
+        prefix, _, index = key.rpartition("_")
+        if index.isdigit():
+            spec = CAMERA_FIELDS.get(prefix)
+    return spec
+
+
+def parse(key, value):
+    """``value`` as the schema type of ``key`` (unknown keys are returned as is)."""
+    spec = spec_for(key)
+    if spec is None:
+        return value
+    kind, default = spec
+    if value is None:
+        return default
+    try:
+        if kind is bool:
+            if isinstance(value, str):
+                text = value.strip().lower()
+                if text not in _TRUE | _FALSE:
+                    raise ValueError(value)
+                return text in _TRUE
+            return bool(value)
+        if isinstance(value, str) and not value.strip():
+            return default
+        return kind(float(value)) if kind is int else kind(value)
+    except (TypeError, ValueError):
+        print(f"[Config] {key}={value!r} is not a valid {kind.__name__}; using {default!r}")
+        return default
+
+
+class TypedConfig:
+    """Parsed settings as attributes; per-camera keys are parsed on first use."""
+
+    def __init__(self, data, values=None):
+        self._data = data
+        self.__dict__.update(values if values is not None else
+                             {key: parse(key, data.get(key)) for key in FIELDS})
+
+    def __getattr__(self, name):  # only called for attributes not set yet
+        if name.startswith("_") or spec_for(name) is None:
+            raise AttributeError(name)
+        value = parse(name, self._data.get(name))
+        self.__dict__[name] = value  # data never changes under one TypedConfig
+        return value
+
+    def values(self):
+        return {k: v for k, v in self.__dict__.items() if k != "_data"}
+
+
+class ConfigStore(MutableMapping):
+    def __init__(self, data=None, path=None, debounce_s=0.5, max_delay_s=3.0):
+        self.path = path
+        self.debounce_s = debounce_s
+        self.max_delay_s = max_delay_s  # write at the latest this long after the first change
+        self._data = dict(data or {})
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._listeners = []
+        self.typed = TypedConfig(self._data)
+        # Writer state
+        self._dirty = False
+        self._dirty_since = self._changed_at = 0.0
+        self._wake = threading.Condition(self._lock)
+        self._writer = None
+        self.writes = 0
+
+    @classmethod
+    def wrap(cls, config_data):
+        """``config_data`` itself if it already is a store, else an in-memory store of it."""
+        return config_data if isinstance(config_data, cls) else cls(config_data)
+
+    # ------------------------------------------------------------ mapping
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            data = dict(self._data)
+            del data[key]
+            notify = self._commit(data, [key])
+        self._notify(*notify)
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __repr__(self):
+        return f"ConfigStore({self._data!r})"
+
+    def update(self, other=(), **kwargs):
+        """Set several keys at once: one notification and one write for all of them."""
+        values = dict(other, **kwargs)
+        with self._lock:
+            changed = [k for k, v in values.items() if k not in self._data or self._data[k] != v]
+            if not changed:
+                return
+            data = dict(self._data)
+            data.update({k: values[k] for k in changed})
+            notify = self._commit(data, changed)
+        self._notify(*notify)
+
+    def _commit(self, data, changed):
+        """Swap in ``data`` (lock held); returns what ``_notify`` needs."""
+        old, old_data = self.typed, self._data
+        self._data = data  # replaced, never mutated: readers see the old or the new dict
+        # Only the changed keys are re-parsed (and warned about)
+        typed = {k: parse(k, data.get(k)) for k in changed if spec_for(k) is not None}
+        self.typed = TypedConfig(data, {**old.values(), **typed})
+        changes = {k: (getattr(old, k), typed[k]) if k in typed
+                   else (old_data.get(k), data.get(k)) for k in changed}
+        self._schedule_write()
+        return list(self._listeners), changes
+
+    @staticmethod
+    def _notify(listeners, changes):
+        for prefixes, callback in listeners:
+            selected = {k: v for k, v in changes.items() if prefixes is None or k.startswith(prefixes)}
+            if selected:
+                try:
+                    callback(selected)
+                except Exception as e:
+                    print(f"[Config] change listener failed: {e}")
+
+    # ------------------------------------------------------ notifications
+    def subscribe(self, callback, prefixes=None):
+        """Call ``callback({key: (old, new)})`` when keys starting with one of
+        ``prefixes`` (a string or tuple; None = all) change.  Returns an
+        unsubscribe function."""
+        entry = (tuple([prefixes]) if isinstance(prefixes, str) else
+                 (tuple(prefixes) if prefixes is not None else None), callback)
+        with self._lock:
+            self._listeners.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._listeners:
+                    self._listeners.remove(entry)
+        return unsubscribe
+
+    # ------------------------------------------------------------ writing
+    def _schedule_write(self):
+        """Mark the data dirty and wake the writer (lock held)."""
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if not self._dirty:
+            self._dirty, self._dirty_since = True, now
+        self._changed_at = now
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="config-writer", daemon=True)
+            self._writer.start()
+        self._wake.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while True:
+                    if self._dirty:
+                        # Debounced: quiet for debounce_s, or max_delay_s after the first change
+                        due = min(self._changed_at + self.debounce_s, self._dirty_since + self.max_delay_s)
+                        remaining = due - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._wake.wait(remaining)
+                    elif not self._wake.wait(30):
+                        self._writer = None  # idle; the next change starts a new one
+                        return
+            self._write_pending()
+
+    def _write_pending(self):
+        with self._io_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data, self._dirty = self._data, False
+            try:
+                write_json_atomic(self.path, data)
+                self.writes += 1
+            except OSError as e:
+                print(f"[Config] Could not save {self.path}: {e}")
+
+    def flush(self):
+        """Write pending changes now (e.g. on shutdown)."""
+        if self.path is not None:
+            self._write_pending()
@@ -44,7 +44,17 @@ def load_config():
     cfg = _load(pathlib.Path.cwd() / "waldo_config.json")
     return cfg or {}
 
+def write_json_atomic(path: pathlib.Path, data):
+    """Write JSON to a temp file next to ``path`` and rename it into place,
+    so a crash mid-write never leaves a truncated config behind."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
 def save_config(cfg: dict):
-    _CFG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(cfg, f, indent=2)
+    write_json_atomic(CONFIG_PATH, dict(cfg))
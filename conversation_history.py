@@ -0,0 +1,128 @@
+"""Token-budgeted conversation history for the interface LLM.
+
+Recent turns are kept verbatim.  Once the history outgrows its token budget
+the oldest turns are folded into a running summary by a background task on
+the router's event loop; the request path never waits for it.  Until the
+summary is ready the folded turns are simply not sent.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token plus per-message overhead)."""
+    return len(text) // 4 + 4
+
+
+class ConversationHistory:
+    def __init__(self, token_budget=1500, keep_recent=4, summary_budget=250, summarizer=None):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent          # turns never folded into the summary
+        self.summary_budget = summary_budget    # tokens reserved for the summary itself
+        self.summarizer = summarizer            # async (summary, transcript, max_tokens) -> str
+        self.summary = ""
+        self._turns = deque()   # (messages, tokens)
+        self._folding = []      # turns handed to the summarizer, not yet summarised
+        self._task = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def add(self, user_msg, assistant_msg):
+        self._append([{"role": "user", "content": user_msg},
+                      {"role": "assistant", "content": assistant_msg}])
+
+    def add_result(self, user_msg, kind, **fields):
+        """Store a tool / route result compactly, e.g. ``add_result(p, "arm", result="Claw opened.")``."""
+        data = json.dumps(fields, separators=(",", ":"), default=str)
+        self._append([{"role": "user", "content": user_msg},
+                      {"role": "assistant", "content": f"[{kind}] {data}"}])
+
+    def messages(self):
+        """Messages to send: running summary (if any) plus the newest turns within budget."""
+        with self._lock:
+            budget = self.token_budget
+            out = []
+            if self.summary:
+                out.append({"role": "system",
+                            "content": f"Summary of the earlier conversation: {self.summary}"})
+                budget -= estimate_tokens(self.summary)
+            picked = []
+            for msgs, tokens in reversed(self._turns):
+                if picked and tokens > budget:
+                    break
+                picked.append(msgs)
+                budget -= tokens
+            for msgs in reversed(picked):
+                out.extend(msgs)
+            return out
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._folding.clear()
+            self.summary = ""
+
+    @property
+    def tokens(self):
+        with self._lock:
+            return sum(t for _, t in self._turns)
+
+    # ------------------------------------------------------------------
+    def _append(self, msgs):
+        tokens = sum(estimate_tokens(m["content"]) for m in msgs)
+        with self._lock:
+            self._turns.append((msgs, tokens))
+            limit = self.token_budget - self.summary_budget
+            total = sum(t for _, t in self._turns)
+            while len(self._turns) > self.keep_recent and total > limit:
+                old, old_tokens = self._turns.popleft()
+                self._folding.append(old)
+                total -= old_tokens
+            start = bool(self._folding) and self._task is None
+        if start:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or self.summarizer is None:
+            self._fold_locally()
+            return
+        self._task = loop.create_task(self._compact())
+
+    async def _compact(self):
+        try:
+            while True:
+                with self._lock:
+                    batch, self._folding = self._folding, []
+                    summary = self.summary
+                if not batch:
+                    break
+                transcript = "\n".join(f"{m['role']}: {m['content']}" for msgs in batch for m in msgs)
+                try:
+                    new_summary = await self.summarizer(summary, transcript, self.summary_budget)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    new_summary = None
+                if not new_summary or new_summary.startswith("[Error"):
+                    new_summary = self._truncate(f"{summary}\n{transcript}".strip())
+                with self._lock:
+                    self.summary = self._truncate(new_summary.strip())
+        finally:
+            self._task = None
+
+    def _fold_locally(self):
+        """No summarizer / no loop: keep a truncated tail of the folded text."""
+        with self._lock:
+            batch, self._folding = self._folding, []
+            text = "\n".join(f"{m['role']}: {m['content']}" for msgs in batch for m in msgs)
+            self.summary = self._truncate(f"{self.summary}\n{text}".strip())
+
+    def _truncate(self, text):
+        max_chars = self.summary_budget * 4
+        return text if len(text) <= max_chars else "..." + text[-max_chars:]
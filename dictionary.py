@@ -9,10 +9,23 @@ CAMERA_KEYWORDS = [
     "scan", "check camera", "look at", "feed", "scene", "live feed", "video", "frame",
     "on cam", "on cam 1", "on camera 1", "on camera one", "from the camera", "from the feed",
     "what's there", "what can you tell", "can you tell", "look", "find", "spot", "count objects",
-    "anything moving", "what is moving", "identify", "spot", "locate", "current view",
+    "identify", "spot", "locate", "current view",
     "what's in the room", "what's in this view", "describe what you observe"
 ]
 
+# --- Motion (answered from the local motion index) ---
+MOTION_KEYWORDS = [
+    "anything moving", "is anything moving", "something moving", "what is moving", "what's moving",
+    "who is moving", "moving", "motion", "movement", "any movement", "activity", "any activity",
+    "what moved", "did anything move", "has anything moved", "something moved", "motion detected"
+]
+
+# Motion prompts containing one of these still go to the camera AI with a frame
+MOTION_DESCRIBE_KEYWORDS = [
+    "what is moving", "what's moving", "who is moving", "what moved", "describe", "show me",
+    "what is it", "who is it", "what kind", "look like"
+]
+
 # --- Triangulation/3D Localization ---
 TRIANGULATION_KEYWORDS = [
     "triangulate", "3d position", "where is", "locate", "world coordinates", "calculate position",
@@ -21,12 +34,28 @@ TRIANGULATION_KEYWORDS = [
 ]
 
 # --- Robot Arm/Manipulator ---
+# Phrases that cancel the running move (checked before any other arm command)
+ARM_STOP_KEYWORDS = ["stop the arm", "stop arm", "halt the arm"]
+
 ARM_KEYWORDS = [
     "robot arm", "move arm", "move the arm", "move to", "pick up", "grasp", "release", "open hand",
     "close hand", "manipulate", "operate the arm", "move claw", "rotate wrist", "extend arm",
     "retract arm", "put down", "drop", "grab", "lift", "move robot", "move end effector",
     "control arm", "send arm", "to coordinates", "x y z", "point to", "go to", "move object",
-    "arm to", "arm command", "execute arm", "reach for", "press", "push", "pull"
-]
+    "arm to", "arm command", "execute arm", "reach for", "press", "push", "pull",
+    "claw", "gripper"
+] + ARM_STOP_KEYWORDS
+
+# --- Keyword weights -----------------------------------------------------
+# Default weight is the number of words in the phrase (longer = more specific).
+# Override here for phrases that are listed under more than one intent.
+KEYWORD_WEIGHTS = {
+    "locate": {"camera": 1.0, "triangulation": 1.5},
+    "where is": {"triangulation": 2.5},
+    "how far": {"triangulation": 2.5},
+    "move to": {"arm": 2.5},
+    "go to": {"arm": 2.5},
+    "measure": {"triangulation": 1.5},
+}
 
 # --- Add any future categories as needed ---
@@ -0,0 +1,91 @@
+"""Image encoding for vision queries.
+
+Frames are downscaled to a per-camera maximum upload size and encoded with a
+per-camera format / quality before being base64'd into the request.  Results
+are cached by (camera, frame sequence, encode params) so a frame is encoded at
+most once no matter how many questions are asked about it.
+"""
+import base64
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import cv2
+
+from config_store import ConfigStore
+from metrics import metrics
+
+# format name -> (file extension, mime type, OpenCV quality flag)
+FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", "image/png", None),
+}
+
+
+class EncodeParams(NamedTuple):
+    max_side: int = 640   # longest edge in pixels, 0 = native resolution
+    quality: int = 85     # 1-100, ignored for png
+    fmt: str = "jpeg"
+
+
+def encode_params_from_config(config_data, cam_id):
+    fmt = str(config_data.get(f"upload_format_{cam_id}", "jpeg")).strip().lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in FORMATS:
+        fmt = "jpeg"
+    typed = ConfigStore.wrap(config_data).typed
+    max_side = getattr(typed, f"upload_max_side_{cam_id}")
+    quality = min(100, max(1, getattr(typed, f"upload_quality_{cam_id}")))
+    return EncodeParams(max(0, max_side), quality, fmt)
+
+
+def encode_frame(frame, params=EncodeParams()):
+    """Return (mime_type, base64 string) for a BGR frame."""
+    ext, mime, quality_flag = FORMATS[params.fmt]
+    with metrics.timer("encode", fmt=params.fmt):
+        h, w = frame.shape[:2]
+        longest = max(h, w)
+        if params.max_side and longest > params.max_side:
+            scale = params.max_side / longest
+            frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        flags = [quality_flag, params.quality] if quality_flag is not None else []
+        ok, buffer = cv2.imencode(ext, frame, flags)
+    if not ok:
+        raise ValueError(f"Could not encode frame as {params.fmt}")
+    with metrics.timer("base64"):
+        return mime, base64.b64encode(buffer).decode()
+
+
+class EncodeCache:
+    """Small LRU of encoded frames keyed by (camera, frame seq, params)."""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_encode(self, cam_id, seq, frame, params):
+        if seq is None:  # caller has no stable frame identity, don't cache
+            return encode_frame(frame, params)
+        key = (cam_id, seq, params)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        encoded = encode_frame(frame, params)
+        with self._lock:
+            self._entries[key] = encoded
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return encoded
+
+
+encode_cache = EncodeCache()
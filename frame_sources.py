@@ -0,0 +1,221 @@
+"""Pluggable frame sources for the capture workers.
+
+Every source looks like a ``cv2.VideoCapture`` to ``CameraWorker``:
+``read(image=None) -> (ok, frame)``, ``isOpened()`` and ``release()``.  When
+``image`` is a buffer of the right shape the frame is written into it.
+
+Each camera slot picks its source with ``source_N``:
+    device                 the discovered camera with index N (default)
+    device:2               a specific device index
+    video:/path/clip.mp4   a video file, looped
+    images:/path/dir       an image directory (sorted by name), looped
+    synthetic:640x480      generated test pattern; optional @fps and +noise,
+                           e.g. synthetic:1280x720@60+noise
+File and synthetic sources make capture, render and query timings
+reproducible without physical cameras.
+"""
+import abc, glob, os, re
+
+import cv2
+import numpy as np
+
+from gui_util_camera import open_camera, open_cameras
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+class FrameSource(abc.ABC):
+    """Base class; subclasses must implement ``_next(image)``."""
+
+    fps = None  # native rate, if the source has one
+
+    def __init__(self):
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def read(self, image=None):
+        if not self._open:
+            return False, None
+        return self._next(image)
+
+    def set(self, prop, value):  # VideoCapture compatibility; nothing to configure
+        return False
+
+    def release(self):
+        self._open = False
+
+    @abc.abstractmethod
+    def _next(self, image):
+        """Return ``(ok, frame)`` for the next frame."""
+
+    @staticmethod
+    def _into(image, frame):
+        """Copy ``frame`` into the caller's buffer when shapes match."""
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return image
+        return frame
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path, loop=True):
+        super().__init__()
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        self._open = self.cap.isOpened()
+        if self._open:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+
+    def _next(self, image):
+        ret, frame = self.cap.read(image) if image is not None else self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image) if image is not None else self.cap.read()
+        return ret, frame
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+
+class ImageDirSource(FrameSource):
+    def __init__(self, path, loop=True):
+        super().__init__()
+        self.files = sorted(f for f in glob.glob(os.path.join(path, "*"))
+                            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.loop = loop
+        self._pos = 0
+        self._open = bool(self.files)
+
+    def _next(self, image):
+        if self._pos >= len(self.files):
+            if not self.loop:
+                return False, None
+            self._pos = 0
+        frame = cv2.imread(self.files[self._pos], cv2.IMREAD_COLOR)
+        self._pos += 1
+        if frame is None:
+            return False, None
+        return True, self._into(image, frame)
+
+
+class SyntheticSource(FrameSource):
+    """Deterministic test pattern: gradient, a moving box and the frame number."""
+
+    def __init__(self, width=640, height=480, fps=30, noise=False, seed=0):
+        super().__init__()
+        self.fps = fps
+        self.noise = noise
+        self.index = 0
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        self._background = np.dstack([np.broadcast_to(x, (height, width)),
+                                      np.broadcast_to(y, (height, width)),
+                                      np.full((height, width), 96, np.float32)]).astype(np.uint8)
+        self._rng = np.random.default_rng(seed)
+        self._noise = (self._rng.integers(0, 8, (4, height, width, 3), dtype=np.uint8)
+                       if noise else None)
+
+    def _next(self, image):
+        bg = self._background
+        h, w = bg.shape[:2]
+        frame = image if image is not None and image.shape == bg.shape else np.empty_like(bg)
+        if self._noise is not None:
+            np.add(bg, self._noise[self.index % len(self._noise)], out=frame)
+        else:
+            np.copyto(frame, bg)
+        side = max(8, min(w, h) // 6)
+        x = (self.index * 4) % max(1, w - side)
+        y = int((h - side) / 2 * (1 + np.sin(self.index / 15.0)))
+        cv2.rectangle(frame, (x, y), (x + side, y + side), (255, 255, 255), -1)
+        cv2.putText(frame, str(self.index), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        self.index += 1
+        return True, frame
+
+
+class DeviceSource(FrameSource):
+    """A live camera, opened with the platform's backend."""
+
+    def __init__(self, index, cap=None):
+        super().__init__()
+        self.index = index
+        self.cap = cap if cap is not None else open_camera(index)
+        self._open = self.cap is not None
+
+    def _next(self, image):
+        return self.cap.read(image) if image is not None else self.cap.read()
+
+    def release(self):
+        super().release()
+        if self.cap is not None:
+            self.cap.release()
+
+
+# -----------------------------------------------------------------------------
+# Config
+# -----------------------------------------------------------------------------
+_SYNTHETIC = re.compile(r"(\d+)x(\d+)(?:@(\d+(?:\.\d+)?))?(\+noise)?$")
+
+
+def source_spec(config_data, cam_idx):
+    """Normalised ``source_N`` value ('device' when unset)."""
+    return (config_data.get(f"source_{cam_idx}") or "device").strip()
+
+
+def is_device(spec):
+    return spec == "device"
+
+
+def open_source(spec, cam_idx):
+    """Open the source described by ``spec`` for slot ``cam_idx``; None on failure."""
+    kind, _, arg = spec.partition(":")
+    kind = kind.strip().lower()
+    arg = arg.strip()
+    if kind == "device":
+        source = DeviceSource(int(arg) if arg else cam_idx)
+    elif kind == "video":
+        source = VideoFileSource(arg)
+    elif kind == "images":
+        source = ImageDirSource(arg)
+    elif kind == "synthetic":
+        m = _SYNTHETIC.match(arg or "640x480")
+        if not m:
+            print(f"[Sources] Bad synthetic spec {spec!r}; expected WxH[@fps][+noise]")
+            return None
+        source = SyntheticSource(int(m.group(1)), int(m.group(2)),
+                                 float(m.group(3) or 30), noise=bool(m.group(4)), seed=cam_idx)
+    else:
+        print(f"[Sources] Unknown source {spec!r} for camera {cam_idx + 1}")
+        return None
+    if not source.isOpened():
+        print(f"[Sources] Could not open {spec!r} for camera {cam_idx + 1}")
+        return None
+    return source
+
+
+def open_sources(config_data, max_slots=4):
+    """Open every camera slot: discovered devices plus configured sources.
+
+    Returns ``({cam_idx: source}, {cam_idx: spec})``.  A slot configured for
+    a file or synthetic source takes precedence over a device with the same
+    index.
+    """
+    specs = {idx: source_spec(config_data, idx) for idx in range(max_slots)}
+    sources = {}
+    if any(is_device(spec) for spec in specs.values()):
+        for idx, cap in open_cameras().items():
+            if is_device(specs.get(idx, "device")):
+                sources[idx] = DeviceSource(idx, cap)
+                specs[idx] = "device"
+            else:
+                cap.release()
+    for idx, spec in specs.items():
+        if not is_device(spec):
+            source = open_source(spec, idx)
+            if source is not None:
+                sources[idx] = source
+    sources = dict(sorted(sources.items()))
+    return sources, {idx: specs[idx] for idx in sources}
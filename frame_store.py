@@ -0,0 +1,151 @@
+"""Shared, preallocated frame buffers for all cameras.
+
+Each camera owns a handful of NumPy buffers (triple buffering by default).
+The capture worker decodes straight into a free back buffer and publishes it
+with an atomic index swap; readers pin the current front buffer and get a
+read-only view plus its sequence number.  A pinned buffer is never written
+to, so readers always see a consistent frame, and nothing is copied unless a
+consumer explicitly asks to keep the frame.
+"""
+import threading
+
+
+class FrameView:
+    """Pinned, read-only view of one published frame.  Use as a context manager."""
+
+    __slots__ = ("cam_idx", "seq", "timestamp", "frame", "_store", "_slot")
+
+    def __init__(self, store, cam_idx, slot):
+        self._store = store
+        self._slot = slot
+        self.cam_idx = cam_idx
+        self.seq = slot.seq
+        self.timestamp = slot.timestamp
+        self.frame = slot.buffer.view()
+        self.frame.flags.writeable = False
+
+    def copy(self):
+        """Return an owned copy of the frame for consumers that keep it around."""
+        return self.frame.copy()
+
+    def release(self):
+        if self._slot is not None:
+            self._store._unpin(self.cam_idx, self._slot)
+            self._slot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+
+class _Slot:
+    __slots__ = ("buffer", "seq", "timestamp", "pins", "writing")
+
+    def __init__(self):
+        self.buffer = None
+        self.seq = 0
+        self.timestamp = 0.0
+        self.pins = 0
+        self.writing = False
+
+
+class _CameraBuffers:
+    def __init__(self, n_slots, seq=0):
+        self.slots = [_Slot() for _ in range(n_slots)]
+        self.front = None  # slot currently published to readers
+        self.seq = seq
+
+
+class FrameStore:
+    """Per-camera triple buffers with pin-on-read semantics."""
+
+    def __init__(self, slots_per_camera=3):
+        self.slots_per_camera = slots_per_camera
+        self._cams = {}
+        self._last_seq = {}  # survives drop() so sequence numbers never repeat
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------------- writer
+    def acquire_write(self, cam_idx):
+        """Return a slot that is neither published nor pinned by a reader.
+
+        The slot's ``buffer`` is ``None`` the first time; pass it to
+        ``cap.read(slot.buffer)`` and hand whatever comes back to ``publish``.
+        """
+        with self._lock:
+            cam = self._cams.get(cam_idx)
+            if cam is None:
+                cam = self._cams[cam_idx] = _CameraBuffers(self.slots_per_camera,
+                                                           self._last_seq.get(cam_idx, 0))
+            for slot in cam.slots:
+                if slot is not cam.front and slot.pins == 0 and not slot.writing:
+                    slot.writing = True
+                    return slot
+            # Every buffer is pinned by a slow reader; grow instead of tearing a frame
+            slot = _Slot()
+            slot.writing = True
+            cam.slots.append(slot)
+            return slot
+
+    def publish(self, cam_idx, slot, buffer, timestamp):
+        """Make ``buffer`` (normally ``slot.buffer``) the newest frame for the camera."""
+        with self._lock:
+            cam = self._cams[cam_idx]
+            cam.seq += 1
+            slot.buffer = buffer
+            slot.seq = cam.seq
+            slot.timestamp = timestamp
+            slot.writing = False
+            cam.front = slot
+            return cam.seq
+
+    def abandon(self, cam_idx, slot):
+        """Return a write slot without publishing (failed read)."""
+        with self._lock:
+            slot.writing = False
+
+    # ---------------------------------------------------------------- readers
+    def read(self, cam_idx):
+        """Pin and return the newest frame as a ``FrameView``, or None."""
+        with self._lock:
+            cam = self._cams.get(cam_idx)
+            if cam is None or cam.front is None:
+                return None
+            slot = cam.front
+            slot.pins += 1
+        return FrameView(self, cam_idx, slot)
+
+    def cameras(self):
+        """Cameras that currently have a published frame."""
+        with self._lock:
+            return [cam_idx for cam_idx, cam in self._cams.items() if cam.front is not None]
+
+    def latest_seq(self, cam_idx):
+        cam = self._cams.get(cam_idx)
+        return cam.seq if cam else 0
+
+    def snapshot(self, cam_idx):
+        """Owned copy of the newest frame (seq, timestamp, ndarray), or None."""
+        view = self.read(cam_idx)
+        if view is None:
+            return None
+        with view:
+            return view.seq, view.timestamp, view.copy()
+
+    def drop(self, cam_idx):
+        with self._lock:
+            cam = self._cams.pop(cam_idx, None)
+            if cam is not None:
+                self._last_seq[cam_idx] = cam.seq
+
+    def _unpin(self, cam_idx, slot):
+        with self._lock:
+            slot.pins -= 1
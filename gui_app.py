@@ -1,20 +1,28 @@
-"""Launcher fixing API key fallback."""
+"""Launcher fixing API key fallback.
+
+    python gui_app.py [--demo] [--headless] [--serve] [--host HOST] [--port PORT]
+
+--headless runs the service and its local HTTP API without Tk (rack
+machines, load tests); --serve also exposes the API while the GUI is open.
+"""
 import sys, os, traceback, pprint, pathlib
 
-from gui_main_window import WALDOApp
 from camera_calibration import camera_calibration
-from ai_interface_router import InterfaceAIRouter
 from my_interface_ai_handler import InterfaceAI
+from waldo_service import WaldoService, serve
 from config_utils import load_config, CONFIG_PATH   # CONFIG_PATH comes from the helper
+from config_store import ConfigStore
 
 # ──────────────────────────────────────────────────────────────────────────────
 def main():
     demo = "--demo" in sys.argv
-    cfg = load_config()          # 1️⃣  cfg now exists
+    headless = "--headless" in sys.argv
+    # Typed, change-notifying store; edits are saved to CONFIG_PATH in the background
+    cfg = ConfigStore(load_config(), path=CONFIG_PATH)
 
     # DEBUG print ­– shows exactly what was loaded
     print("[DEBUG] Config file used →", CONFIG_PATH)
-    pprint.pp(cfg)
+    pprint.pp(dict(cfg))
     # ──────────────────────────────────────────────────────────────────────────
 
     # Fallback: put key into the env if it isn’t there already
@@ -33,9 +41,21 @@ def main():
             endpoint=cfg.get("llava_endpoint_0"),
         )
 
-        app = WALDOApp(None)
-        router = InterfaceAIRouter(interface_ai, cfg, camera_calibration, app=app)
-        app.router = router
+        service = WaldoService(cfg, interface_ai, camera_calibration).start()
+        host = _arg("--host", cfg.get("service_host", "127.0.0.1"))
+        port = int(_arg("--port", cfg.typed.service_port))
+
+        if headless:
+            try:
+                serve(service, host, port)
+            finally:
+                service.stop()
+            return
+
+        from gui_main_window import WALDOApp  # Tk only when there is a window
+        if "--serve" in sys.argv:
+            serve(service, host, port, background=True)
+        app = WALDOApp(service)
         app.mainloop()
 
     except Exception as e:
@@ -43,5 +63,14 @@ def main():
         traceback.print_exc()
 
 
+def _arg(flag, default):
+    """Value following ``flag`` on the command line, else ``default``."""
+    if flag in sys.argv:
+        i = sys.argv.index(flag)
+        if i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return default
+
+
 if __name__ == "__main__":
     main()
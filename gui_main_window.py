@@ -1,32 +1,32 @@
+import time
 import tkinter as tk
-from PIL import Image, ImageTk
-import cv2
-from concurrent.futures import ThreadPoolExecutor
 
 from gui_settings_window import SettingsWindow
-from config_utils import load_config, save_config
-from gui_util_camera import detect_cameras
+from camera_preview import PreviewRenderer, PreviewGovernor
+from gui_status_stream import StatusStream
+from metrics import metrics
 
 
 class WALDOApp(tk.Tk):
-    """Main W.A.L.D.O. GUI window."""
-    def __init__(self, router, camera_count=None):
+    """Main W.A.L.D.O. GUI window.
+
+    A client of ``WaldoService``: the service owns capture, routing and the
+    background jobs; the window draws its frames and forwards prompts.
+    """
+    def __init__(self, service, camera_count=None):
         super().__init__()
-        self.router = router
+        self.service = service
         self.title("W.A.L.D.O. - Vision AI Interface")
         self.geometry("1480x900")
         self.configure(bg="#1e1e1e")
 
-        # Executor keeps UI responsive while AI / networking runs
-        self.executor = ThreadPoolExecutor(max_workers=4)
-
-        # Config -----------------------------------------------------------------
-        self.config = load_config()
-
-        # Camera discovery -------------------------------------------------------
-        self.camera_indices = detect_cameras()
+        # Config and cameras come from the service -------------------------------
+        self.config = service.config
+        self.camera_indices = service.camera_indices
         self.camera_count = len(self.camera_indices)
-        self.latest_frames = {}
+        self.frames = service.frames
+        self._feed_job = None
+        self._last_ttft = None  # time to first token of the latest streamed reply, s
 
         # Sidebar ----------------------------------------------------------------
         self.sidebar = tk.Frame(self, width=200, bg="#2e2e2e")
@@ -35,6 +35,13 @@ class WALDOApp(tk.Tk):
                  font=("Consolas", 18, "bold")).pack(pady=20)
         tk.Button(self.sidebar, text="⚙️ Settings", bg="#444", fg="white",
                   command=self.open_settings, relief="flat").pack(pady=10, fill="x", padx=10)
+        self.render_stats_label = tk.Label(self.sidebar, text="", fg="#888", bg="#2e2e2e",
+                                           font=("Consolas", 9), justify="left")
+        self.render_stats_label.pack(side="bottom", pady=10, padx=10, anchor="w")
+        # Live metrics overlay (metrics_overlay); empty while it is off
+        self.metrics_label = tk.Label(self.sidebar, text="", fg="#8c8", bg="#2e2e2e",
+                                      font=("Consolas", 9), justify="left")
+        self.metrics_label.pack(side="bottom", padx=10, anchor="w")
 
         # Main area --------------------------------------------------------------
         self.main_area = tk.Frame(self, bg="#1e1e1e")
@@ -54,9 +61,13 @@ class WALDOApp(tk.Tk):
         self.camera_grid_frame = tk.Frame(self.main_area, bg="#181818")
         self.camera_grid_frame.pack(fill="both", expand=True, padx=10, pady=(0,10))
 
-        self.camera_labels, self.camera_caps = [], []
+        self.camera_labels, self.previews = [], []
         self.setup_camera_grid()
 
+        # Service status lines (auto prompts) land in the status box
+        self._unsubscribe = service.subscribe(
+            lambda text: self.status_box.after(0, self._status, text))
+
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     # ---------------------------------------------------------------------- #
@@ -64,10 +75,7 @@ class WALDOApp(tk.Tk):
         for lbl in self.camera_labels:
             lbl.destroy()
         self.camera_labels.clear()
-        for cap in self.camera_caps:
-            if cap:
-                cap.release()
-        self.camera_caps.clear()
+        self.previews.clear()
 
         cols = min(2, self.camera_count) or 1
         for idx, cam_idx in enumerate(self.camera_indices):
@@ -81,45 +89,80 @@ class WALDOApp(tk.Tk):
             cam_label = tk.Label(frame, bg="black")
             cam_label.pack(padx=2, pady=2)
             self.camera_labels.append(cam_label)
+            self.previews.append(PreviewRenderer(cam_label, size=(480, 320)))
 
-            cap = cv2.VideoCapture(cam_idx, cv2.CAP_DSHOW)
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.camera_caps.append(cap)
+        # Preview redraw rate follows the fastest camera
+        fastest = max((w.fps for w in self.service.capture.workers.values()), default=1)
+        self.preview_governor = PreviewGovernor(target_delay_ms=max(1, int(1000 / fastest)))
+        self._last_tick = None
+        self._stats_tick = 0.0
 
+        if self._feed_job is not None:
+            self.after_cancel(self._feed_job)
         self.update_camera_feeds()
 
     # ---------------------------------------------------------------------- #
     def update_camera_feeds(self):
-        min_delay_ms = 1000  # will be lowered per camera FPS
-        for idx, cap in enumerate(self.camera_caps):
-            ret, frame = cap.read()
-            if ret:
-                # Resize for preview
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb).resize((480, 320))
-                imgtk = ImageTk.PhotoImage(image=img)
-                lbl = self.camera_labels[idx]
-                lbl.imgtk = imgtk
-                lbl.configure(image=imgtk)
-
-                cam_idx = self.camera_indices[idx]
-                self.latest_frames[cam_idx] = frame.copy()
-
-                fps = int(self.config.get(f"fps_{cam_idx}", 30))
-                delay = max(1, int(1000 / fps))
-                min_delay_ms = min(min_delay_ms, delay)
-
-        self.after(min_delay_ms, self.update_camera_feeds)
+        # Capture happens on the worker threads; here we only draw the newest frames
+        start = time.perf_counter()
+        lag_ms = 0.0
+        if self._last_tick is not None:
+            lag_ms = (start - self._last_tick) * 1000.0 - self.preview_governor.delay_ms
+
+        scale = self.preview_governor.scale
+        for idx, cam_idx in enumerate(self.camera_indices):
+            preview = self.previews[idx]
+            preview.scale = scale
+            preview.render(self.frames, cam_idx)
+
+        tick_ms = (time.perf_counter() - start) * 1000.0
+        metrics.observe("gui_render", tick_ms / 1000.0)
+        delay_ms, _ = self.preview_governor.update(tick_ms, lag_ms)
+        self._last_tick = start
+
+        if start - self._stats_tick > 1.0:
+            self._stats_tick = start
+            self._show_render_stats()
+
+        self._feed_job = self.after(delay_ms, self.update_camera_feeds)
+
+    def _show_render_stats(self):
+        if not self.previews:
+            return
+        avg = sum(p.avg_ms for p in self.previews) / len(self.previews)
+        gov = self.preview_governor
+        self.render_stats_label.configure(
+            text=f"render {avg:.1f} ms/frame\n"
+                 f"preview {1000 / gov.delay_ms:.0f} fps @ {int(gov.scale * 100)}%"
+                 + (f"\nfirst token {self._last_ttft * 1000:.0f} ms" if self._last_ttft is not None else ""))
+        self._show_metrics_overlay()
+
+    def _show_metrics_overlay(self):
+        if not metrics.overlay:
+            self.metrics_label.configure(text="")
+            return
+        lines = []
+        for cam_idx in self.camera_indices:
+            worker = self.service.capture.workers.get(cam_idx)
+            if worker is not None:
+                lines.append(f"cam {cam_idx + 1}  {worker.measured_fps:4.1f} fps")
+        for labels, s in metrics.series("prompt"):
+            lines.append(f"{labels.get('intent', '?'):<13} p50 {s['p50_ms']:.0f} / p95 {s['p95_ms']:.0f} ms")
+        for name in ("camera_request", "interface_request"):
+            for labels, s in metrics.series(name):
+                where = f" {int(labels['cam']) + 1}" if "cam" in labels else ""
+                lines.append(f"{name.split('_')[0]}{where} llm {s['p50_ms']:.0f} ms")
+        inflight = metrics.gauge_value("prompts_in_flight", 0)
+        lines.append(f"in flight {inflight}")
+        self.metrics_label.configure(text="\n".join(lines))
 
     # ---------------------------------------------------------------------- #
     def open_settings(self):
         SettingsWindow(self, self.camera_indices, self.config, self.on_settings_saved)
 
     def on_settings_saved(self):
-        save_config(self.config)
-        if self.router:
-            self.router.config_data = self.config
+        # The store already saved the edits (debounced, off this thread)
+        self.service.apply_config(self.config)
         self.setup_camera_grid()
         self._status("[System] Settings applied live.")
 
@@ -131,15 +174,24 @@ class WALDOApp(tk.Tk):
         self._status(f"> {user_input}")
         self.input_field.delete(0, "end")
 
-        # Offload heavy processing
-        def _work():
-            try:
-                response = self.router.process_prompt(user_input) if self.router else "[No router]"
-            except Exception as e:
-                response = f"[Error]: {e}"
-            self.after(0, lambda: self._status(response))
-
-        self.executor.submit(_work)
+        # Tokens are streamed into their own status line as they arrive
+        stream = StatusStream(self.status_box)
+
+        # Runs on the router's event loop; a newer prompt cancels this one
+        def _done(future):
+            if stream.time_to_first_token is not None:
+                self._last_ttft = stream.time_to_first_token
+            if future.cancelled():
+                stream.finish("[Cancelled: superseded by a newer prompt]")
+            elif future.exception() is not None:
+                stream.finish(f"[Error]: {future.exception()}")
+            else:
+                stream.finish(future.result())
+
+        future = self.service.submit_prompt(user_input, on_token=stream.push,
+                                            supersede=self.config.typed.supersede_prompts,
+                                            client="gui")
+        future.add_done_callback(_done)
 
     # ---------------------------------------------------------------------- #
     def _status(self, text: str):
@@ -148,11 +200,8 @@ class WALDOApp(tk.Tk):
 
     # ---------------------------------------------------------------------- #
     def on_close(self):
-        try:
-            self.executor.shutdown(wait=False)
-        except Exception:
-            pass
-        for cap in self.camera_caps:
-            if cap:
-                cap.release()
+        self._unsubscribe()
+        if self._feed_job is not None:
+            self.after_cancel(self._feed_job)
+        self.service.stop()
         self.destroy()
\ No newline at end of file
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import ttk
-from config_utils import save_config
 
 class SettingsWindow(tk.Toplevel):
     def __init__(self, master, camera_indices, config, live_update_callback):
@@ -62,23 +61,35 @@ class SettingsWindow(tk.Toplevel):
 
         tk.Label(scrollable_frame, text="FPS", fg="white", bg="#1e1e1e").grid(row=row, column=0, sticky="w", padx=10, pady=5)
         fps_spin = tk.Spinbox(scrollable_frame, from_=1, to=60, width=10)
-        fps_val = self.config.get(f"fps_{cam_idx}", "10")
+        fps_val = getattr(self.config.typed, f"fps_{cam_idx}")
         fps_spin.delete(0, "end")
         fps_spin.insert(0, fps_val)
         fps_spin.grid(row=row, column=1, padx=10, pady=5)
         self.widget_refs[f"fps_{cam_idx}"] = fps_spin
         row += 1
 
+        add_labeled_entry("Frame Source (device / video:PATH / images:DIR / synthetic:WxH@FPS)", f"source_{cam_idx}")
+        add_labeled_entry("Upload Max Side (px, 0 = native)", f"upload_max_side_{cam_idx}")
+        add_labeled_entry("Upload Quality (1 - 100)", f"upload_quality_{cam_idx}")
+        add_labeled_entry("Upload Format (jpeg / webp / png)", f"upload_format_{cam_idx}")
+
         autoprompt_var = tk.BooleanVar()
-        autoprompt_var.set(bool(self.config.get(f"autoprompt_{cam_idx}", False)))
+        autoprompt_var.set(getattr(self.config.typed, f"autoprompt_{cam_idx}"))
         toggle = tk.Checkbutton(scrollable_frame, text="Auto-Prompt Enabled", variable=autoprompt_var, bg="#1e1e1e", fg="white", selectcolor="#1e1e1e")
         toggle.grid(row=row, column=0, columnspan=2, padx=10, pady=5, sticky="w")
         self.widget_refs[f"autoprompt_{cam_idx}"] = autoprompt_var
         row += 1
 
+        cache_var = tk.BooleanVar()
+        cache_var.set(getattr(self.config.typed, f"response_cache_{cam_idx}"))
+        cache_toggle = tk.Checkbutton(scrollable_frame, text="Reuse answers while the scene is unchanged", variable=cache_var, bg="#1e1e1e", fg="white", selectcolor="#1e1e1e")
+        cache_toggle.grid(row=row, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        self.widget_refs[f"response_cache_{cam_idx}"] = cache_var
+        row += 1
+
         tk.Label(scrollable_frame, text="Auto-Prompt Interval (s)", fg="white", bg="#1e1e1e").grid(row=row, column=0, sticky="w", padx=10, pady=5)
         interval_spin = tk.Spinbox(scrollable_frame, from_=1, to=300, width=10)
-        interval_val = self.config.get(f"autointerval_{cam_idx}", "10")
+        interval_val = getattr(self.config.typed, f"autointerval_{cam_idx}")
         interval_spin.delete(0, "end")
         interval_spin.insert(0, interval_val)
         interval_spin.grid(row=row, column=1, padx=10, pady=5)
@@ -103,7 +114,7 @@ class SettingsWindow(tk.Toplevel):
 
         tk.Label(scrollable_frame, text="Min Box Confidence (0.0 - 1.0)", fg="white", bg="#1e1e1e").grid(row=row, column=0, sticky="w", padx=10, pady=5)
         conf_spin = tk.Spinbox(scrollable_frame, from_=0.0, to=1.0, increment=0.05, width=10)
-        conf_val = self.config.get(f"bbox_conf_{cam_idx}", "0.5")
+        conf_val = getattr(self.config.typed, f"bbox_conf_{cam_idx}")
         conf_spin.delete(0, "end")
         conf_spin.insert(0, conf_val)
         conf_spin.grid(row=row, column=1, padx=10, pady=5)
@@ -156,42 +167,67 @@ class SettingsWindow(tk.Toplevel):
         row += 1
 
         verbose_var = tk.BooleanVar()
-        verbose_var.set(bool(self.config.get("interface_verbose", False)))
+        verbose_var.set(self.config.typed.interface_verbose)
         verbose_toggle = tk.Checkbutton(scrollable_frame, text="Verbose Mode (Show all camera AI responses)",
                                        variable=verbose_var, bg="#1e1e1e", fg="white", selectcolor="#1e1e1e")
         verbose_toggle.grid(row=row, column=0, columnspan=2, padx=10, pady=5, sticky="w")
         self.widget_refs["interface_verbose"] = verbose_var
         row += 1
 
+        add_labeled_entry("Detector Model (.onnx / .caffemodel / .weights)", "detector_model")
+        add_labeled_entry("Detector Config (optional)", "detector_config")
+        add_labeled_entry("Detector Classes (file or comma list)", "detector_classes")
+
+        for key, text in (("metrics_enabled", "Collect per-stage latency metrics"),
+                          ("metrics_overlay", "Show metrics overlay in the sidebar")):
+            var = tk.BooleanVar()
+            var.set(getattr(self.config.typed, key))
+            tk.Checkbutton(scrollable_frame, text=text, variable=var, bg="#1e1e1e", fg="white",
+                           selectcolor="#1e1e1e").grid(row=row, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+            self.widget_refs[key] = var
+            row += 1
+        add_labeled_entry("Metrics Log (JSON lines file, optional)", "metrics_log")
+        add_labeled_entry("Arm Transport (log / tcp:HOST:PORT / serial:DEVICE[@baud])", "arm_transport")
+        add_labeled_entry("Arm Max Speed (units/s)", "arm_max_speed")
+        add_labeled_entry("Arm Max Acceleration (units/s²)", "arm_max_accel")
+        add_labeled_entry("Arm Waypoint Rate (Hz)", "arm_rate_hz")
+
         save_btn = tk.Button(scrollable_frame, text="Save Settings", bg="#333", fg="white",
                              command=self.save_interface_settings)
         save_btn.grid(row=row, column=0, columnspan=2, pady=15)
 
     def save_camera_settings(self, cam_idx):
-        for key in [f"llava_endpoint_{cam_idx}", f"camera_name_{cam_idx}", f"model_{cam_idx}", f"personality_{cam_idx}", f"apikey_{cam_idx}", f"fps_{cam_idx}",
-                    f"autoprompt_{cam_idx}", f"autointerval_{cam_idx}", f"roles_{cam_idx}", f"bbox_labels_{cam_idx}",
+        values = {}
+        for key in [f"llava_endpoint_{cam_idx}", f"camera_name_{cam_idx}", f"model_{cam_idx}", f"personality_{cam_idx}", f"apikey_{cam_idx}", f"fps_{cam_idx}", f"source_{cam_idx}",
+                    f"upload_max_side_{cam_idx}", f"upload_quality_{cam_idx}", f"upload_format_{cam_idx}",
+                    f"autoprompt_{cam_idx}", f"response_cache_{cam_idx}", f"autointerval_{cam_idx}", f"roles_{cam_idx}", f"bbox_labels_{cam_idx}",
                     f"bbox_conf_{cam_idx}", f"bbox_behavior_{cam_idx}"]:
             widget = self.widget_refs[key]
             if isinstance(widget, tk.Entry) or isinstance(widget, tk.Spinbox):
-                self.config[key] = widget.get()
+                values[key] = widget.get()
             elif isinstance(widget, tk.BooleanVar):
-                self.config[key] = widget.get()
+                values[key] = widget.get()
             elif isinstance(widget, tk.Text):
-                self.config[key] = widget.get("1.0", "end-1c")
-        save_config(self.config)
+                values[key] = widget.get("1.0", "end-1c")
+        # One update: subscribers hear about it once, the store saves it in the background
+        self.config.update(values)
         self.live_update_callback()
         self.show_toast(f"Camera {cam_idx+1} settings saved")
 
     def save_interface_settings(self):
-        for key in ["interface_model", "interface_personality", "interface_apikey", "interface_roles", "interface_verbose"]:
+        values = {}
+        for key in ["interface_model", "interface_personality", "interface_apikey", "interface_roles", "interface_verbose",
+                    "detector_model", "detector_config", "detector_classes",
+                    "metrics_enabled", "metrics_overlay", "metrics_log", "arm_transport",
+                    "arm_max_speed", "arm_max_accel", "arm_rate_hz"]:
             widget = self.widget_refs[key]
             if isinstance(widget, tk.Entry):
-                self.config[key] = widget.get()
+                values[key] = widget.get()
             elif isinstance(widget, tk.BooleanVar):
-                self.config[key] = widget.get()
+                values[key] = widget.get()
             elif isinstance(widget, tk.Text):
-                self.config[key] = widget.get("1.0", "end-1c")
-        save_config(self.config)
+                values[key] = widget.get("1.0", "end-1c")
+        self.config.update(values)
         self.live_update_callback()
         self.show_toast("Interface AI settings saved")
 
@@ -0,0 +1,68 @@
+import itertools
+import threading
+import time
+
+from metrics import metrics
+
+
+class StatusStream:
+    """One streamed reply in the status box.
+
+    Worker threads call ``push`` for every token; the text is batched and
+    inserted on the Tk thread at most once per ``flush_ms`` so a fast stream
+    cannot flood the event loop.  The reply gets its own line, anchored by a
+    Text mark, so other status messages can still be printed meanwhile.
+    """
+
+    _ids = itertools.count()
+
+    def __init__(self, text_widget, flush_ms=50):
+        self.text = text_widget
+        self.flush_ms = flush_ms
+        self.mark = f"stream{next(self._ids)}"
+        self._pending = []
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._done = False
+        self.received = False
+        self.started = time.perf_counter()
+        self.time_to_first_token = None
+
+        # Reserve a line (Tk thread); right gravity keeps the mark after inserted text
+        self.text.insert("end", "\n")
+        self.text.mark_set(self.mark, "end-2c")
+        self.text.mark_gravity(self.mark, "right")
+
+    # Called from worker threads ------------------------------------------------
+    def push(self, delta):
+        with self._lock:
+            if not self.received:
+                self.received = True
+                self.time_to_first_token = time.perf_counter() - self.started
+                metrics.observe("gui_first_token", self.time_to_first_token)
+            self._pending.append(delta)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.text.after(self.flush_ms, self._flush)
+
+    def finish(self, full_text):
+        self.text.after(0, lambda: self._finish(full_text))
+
+    # Tk thread -----------------------------------------------------------------
+    def _flush(self):
+        with self._lock:
+            chunk = "".join(self._pending)
+            self._pending.clear()
+            self._scheduled = False
+        if chunk and not self._done:
+            self.text.insert(self.mark, chunk)
+            self.text.see(self.mark)
+
+    def _finish(self, full_text):
+        self._flush()
+        if not self.received:
+            self.text.insert(self.mark, full_text)
+        self._done = True
+        self.text.see(self.mark)
+        self.text.mark_unset(self.mark)
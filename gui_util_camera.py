@@ -1,12 +1,140 @@
+"""Camera discovery.
+
+Devices are probed in parallel, each probe bounded by a timeout, with the
+capture backend that fits the platform (V4L2 on Linux, DirectShow on
+Windows, AVFoundation on macOS).  On Linux only existing /dev/video* capture
+nodes are tried.  The indices found last time are cached next to the config
+file, so a warm start only opens those.  Probes hand back the opened
+captures, so the camera grid does not open every device a second time.
+"""
+import glob, json, os, re, sys, threading, time
+
 import cv2
 
+from config_utils import CONFIG_PATH
+
+CACHE_PATH = CONFIG_PATH.parent / "camera_cache.json"
+FRAME_SIZE = (640, 480)
+
+
+def camera_backend():
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "win32":
+        return cv2.CAP_DSHOW
+    if sys.platform == "darwin":
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+
+def candidate_indices(max_test=10):
+    """Indices worth probing; on Linux only /dev/video* nodes that capture video."""
+    if not sys.platform.startswith("linux"):
+        return list(range(max_test))
+    indices = []
+    for path in glob.glob("/dev/video*"):
+        m = re.fullmatch(r"/dev/video(\d+)", path)
+        if not m:
+            continue
+        idx = int(m.group(1))
+        try:  # UVC cameras also expose metadata nodes (index 1) that never deliver frames
+            with open(f"/sys/class/video4linux/video{idx}/index") as f:
+                if f.read().strip() != "0":
+                    continue
+        except OSError:
+            pass
+        indices.append(idx)
+    return sorted(indices)[:max_test]
+
+
+def open_camera(index, backend=None, size=FRAME_SIZE):
+    """Open one device and read a frame; returns the capture or None."""
+    cap = cv2.VideoCapture(index, camera_backend() if backend is None else backend)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+    ret, _ = cap.read()
+    if not ret:
+        cap.release()
+        return None
+    return cap
+
+
+def _probe_all(indices, backend, timeout):
+    """Open ``indices`` concurrently; probes still running after ``timeout`` are abandoned."""
+    results = {}
+    lock = threading.Lock()
+    abandoned = threading.Event()
+
+    def probe(index):
+        cap = open_camera(index, backend)
+        with lock:
+            if abandoned.is_set():
+                if cap is not None:
+                    cap.release()  # finished too late; nobody will use it
+                return
+            results[index] = cap
+
+    threads = [threading.Thread(target=probe, args=(i,), name=f"probe-{i}", daemon=True)
+               for i in indices]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + timeout
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    with lock:
+        abandoned.set()
+        return {i: results[i] for i in sorted(results) if results[i] is not None}
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH, "r") as f:
+            data = json.load(f)
+        if data.get("platform") == sys.platform:
+            return [int(i) for i in data.get("indices", [])]
+    except (OSError, ValueError, TypeError):
+        pass
+    return None
+
+
+def _save_cache(indices):
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_PATH.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"platform": sys.platform, "indices": list(indices)}, f)
+        os.replace(tmp, CACHE_PATH)
+    except OSError:
+        pass
+
+
+def open_cameras(max_test=10, timeout=3.0, refresh=False):
+    """Discover cameras and return ``{index: opened VideoCapture}``.
+
+    With a cached device set (and ``refresh`` off) only those devices are
+    opened; a full probe only runs when one of them has gone missing.
+    """
+    backend = camera_backend()
+    cached = None if refresh else _load_cache()
+    if cached:
+        caps = _probe_all(cached, backend, timeout)
+        if len(caps) == len(cached):
+            return caps
+        others = [i for i in candidate_indices(max_test) if i not in caps]
+        caps.update(_probe_all(others, backend, timeout))
+        caps = dict(sorted(caps.items()))
+    else:
+        caps = _probe_all(candidate_indices(max_test), backend, timeout)
+    _save_cache(list(caps))
+    return caps
+
+
 def detect_cameras(max_test=10):
-    available = []
-    for i in range(max_test):
-        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-        if cap.isOpened():
-            ret, _ = cap.read()
-            if ret:
-                available.append(i)
-            cap.release()
-    return available
+    """Indices of the working cameras (devices are released again)."""
+    caps = open_cameras(max_test)
+    for cap in caps.values():
+        cap.release()
+    return list(caps)
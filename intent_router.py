@@ -0,0 +1,178 @@
+"""Compiled keyword matcher for prompt routing.
+
+All routing keywords from ``dictionary.py`` are compiled once at import into
+an Aho-Corasick automaton, so one pass over the prompt finds every keyword
+and camera reference and scores every intent at the same time.  The cost of
+that pass depends on the prompt length, not on how many keywords there are.
+Matches must sit on word boundaries (optionally followed by a plural / verb
+suffix), so "scan" no longer fires on "scandal".  Overlapping matches resolve
+to the leftmost-longest phrase, and per-keyword weights decide between
+intents that share a phrase.
+"""
+import re
+import threading
+from collections import deque
+from typing import NamedTuple, Optional
+
+from dictionary import (CAMERA_KEYWORDS, TRIANGULATION_KEYWORDS, ARM_KEYWORDS, MOTION_KEYWORDS,
+                        MOTION_DESCRIBE_KEYWORDS, KEYWORD_WEIGHTS)
+
+INTENT_KEYWORDS = {
+    "camera": CAMERA_KEYWORDS,
+    "triangulation": TRIANGULATION_KEYWORDS,
+    "arm": ARM_KEYWORDS,
+    "motion": MOTION_KEYWORDS,
+}
+# Tie-break order when two intents score the same (matches the old if/elif chain)
+INTENT_PRIORITY = ("camera", "triangulation", "arm", "motion")
+
+_SPACES = re.compile(r"\s+")
+_SUFFIXES = ("ing", "es", "ed", "s")
+
+
+class IntentMatch(NamedTuple):
+    intent: Optional[str]   # None -> general chat
+    scores: dict
+    camera: Optional[int]   # camera explicitly referenced, if any
+
+
+def _normalize(phrase):
+    return _SPACES.sub(" ", phrase.strip().lower())
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class CompiledMatcher:
+    """Aho-Corasick automaton over a phrase -> [(target, weight)] table."""
+
+    def __init__(self, table):
+        self.table = table
+        goto, fail, out = [{}], [0], [()]
+        for phrase in table:
+            state = 0
+            for ch in phrase:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                state = nxt
+            out[state] = (phrase,)
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def _matches(self, text):
+        """Leftmost-longest, non-overlapping, word-bounded (start, end, phrase)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        state = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for phrase in out[state]:
+                start, end = i + 1 - len(phrase), i + 1
+                if start and _is_word(text[start - 1]):
+                    continue
+                if end < n and _is_word(text[end]):
+                    for suffix in _SUFFIXES:
+                        stop = end + len(suffix)
+                        if text.startswith(suffix, end) and (stop == n or not _is_word(text[stop])):
+                            end = stop
+                            break
+                    else:
+                        continue
+                found.append((start, end, phrase))
+
+        found.sort(key=lambda m: (m[0], m[0] - m[1]))
+        picked, last_end = [], 0
+        for start, end, phrase in found:
+            if start >= last_end:
+                picked.append(phrase)
+                last_end = end
+        return picked
+
+    def scan(self, prompt_lc):
+        scores, cameras = {}, {}
+        for phrase in self._matches(_normalize(prompt_lc)):
+            for target, weight in self.table[phrase]:
+                if isinstance(target, int):
+                    cameras[target] = cameras.get(target, 0.0) + weight
+                else:
+                    scores[target] = scores.get(target, 0.0) + weight
+        return scores, cameras
+
+
+class IntentRouter:
+    def __init__(self, intent_keywords=INTENT_KEYWORDS, weights=KEYWORD_WEIGHTS,
+                 priority=INTENT_PRIORITY):
+        self.priority = priority
+        self.base_table = {}
+        for intent, keywords in intent_keywords.items():
+            for kw in keywords:
+                phrase = _normalize(kw)
+                targets = self.base_table.setdefault(phrase, [])
+                if any(t == intent for t, _ in targets):
+                    continue  # duplicate keyword in the same list
+                weight = weights.get(phrase, {}).get(intent, float(len(phrase.split())))
+                targets.append((intent, weight))
+        self._base = CompiledMatcher(self.base_table)
+        self._by_cameras = {}
+        self._lock = threading.Lock()
+
+    def _matcher(self, camera_names):
+        """Matcher that also knows the given {cam_id: name} references (cached)."""
+        if not camera_names:
+            return self._base
+        key = tuple(sorted(camera_names.items()))
+        matcher = self._by_cameras.get(key)
+        if matcher is not None:
+            return matcher
+        table = {p: list(t) for p, t in self.base_table.items()}
+        for cam_id, name in camera_names.items():
+            refs = {f"camera {cam_id + 1}", f"cam {cam_id + 1}"}
+            if name:
+                refs.add(_normalize(name))
+            for ref in refs:
+                targets = table.setdefault(ref, [])
+                if not any(t == cam_id for t, _ in targets):
+                    targets.append((cam_id, 1.0))
+                # A reference like "camera 2" swallows the "camera" keyword; keep its intent weight
+                for word in ref.split():
+                    for target, weight in self.base_table.get(word, []):
+                        if ref != word and not any(t == target for t, _ in targets):
+                            targets.append((target, weight))
+        matcher = CompiledMatcher(table)
+        with self._lock:
+            if len(self._by_cameras) > 16:
+                self._by_cameras.clear()
+            self._by_cameras[key] = matcher
+        return matcher
+
+    def route(self, prompt, camera_names=None):
+        scores, cameras = self._matcher(camera_names).scan(prompt.lower())
+        intent = None
+        if scores:
+            rank = {name: i for i, name in enumerate(self.priority)}
+            intent = max(scores, key=lambda i: (scores[i], -rank.get(i, len(rank))))
+        camera = max(cameras, key=cameras.get) if cameras else None
+        return IntentMatch(intent, scores, camera)
+
+
+intent_router = IntentRouter()
+# Does a motion prompt ask what the moving thing is (needs a camera AI)?
+describe_router = IntentRouter({"describe": MOTION_DESCRIBE_KEYWORDS})
@@ -0,0 +1,398 @@
+"""Per-stage latency instrumentation.
+
+One process-wide ``metrics`` registry collects
+
+* stage timings (``timer`` / ``timed``) as histograms, one series per stage
+  and label set: capture, encode, base64, camera / interface requests and
+  their first token, coordinate parsing, triangulation, arm commands, the
+  GUI preview tick and whole prompts,
+* counters (``incr``) and gauges (``gauge`` / ``inflight``).
+
+Everything is a no-op while ``metrics_enabled`` is off: ``timer`` hands
+back a shared do-nothing context manager and ``timed`` functions call
+straight through, so the cost is one attribute check per call.
+
+Prompts run inside a ``trace``: every stage timed while answering it (on the
+event loop or in ``asyncio.to_thread``) is also added to the trace, and with
+``metrics_log`` set each finished prompt is written as one JSON line with
+its stage breakdown, plus a summary line every ``metrics_log_interval``
+seconds.  ``prometheus()`` renders the registry in the Prometheus text
+format (the service serves it on ``/metrics?format=prometheus``).
+"""
+import asyncio, contextvars, functools, inspect, json, math, queue, threading, time
+from collections import deque
+
+from config_store import ConfigStore
+
+# Histogram buckets in seconds (Prometheus ``le`` bounds)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "waldo_"
+
+_trace = contextvars.ContextVar("waldo_trace", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Series:
+    """Histogram of one stage + label set, with a window of recent samples."""
+
+    __slots__ = ("counts", "total", "count", "max", "recent")
+
+    def __init__(self, window=512):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.recent)
+
+        def q(p):
+            return round(ordered[min(len(ordered) - 1, int(p * (len(ordered) - 1) + 0.5))] * 1e3, 3)
+        return {"count": self.count, "mean_ms": round(self.total / self.count * 1e3, 3),
+                "p50_ms": q(0.5), "p95_ms": q(0.95), "max_ms": round(self.max * 1e3, 3)}
+
+
+class _Noop:
+    """Stands in for timers, traces and in-flight gauges while disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+_NOOP = _Noop()
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None and not issubclass(exc_type, (GeneratorExit, asyncio.CancelledError)):
+            self.registry.incr("stage_errors", stage=self.name)
+        return False
+
+
+class _Inflight:
+    __slots__ = ("registry", "key")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.key = _key(name, labels)
+
+    def __enter__(self):
+        self.registry._add_gauge(self.key, 1)
+        return self
+
+    def __exit__(self, *exc):
+        self.registry._add_gauge(self.key, -1)
+        return False
+
+
+class Trace:
+    """Stage timings of one prompt; see ``Metrics.trace``."""
+
+    def __init__(self, registry, kind, labels):
+        self.registry = registry
+        self.kind = kind
+        self.labels = dict(labels)
+        self.stages = {}  # stage -> [ms, ...]
+        self.error = None
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def add(self, name, seconds):
+        self.stages.setdefault(name, []).append(round(seconds * 1e3, 3))
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _trace.set(self)
+        self.registry._add_gauge(_key(f"{self.kind}s_in_flight", {}), 1)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        _trace.reset(self._token)
+        registry = self.registry
+        registry._add_gauge(_key(f"{self.kind}s_in_flight", {}), -1)
+        if exc_type is not None:
+            self.error = "cancelled" if issubclass(exc_type, asyncio.CancelledError) else exc_type.__name__
+        registry.observe(self.kind, elapsed, _trace_stage=False, **self.labels)
+        registry.incr(f"{self.kind}s", **self.labels, outcome=self.error or "ok")
+        registry._log({"ts": round(time.time(), 3), "trace": self.kind, **self.labels,
+                       "total_ms": round(elapsed * 1e3, 3), "error": self.error,
+                       "stages": self.stages})
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.overlay = False
+        self._series = {}    # (name, labels) -> _Series
+        self._counters = {}  # (name, labels) -> number
+        self._gauges = {}    # (name, labels) -> number
+        self._lock = threading.Lock()
+        self._log_path = None
+        self._log_interval = 10.0
+        self._log_queue = None
+        self._writer = None
+
+    # ------------------------------------------------------------- config
+    def sync(self, config_data):
+        """Apply ``metrics_enabled``, ``metrics_overlay``, ``metrics_log`` and
+        ``metrics_log_interval``."""
+        typed = ConfigStore.wrap(config_data).typed
+        self.enabled = typed.metrics_enabled
+        self.overlay = self.enabled and typed.metrics_overlay
+        self._log_interval = typed.metrics_log_interval
+        path = str(config_data.get("metrics_log", "") or "").strip() if self.enabled else ""
+        if path != (self._log_path or ""):
+            self._stop_writer()
+            if path:
+                self._start_writer(path)
+
+    def close(self):
+        self._stop_writer()
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    # ----------------------------------------------------------- recording
+    def timer(self, name, **labels):
+        """Context manager timing one stage."""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorator timing every call of a function or coroutine function."""
+        def decorate(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    with _Timer(self, name, labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self, name, labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name, seconds, _trace_stage=True, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.add(seconds)
+        if _trace_stage:
+            trace = _trace.get()
+            if trace is not None:
+                trace.add(name, seconds)
+
+    def incr(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def inflight(self, name, **labels):
+        """Context manager counting concurrent holders in gauge ``name``."""
+        if not self.enabled:
+            return _NOOP
+        return _Inflight(self, name, labels)
+
+    def _add_gauge(self, key, delta):
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def trace(self, kind="prompt", **labels):
+        """Context manager collecting the stages of one request (see module doc)."""
+        if not self.enabled:
+            return _NOOP
+        return Trace(self, kind, labels)
+
+    # ------------------------------------------------------------- reading
+    def stage(self, name, **labels):
+        """Summary (count, mean/p50/p95/max ms) of one series, or None."""
+        with self._lock:
+            series = self._series.get(_key(name, labels))
+            return series.summary() if series and series.count else None
+
+    def series(self, name):
+        """Summaries of every label set of stage ``name``: [(labels dict, summary)]."""
+        with self._lock:
+            return [(dict(labels), s.summary()) for (n, labels), s in sorted(self._series.items())
+                    if n == name and s.count]
+
+    def gauge_value(self, name, default=None, **labels):
+        with self._lock:
+            return self._gauges.get(_key(name, labels), default)
+
+    def snapshot(self):
+        with self._lock:
+            stages = [{"stage": name, "labels": dict(labels), **series.summary()}
+                      for (name, labels), series in sorted(self._series.items()) if series.count]
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            gauges = [{"name": name, "labels": dict(labels), "value": value}
+                      for (name, labels), value in sorted(self._gauges.items())]
+        return {"enabled": self.enabled, "stages": stages, "counters": counters, "gauges": gauges}
+
+    def prometheus(self, extra_gauges=None, extra_counters=None):
+        """The registry in Prometheus text format, plus ``extra_gauges`` and
+        ``extra_counters`` ({name: value}; counters only ever grow and are
+        exported as ``<name>_total``)."""
+        with self._lock:
+            series = sorted(self._series.items())
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        for name, value in (extra_gauges or {}).items():
+            gauges[_key(name, {})] = value
+        for name, value in (extra_counters or {}).items():
+            counters[_key(name, {})] = value
+        counters = sorted(counters.items())
+
+        lines = []
+        if series:
+            lines.append(f"# TYPE {PREFIX}stage_seconds histogram")
+        for (name, labels), s in series:
+            base = (("stage", name),) + labels
+            cumulative = 0
+            for bound, n in zip(BUCKETS, s.counts):
+                cumulative += n
+                lines.append(f"{PREFIX}stage_seconds_bucket{_label_text(base, [('le', _fmt(bound))])} {cumulative}")
+            lines.append(f"{PREFIX}stage_seconds_bucket{_label_text(base, [('le', '+Inf')])} {s.count}")
+            lines.append(f"{PREFIX}stage_seconds_sum{_label_text(base)} {_fmt(s.total)}")
+            lines.append(f"{PREFIX}stage_seconds_count{_label_text(base)} {s.count}")
+
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name}_total counter")
+            lines.append(f"{PREFIX}{name}_total{_label_text(labels)} {_fmt(value)}")
+        for (name, labels), value in sorted(gauges.items()):
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} gauge")
+            lines.append(f"{PREFIX}{name}{_label_text(labels)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+    # -------------------------------------------------------- JSON lines
+    def _log(self, record):
+        q = self._log_queue
+        if q is not None:
+            q.put(record)
+
+    def _start_writer(self, path):
+        self._log_path = path
+        self._log_queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, args=(path, self._log_queue),
+                                        name="metrics-log", daemon=True)
+        self._writer.start()
+
+    def _stop_writer(self):
+        q, writer = self._log_queue, self._writer
+        self._log_path = self._log_queue = self._writer = None
+        if q is not None:
+            q.put(None)
+            writer.join(2)
+
+    def _write_loop(self, path, q):
+        """Append queued records in batches; a summary line every interval."""
+        next_summary = time.monotonic() + self._log_interval if self._log_interval else None
+        try:
+            f = open(path, "a", encoding="utf-8")
+        except OSError as e:
+            print(f"[Metrics] Cannot open {path}: {e}")
+            return
+        with f:
+            while True:
+                timeout = None if next_summary is None else max(0.0, next_summary - time.monotonic())
+                try:
+                    record = q.get(timeout=timeout)
+                except queue.Empty:
+                    record = ...
+                batch = [record]
+                while True:
+                    try:
+                        batch.append(q.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in batch
+                for record in batch:
+                    if isinstance(record, dict):
+                        f.write(json.dumps(record) + "\n")
+                if next_summary is not None and (stop or time.monotonic() >= next_summary):
+                    next_summary = time.monotonic() + self._log_interval
+                    f.write(json.dumps({"ts": round(time.time(), 3), "summary": self.snapshot()}) + "\n")
+                f.flush()
+                if stop:
+                    return
+
+
+metrics = Metrics()
@@ -0,0 +1,199 @@
+"""Always-on motion detection with a queryable event index.
+
+One background thread samples every camera's newest frame at a low rate
+(``motion_rate_hz``), shrinks it to a small grayscale image and compares it
+with a running-average background (``cv2.accumulateWeighted``).  When more
+than ``motion_min_area`` of the view changed, a motion event is opened or
+extended; it closes after ``quiet_s`` without motion.  Events (time span,
+peak magnitude, changed region) are kept in memory so questions such as
+"is anything moving?" are answered locally instead of by a camera AI.
+
+At 5 Hz and 160 px wide this costs well under a millisecond per camera and
+sample; ``load()`` reports the measured share of one core.
+"""
+import threading, time
+from collections import deque
+from dataclasses import dataclass, replace
+
+import cv2
+import numpy as np
+
+from config_store import ConfigStore
+
+
+@dataclass
+class MotionEvent:
+    cam_id: int
+    start: float          # wall-clock seconds
+    end: float            # last sample with motion
+    peak: float           # largest changed fraction of the view (0-1)
+    region: tuple         # x, y, w, h in frame pixels (union of changed areas)
+    frame_size: tuple     # w, h of the camera frame
+    samples: int = 1
+    active: bool = True
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def where(self):
+        """Rough position of the region in words, e.g. 'upper left'."""
+        x, y, w, h = self.region
+        fw, fh = self.frame_size
+        cx, cy = (x + w / 2) / fw, (y + h / 2) / fh
+        row = "upper" if cy < 1 / 3 else "lower" if cy > 2 / 3 else "middle"
+        col = "left" if cx < 1 / 3 else "right" if cx > 2 / 3 else "centre"
+        return "centre" if (row, col) == ("middle", "centre") else f"{row} {col}"
+
+
+class _CameraState:
+    __slots__ = ("seq", "background", "event", "busy_s")
+
+    def __init__(self):
+        self.seq = 0
+        self.background = None
+        self.event = None
+        self.busy_s = 0.0
+
+
+class MotionDetector(threading.Thread):
+    """Samples every camera in ``frames`` and indexes motion events."""
+
+    def __init__(self, frames, rate_hz=5.0, width=160, threshold=25, min_area=0.005,
+                 alpha=0.05, quiet_s=1.5, max_events=500):
+        super().__init__(name="motion", daemon=True)
+        self.frames = frames
+        self.period = 1.0 / max(0.5, float(rate_hz))
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.alpha = alpha
+        self.quiet_s = quiet_s
+        self._events = deque(maxlen=max_events)  # closed events, oldest first
+        self._cams = {}
+        self._lock = threading.Lock()
+        self._stop_evt = threading.Event()
+        self._started_at = time.monotonic()
+
+    @classmethod
+    def from_config(cls, frames, config_data):
+        typed = ConfigStore.wrap(config_data).typed
+        return cls(frames, rate_hz=typed.motion_rate_hz, threshold=typed.motion_threshold,
+                   min_area=typed.motion_min_area)
+
+    # --------------------------------------------------------------- sampling
+    def run(self):
+        next_tick = time.monotonic()
+        while not self._stop_evt.is_set():
+            for cam_id in self.frames.cameras():
+                self._sample(cam_id)
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop_evt.wait(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def stop(self):
+        self._stop_evt.set()
+
+    def _sample(self, cam_id):
+        state = self._cams.get(cam_id)
+        if state is None:
+            state = self._cams[cam_id] = _CameraState()
+        seq = self.frames.latest_seq(cam_id)
+        if seq == state.seq:
+            self._close_if_quiet(state, time.time())
+            return
+        view = self.frames.read(cam_id)
+        if view is None:
+            return
+        t0 = time.perf_counter()
+        with view:
+            state.seq = view.seq
+            frame_h, frame_w = view.frame.shape[:2]
+            small = cv2.resize(view.frame, (self.width, max(1, frame_h * self.width // frame_w)),
+                               interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if state.background is None or state.background.shape != gray.shape:
+            state.background = gray.astype(np.float32)
+        else:
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(state.background))
+            _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+            changed = cv2.countNonZero(mask) / mask.size
+            cv2.accumulateWeighted(gray, state.background, self.alpha)
+            now = time.time()
+            if changed >= self.min_area:
+                x, y, w, h = cv2.boundingRect(cv2.dilate(mask, None, iterations=2))
+                scale = frame_w / self.width
+                region = (int(x * scale), int(y * scale), int(w * scale), int(h * scale))
+                self._record(state, cam_id, now, changed, region, (frame_w, frame_h))
+            else:
+                self._close_if_quiet(state, now)
+        state.busy_s += time.perf_counter() - t0
+
+    def _record(self, state, cam_id, now, changed, region, frame_size):
+        with self._lock:
+            event = state.event
+            if event is None:
+                state.event = MotionEvent(cam_id, now, now, changed, region, frame_size)
+                return
+            x0, y0 = min(event.region[0], region[0]), min(event.region[1], region[1])
+            x1 = max(event.region[0] + event.region[2], region[0] + region[2])
+            y1 = max(event.region[1] + event.region[3], region[1] + region[3])
+            event.region = (x0, y0, x1 - x0, y1 - y0)
+            event.end = now
+            event.peak = max(event.peak, changed)
+            event.samples += 1
+
+    def _close_if_quiet(self, state, now):
+        event = state.event
+        if event is not None and now - event.end > self.quiet_s:
+            with self._lock:
+                event.active = False
+                self._events.append(event)
+                state.event = None
+
+    # ----------------------------------------------------------------- queries
+    def events(self, cam_ids=None, since=None):
+        """Closed and ongoing events (copies), oldest first."""
+        with self._lock:
+            found = list(self._events) + [s.event for s in self._cams.values() if s.event]
+        found = [replace(e) for e in found
+                 if (cam_ids is None or e.cam_id in cam_ids) and (since is None or e.end >= since)]
+        return sorted(found, key=lambda e: e.start)
+
+    def moving(self, cam_id):
+        state = self._cams.get(cam_id)
+        return bool(state and state.event)
+
+    def latest(self, cam_ids=None):
+        found = self.events(cam_ids)
+        return max(found, key=lambda e: e.end) if found else None
+
+    def load(self):
+        """Share of one core spent per camera since start (0-1)."""
+        elapsed = max(1e-6, time.monotonic() - self._started_at)
+        return {cam_id: state.busy_s / elapsed for cam_id, state in self._cams.items()}
+
+    def summary(self, cam_ids, names, window_s=60.0):
+        """Plain-text answer for 'is anything moving?' style questions."""
+        now = time.time()
+        lines = []
+        for cam_id in cam_ids:
+            name = names.get(cam_id, f"camera {cam_id + 1}")
+            recent = self.events([cam_id], since=now - window_s)
+            ongoing = [e for e in recent if e.active]
+            if ongoing:
+                e = ongoing[-1]
+                lines.append(f"{name}: movement right now in the {e.where()} "
+                             f"({e.peak:.0%} of the view, for {e.duration:.0f}s).")
+            elif recent:
+                e = recent[-1]
+                lines.append(f"{name}: no movement now; {len(recent)} motion event(s) in the last "
+                             f"{window_s:.0f}s, the last {now - e.end:.0f}s ago in the {e.where()}.")
+            else:
+                lines.append(f"{name}: no movement in the last {window_s:.0f}s.")
+        return "\n".join(lines) if lines else "No cameras are being watched for motion."
@@ -2,17 +2,24 @@
 print("Loaded NEW interface_ai_handler.py with OpenAI integration!")
 
 
-from openai import OpenAI, APIError
+import asyncio
+import time
+
+from openai import APIError
+
+from ai_client_pool import get_client, get_async_client
+from metrics import metrics
 
 class InterfaceAI:
     def __init__(self, api_key, model, endpoint):
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=endpoint
-        )
+        # Shares the connection pool with camera AIs on the same endpoint
+        self.client = get_client(endpoint, api_key)
+        self.endpoint = endpoint
+        self.api_key = api_key
         self.model = model
 
-    def chat(self, prompt, system_message=None):
+    @staticmethod
+    def _messages(prompt, system_message=None):
         messages = []
         if system_message:
             messages.append({"role": "system", "content": system_message})
@@ -21,15 +28,65 @@ class InterfaceAI:
             messages.extend(prompt)
         else:
             messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @staticmethod
+    def _first_token(timer):
+        start = getattr(timer, "start", None)  # no-op timers have none
+        if start is not None:
+            metrics.observe("interface_first_token", time.perf_counter() - start)
 
+    def chat(self, prompt, system_message=None):
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=300,
-            )
+            with metrics.timer("interface_request"), metrics.inflight("interface_requests_in_flight"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt, system_message),
+                    max_tokens=300,
+                )
             return response.choices[0].message.content
         except APIError as e:
             return f"[Error in interface AI]: {str(e)}"
         except Exception as e:
             return f"[Error in interface AI]: {str(e)}"
+
+    # Async variants (run on the router's event loop) ----------------------
+    async def achat(self, prompt, system_message=None):
+        client = get_async_client(self.endpoint, self.api_key)
+        try:
+            with metrics.timer("interface_request"), metrics.inflight("interface_requests_in_flight"):
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt, system_message),
+                    max_tokens=300,
+                )
+            return response.choices[0].message.content
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return f"[Error in interface AI]: {str(e)}"
+
+    async def achat_stream(self, prompt, system_message=None):
+        """Like ``achat`` but yields text deltas as they arrive."""
+        client = get_async_client(self.endpoint, self.api_key)
+        try:
+            with metrics.timer("interface_request") as timer, \
+                    metrics.inflight("interface_requests_in_flight"):
+                stream = await client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt, system_message),
+                    max_tokens=300,
+                    stream=True,
+                )
+                first = True
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if first:
+                            first = False
+                            self._first_token(timer)
+                        yield delta
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield f"[Error in interface AI]: {str(e)}"
@@ -0,0 +1,255 @@
+"""Local CPU object detection for the per-camera bbox_* settings.
+
+An OpenCV DNN detection model (anything ``cv2.dnn_DetectionModel`` loads:
+SSD / Faster R-CNN in Caffe, TensorFlow or ONNX form, darknet YOLO) runs in
+a separate worker process so inference never competes with the Tk thread or
+the router's event loop for the GIL.  Frames go over a pipe, boxes come back.
+
+Config keys (global):
+    detector_model     model weights (.onnx / .caffemodel / .pb / .weights);
+                       empty disables detection
+    detector_config    optional network description (.prototxt / .pbtxt / .cfg)
+    detector_classes   class names file (one per line) or a comma list
+    detector_input_size, detector_scale, detector_swap_rb, detector_nms
+Per camera:
+    bbox_labels_N      labels this camera reports (comma separated)
+    bbox_conf_N        minimum box confidence
+"""
+import multiprocessing as mp
+import os
+import re
+import threading
+from typing import NamedTuple
+
+from config_store import ConfigStore
+
+
+class Detection(NamedTuple):
+    label: str
+    confidence: float
+    box: tuple  # x, y, w, h in frame pixels
+
+    @property
+    def center(self):
+        x, y, w, h = self.box
+        return x + w // 2, y + h // 2
+
+
+def detection_labels(config_data, cam_id):
+    """Labels configured for a camera (lower case)."""
+    raw = config_data.get(f"bbox_labels_{cam_id}", "") or ""
+    return [label.strip().lower() for label in raw.split(",") if label.strip()]
+
+
+def detection_conf(config_data, cam_id):
+    return getattr(ConfigStore.wrap(config_data).typed, f"bbox_conf_{cam_id}")
+
+
+def match_label(labels, text):
+    """The configured label named in ``text`` (longest first), or None."""
+    text = text.lower()
+    for label in sorted(labels, key=len, reverse=True):
+        if re.search(rf"\b{re.escape(label)}(?:e?s)?\b", text):
+            return label
+    return None
+
+
+def _load_classes(spec):
+    if not spec:
+        return []
+    if os.path.isfile(spec):
+        with open(spec, "r") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [name.strip() for name in spec.split(",")]
+
+
+# -----------------------------------------------------------------------------
+# Worker process
+# -----------------------------------------------------------------------------
+def _worker_main(conn, settings):
+    """Loads the model once, then answers (frame, conf, nms) requests until None."""
+    try:
+        import cv2
+        import numpy as np
+        if settings["config"]:
+            net = cv2.dnn_DetectionModel(settings["model"], settings["config"])
+        else:
+            net = cv2.dnn_DetectionModel(settings["model"])
+        size = settings["input_size"]
+        net.setInputParams(size=(size, size), scale=settings["scale"], swapRB=settings["swap_rb"])
+    except Exception as e:
+        conn.send(("error", f"could not load detector: {e}"))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        if msg is None:
+            break
+        frame, conf, nms = msg
+        try:
+            class_ids, scores, boxes = net.detect(frame, confThreshold=conf, nmsThreshold=nms)
+            out = [(int(c), float(s), tuple(int(v) for v in b))
+                   for c, s, b in zip(np.asarray(class_ids).reshape(-1),
+                                      np.asarray(scores).reshape(-1),
+                                      np.asarray(boxes).reshape(-1, 4))]
+            conn.send(("ok", out))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+# -----------------------------------------------------------------------------
+# Client
+# -----------------------------------------------------------------------------
+class ObjectDetector:
+    """Front end for the detector process; safe to call from any thread.
+
+    Requests are serialised over one pipe.  Results are cached per camera
+    frame (cam, seq), so several callers asking about the same frame cost
+    one inference.  A worker that stops answering is killed and restarted.
+    """
+
+    worker_target = staticmethod(_worker_main)
+
+    def __init__(self, timeout=2.0, load_timeout=30.0):
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        self.classes = []
+        self.nms = 0.4
+        self.error = None
+        self._settings = None
+        self._proc = None
+        self._conn = None
+        self._ready = False
+        self._cache = {}  # cam_id -> (seq, conf, [Detection])
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self._settings is not None and self.error is None
+
+    @staticmethod
+    def _settings_from(config_data):
+        model = (config_data.get("detector_model") or "").strip()
+        if not model:
+            return None
+        typed = ConfigStore.wrap(config_data).typed
+        return {
+            "model": model,
+            "config": (config_data.get("detector_config") or "").strip(),
+            "input_size": typed.detector_input_size,
+            "scale": typed.detector_scale,
+            "swap_rb": typed.detector_swap_rb,
+        }
+
+    def sync(self, config_data):
+        """Apply detector settings; the worker only restarts if the model changed."""
+        settings = self._settings_from(config_data)
+        with self._lock:
+            self.classes = _load_classes(config_data.get("detector_classes", ""))
+            self.nms = ConfigStore.wrap(config_data).typed.detector_nms
+            if settings == self._settings and self.error is None:
+                return
+            self._stop()
+            self._settings = settings
+            self.error = None
+            self._cache.clear()
+            if settings is not None:
+                self._start()
+
+    def _start(self):
+        ctx = mp.get_context("spawn")  # never fork a process that runs Tk and worker threads
+        self._conn, child = ctx.Pipe()
+        self._proc = ctx.Process(target=self.worker_target, args=(child, self._settings),
+                                 name="waldo-detector", daemon=True)
+        self._proc.start()
+        child.close()
+        self._ready = False
+
+    def _stop(self):
+        if self._proc is None:
+            return
+        try:
+            self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._proc.join(0.5)
+        if self._proc.is_alive():
+            self._proc.kill()
+            self._proc.join(0.5)
+        self._conn.close()
+        self._proc = self._conn = None
+        self._ready = False
+
+    def _wait_ready(self):
+        if self._ready:
+            return True
+        try:
+            if not self._conn.poll(self.load_timeout):
+                raise TimeoutError
+            kind, payload = self._conn.recv()
+        except (OSError, EOFError, TimeoutError):
+            kind, payload = "error", "detector process did not start"
+        if kind == "ready":
+            self._ready = True
+            return True
+        self.error = payload
+        print(f"[Detector] {self.error}")
+        self._stop()
+        return False
+
+    def _label(self, class_id):
+        return self.classes[class_id].lower() if 0 <= class_id < len(self.classes) else str(class_id)
+
+    def detect(self, cam_id, frame, seq=None, labels=None, min_conf=0.5):
+        """Boxes in ``frame`` for ``labels`` (all classes if None) at >= ``min_conf``."""
+        with self._lock:
+            cached = self._cache.get(cam_id)
+            if seq is not None and cached and cached[0] == seq and cached[1] <= min_conf:
+                found = cached[2]
+            else:
+                found = self._infer(frame, min_conf)
+                if found is None:
+                    return []
+                if seq is not None:
+                    self._cache[cam_id] = (seq, min_conf, found)
+        wanted = set(labels) if labels is not None else None
+        return [d for d in found
+                if d.confidence >= min_conf and (wanted is None or d.label in wanted)]
+
+    def _infer(self, frame, conf):
+        if not self.enabled or self._proc is None or not self._wait_ready():
+            return None
+        try:
+            self._conn.send((frame, conf, self.nms))
+            if not self._conn.poll(self.timeout):
+                raise TimeoutError(f"no detections within {self.timeout:g}s")
+            kind, payload = self._conn.recv()
+        except (OSError, EOFError, TimeoutError) as e:
+            print(f"[Detector] {e}; restarting worker")
+            self._stop()
+            self._start()
+            return None
+        if kind != "ok":
+            print(f"[Detector] {payload}")
+            return None
+        return [Detection(self._label(c), s, b) for c, s, b in payload]
+
+    def locate(self, cam_id, frame, label, seq=None, min_conf=0.5):
+        """Pixel centre of the most confident ``label`` box, or None."""
+        found = self.detect(cam_id, frame, seq, [label], min_conf)
+        if not found:
+            return None
+        return max(found, key=lambda d: d.confidence).center
+
+    def close(self):
+        with self._lock:
+            self._stop()
+            self._settings = None
+            self._cache.clear()
+
+
+object_detector = ObjectDetector()
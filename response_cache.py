@@ -0,0 +1,111 @@
+"""Answer cache for camera queries.
+
+Entries are keyed by camera and normalised prompt and remember a 64-bit
+difference hash (dHash) of the frame they were answered from.  A lookup hits
+when a fresh entry's hash is within a small Hamming distance of the current
+frame's hash: sensor noise and small lighting changes still hit, a real scene
+change flips enough bits to miss.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    return _SPACES.sub(" ", _PUNCT.sub(" ", prompt.lower())).strip()
+
+
+def frame_hash(frame):
+    """64-bit dHash of a BGR (or grayscale) frame."""
+    small = cv2.resize(frame, (9, 8), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+class ResponseCache:
+    """LRU + TTL cache of camera answers with a memory bound."""
+
+    def __init__(self, max_entries=256, max_bytes=1 << 20, ttl=30.0, max_distance=8,
+                 per_key=4):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.per_key = per_key  # frames remembered per (camera, prompt)
+        self._entries = OrderedDict()  # (cam_id, prompt) -> [(hash, ts, answer)]
+        self._bytes = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, cam_id, prompt, fhash):
+        key = (cam_id, normalize_prompt(prompt))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._entries.get(key)
+            if bucket:
+                for h, ts, answer in reversed(bucket):
+                    if now - ts <= self.ttl and hash_distance(h, fhash) <= self.max_distance:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return answer
+            self.misses += 1
+            return None
+
+    def store(self, cam_id, prompt, fhash, answer):
+        key = (cam_id, normalize_prompt(prompt))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._entries.setdefault(key, [])
+            self._entries.move_to_end(key)
+            # Expired entries are dead weight; drop them while we are here
+            for entry in [e for e in bucket if now - e[1] > self.ttl]:
+                self._discard(bucket, entry)
+            bucket.append((fhash, now, answer))
+            self._bytes += len(answer)
+            self._count += 1
+            while len(bucket) > self.per_key:
+                self._discard(bucket, bucket[0])
+            self._evict()
+
+    def clear(self, cam_id=None):
+        with self._lock:
+            for key in [k for k in self._entries if cam_id is None or k[0] == cam_id]:
+                bucket = self._entries.pop(key)
+                self._count -= len(bucket)
+                self._bytes -= sum(len(e[2]) for e in bucket)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": self._count, "bytes": self._bytes}
+
+    # ------------------------------------------------------------------
+    def _discard(self, bucket, entry):
+        bucket.remove(entry)
+        self._bytes -= len(entry[2])
+        self._count -= 1
+
+    def _evict(self):
+        while self._entries and (self._count > self.max_entries or self._bytes > self.max_bytes):
+            key, bucket = next(iter(self._entries.items()))
+            self._discard(bucket, bucket[0])
+            if not bucket:
+                del self._entries[key]
+
+
+response_cache = ResponseCache()
@@ -1,33 +1,112 @@
-"""High‑level robot‑arm command stub.
+"""High‑level robot‑arm commands.
 
-Replace `_send` with your actual serial / ROS / API call.
+Commands go through ``arm_transport.arm_driver``: one persistent connection,
+sent in order, each waiting for the arm's acknowledgement.  Pick the
+connection with ``arm_transport`` (see ``arm_transport.py``).  Moves are
+handed to ``arm_motion``, which streams rate- and acceleration-limited
+waypoints and lets a newer target supersede an unfinished one.  Claw
+commands wait for the running move first, so they reach the arm after its
+final waypoint.
 """
-import re, threading, time, sys
+import asyncio, re
 
-# Example transport layer -------------------------------------------------
-def _send(cmd: str):
-    """Send a raw command string to the arm (stubbed)."""
-    print(f"[ARM] {cmd}", file=sys.stderr)
-    # TODO: serial_port.write(f"{cmd}\n".encode())
+from arm_motion import arm_motion, FAILED, REACHED
+from arm_transport import arm_driver, ArmError
+from dictionary import ARM_STOP_KEYWORDS
+from metrics import metrics
 
-# Public API --------------------------------------------------------------
-def handle_robot_arm_command(command: str):
-    """Parse natural‑language command and forward to the arm driver."""
-    cmd_lc = command.lower()
+MOVE_WAIT_S = 60.0    # longest a caller waits for a move (or a claw command for the move)
+FAIL_CHECK_S = 0.2    # without waiting, still catch a move that fails at once (no link)
 
-    if "open" in cmd_lc:
-        threading.Thread(target=_send, args=("CLAW OPEN",), daemon=True).start()
-        return "Claw opened."
+# word -> (wire command, reply, failure reply)
+_CLAW = {"open": ("CLAW OPEN", "Claw opened.", "Claw did not open"),
+         "close": ("CLAW CLOSE", "Claw closed.", "Claw did not close")}
 
-    if "close" in cmd_lc:
-        threading.Thread(target=_send, args=("CLAW CLOSE",), daemon=True).start()
-        return "Claw closed."
+# Transport layer ---------------------------------------------------------
+def _send(cmd: str):
+    """Send a raw command string to the arm; returns None or an error message."""
+    try:
+        arm_driver.command(cmd)
+    except ArmError as e:
+        return str(e)
+    return None
 
+def _parse(command: str):
+    """(action, argument): ("stop", None), ("claw", _CLAW entry), ("move", coords)
+    or (None, reply) when the command is not recognized."""
+    cmd_lc = command.lower()
+    if any(phrase in cmd_lc for phrase in ARM_STOP_KEYWORDS):
+        return "stop", None
+    for word, claw in _CLAW.items():
+        if word in cmd_lc:
+            return "claw", claw
     if "move to" in cmd_lc:
         coords = re.findall(r"[-+]?[0-9]*\.?[0-9]+", command)
         if len(coords) == 3:
-            threading.Thread(target=_send, args=(f"MOVE {','.join(coords)}",), daemon=True).start()
-            return f"Moving arm to {coords}"
-        return "Command not recognized: missing coordinates."
+            return "move", coords
+        return None, "Command not recognized: missing coordinates."
+    return None, f"Command not recognized: {command}"
+
+def _idle_error(handle):
+    """Why a claw command must not follow the move ``handle``; None to go ahead."""
+    if handle is not None and not handle.done:
+        return "arm is still moving"
+    if handle is not None and handle.state == FAILED:
+        return f"move failed: {handle.error}"
+    return None
+
+def _claw_reply(claw, error):
+    _, done, failed = claw
+    return done if error is None else f"{failed}: {error}"
+
+def _describe_move(handle, coords):
+    if handle.state == FAILED:
+        return f"Arm did not move: {handle.error}"
+    if handle.state == REACHED:
+        return f"Arm moved to {coords}"
+    if handle.done:
+        return f"Move to {coords} {handle.state}."
+    return f"Moving arm to {coords}"
+
+# Public API --------------------------------------------------------------
+@metrics.timed("arm")
+def handle_robot_arm_command(command: str):
+    """Parse natural‑language command and forward to the arm driver.
+
+    A move returns while the arm is still moving; a claw command waits for
+    the running move first, blocking the calling thread.  Code on the
+    router's event loop uses ``ahandle_robot_arm_command`` instead.
+    """
+    action, arg = _parse(command)
+    if action == "stop":
+        arm_motion.cancel()
+        return "Arm stopping."
+    if action == "claw":
+        return _claw_reply(arg, _idle_error(arm_motion.wait_idle(MOVE_WAIT_S)) or _send(arg[0]))
+    if action == "move":
+        # The motion thread streams the waypoints
+        handle = arm_motion.move_to([float(c) for c in arg])
+        handle.wait(FAIL_CHECK_S)
+        return _describe_move(handle, arg)
+    return arg
+
+@metrics.timed("arm")
+async def ahandle_robot_arm_command(command: str, timeout: float = MOVE_WAIT_S):
+    """Coroutine version for ordered callers (chat, tool loop).
 
-    return f"Command not recognized: {command}"
\ No newline at end of file
+    A move is awaited until it ended, at most ``timeout``.  The waiting
+    happens on the event loop, so a prompt timeout or supersede cancels it
+    at once (the move itself carries on).
+    """
+    action, arg = _parse(command)
+    if action == "stop":
+        arm_motion.cancel()
+        return "Arm stopping."
+    if action == "claw":
+        error = _idle_error(await arm_motion.wait_idle_async(timeout))
+        return _claw_reply(arg, error or await asyncio.to_thread(_send, arg[0]))
+    if action == "move":
+        handle = arm_motion.move_to([float(c) for c in arg])
+        await handle.wait_async(timeout)
+        return _describe_move(handle, arg)
+    return arg
@@ -0,0 +1,92 @@
+"""Parsing helpers for the interface LLM's text tool protocol.
+
+The general-chat system prompt lets the model answer with
+``CALL_CAMERA('...')``, ``CALL_TRIANGULATE('...')`` or ``CALL_ARM('...')``.
+These helpers find those calls in a reply, keep them out of the streamed
+text shown to the user, and format the results fed back as TOOL_RESULT.
+"""
+import re
+from typing import NamedTuple
+
+TOOL_NAMES = ("CAMERA", "TRIANGULATE", "ARM")
+_MARKER = "CALL_"
+_CALL = re.compile(
+    r"CALL_(CAMERA|TRIANGULATE|ARM)\(\s*(?:'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\"|([^)]*?))\s*\)",
+    re.DOTALL,
+)
+
+
+class ToolCall(NamedTuple):
+    tool: str   # CAMERA / TRIANGULATE / ARM
+    arg: str
+
+
+def parse_tool_calls(reply):
+    """All tool calls in a reply, in order of appearance."""
+    calls = []
+    for m in _CALL.finditer(reply or ""):
+        arg = next((g for g in m.groups()[1:] if g is not None), "")
+        calls.append(ToolCall(m.group(1), arg.strip()))
+    return calls
+
+
+def visible_text(reply):
+    """The part of a complete reply ``ToolCallFilter`` lets through."""
+    reply = reply or ""
+    idx = reply.find(_MARKER)
+    return reply if idx < 0 else reply[:idx]
+
+
+def strip_tool_calls(reply):
+    return _CALL.sub("", reply or "").strip()
+
+
+def format_tool_results(results):
+    """One TOOL_RESULT message body for a list of (ToolCall, result) pairs."""
+    lines = [f"TOOL_RESULT {call.tool}('{call.arg}'): {result}" for call, result in results]
+    return "\n".join(lines)
+
+
+class ToolCallFilter:
+    """Streams text through but withholds everything from the first ``CALL_`` on.
+
+    Trailing characters that could be the start of ``CALL_`` are held back
+    until the next delta shows whether they are.  ``prefix`` is sent before
+    the first text that gets through (e.g. a newline between tool rounds).
+    """
+
+    def __init__(self, on_token, prefix=""):
+        self.on_token = on_token
+        self.prefix = prefix
+        self._held = ""
+        self.blocked = False
+
+    def _emit(self, text):
+        if self.prefix:
+            text, self.prefix = self.prefix + text, ""
+        self.on_token(text)
+
+    def push(self, delta):
+        if self.blocked:
+            return
+        text = self._held + delta
+        idx = text.find(_MARKER)
+        if idx >= 0:
+            self.blocked = True
+            self._held = ""
+            if idx:
+                self._emit(text[:idx])
+            return
+        keep = 0
+        for n in range(min(len(_MARKER) - 1, len(text)), 0, -1):
+            if _MARKER.startswith(text[-n:]):
+                keep = n
+                break
+        self._held = text[len(text) - keep:] if keep else ""
+        if len(text) > keep:
+            self._emit(text[:len(text) - keep])
+
+    def flush(self):
+        if self._held and not self.blocked:
+            self._emit(self._held)
+        self._held = ""
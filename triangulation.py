@@ -1,37 +1,218 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
 import numpy as np
 
-def triangulate_3d_position(camera_calibration: dict, pixel_coords: dict):
-    """Simple two‑camera triangulation with basic sanity checks.
+from metrics import metrics
+
+
+@dataclass
+class TriangulationResult:
+    """Outcome of a triangulation.
+
+    ``position`` is world-space [X, Y, Z] in metres (2 dp) or None on failure,
+    ``residual_px`` the RMS reprojection error over the views used (lower is
+    better), ``views`` the cameras that contributed and ``rejected`` the
+    cameras dropped as outliers.
+    """
+    position: Optional[list] = None
+    residual_px: Optional[float] = None
+    views: list = field(default_factory=list)
+    rejected: list = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.position is not None
+
+    def __str__(self):
+        return str(self.position) if self.ok else self.error
+
+
+# -----------------------------------------------------------------------------
+# Projection matrices
+# -----------------------------------------------------------------------------
+def intrinsics(info: dict):
+    """3x3 camera matrix from a calibration entry (K, or fx/fy/focal_length + cx/cy)."""
+    if "K" in info:
+        return np.asarray(info["K"], dtype=float)
+    f = info.get("focal_length", 1000)
+    return np.array([[info.get("fx", f), 0.0, info.get("cx", 320)],
+                     [0.0, info.get("fy", f), info.get("cy", 240)],
+                     [0.0, 0.0, 1.0]])
+
+
+def rotation(info: dict):
+    """World->camera rotation; identity (camera looking down +Z) if not given."""
+    if "R" in info:
+        return np.asarray(info["R"], dtype=float)
+    if "rvec" in info:  # Rodrigues vector
+        r = np.asarray(info["rvec"], dtype=float).reshape(3)
+        theta = np.linalg.norm(r)
+        if theta < 1e-12:
+            return np.eye(3)
+        k = r / theta
+        kx = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+        return np.eye(3) + np.sin(theta) * kx + (1 - np.cos(theta)) * kx @ kx
+    return np.eye(3)
+
+
+def build_projection_matrix(info: dict):
+    """P = K [R | -R C] for a camera centred at ``pos`` (metres)."""
+    R = rotation(info)
+    C = np.asarray(info.get("pos", [0.0, 0.0, 0.0]), dtype=float).reshape(3)
+    return intrinsics(info) @ np.hstack([R, (-R @ C)[:, None]])
+
+
+_cache_lock = threading.Lock()
+_version = 0
+_cache = None  # (calibration, version, {cam_id: P}) of the latest calibration only
+
+
+def calibration_changed():
+    """Call after editing a calibration dict in place; its matrices are rebuilt."""
+    global _version
+    with _cache_lock:
+        _version += 1
+
+
+def projection_matrices(camera_calibration: dict):
+    """Per-camera 3x4 projection matrices, computed once per calibration."""
+    global _cache
+    cached = _cache
+    if cached is not None and cached[0] is camera_calibration and cached[1] == _version:
+        return cached[2]
+    with _cache_lock:
+        version = _version
+    mats = {cid: build_projection_matrix(info) for cid, info in camera_calibration.items()}
+    with _cache_lock:
+        _cache = (camera_calibration, version, mats)
+    return mats
+
+
+# -----------------------------------------------------------------------------
+# Solver
+# -----------------------------------------------------------------------------
+def _dlt_batch(P, uv, mask):
+    """Least-squares DLT for many points at once.
+
+    P: (C, 3, 4) projection matrices, uv: (N, C, 2) pixels, mask: (N, C) bool.
+    Returns (X (N, 3), per-view reprojection error (N, C), depths (N, C));
+    masked views get error NaN, points with parallel rays get X = inf.
+    """
+    A = np.concatenate([uv[..., 0:1] * P[None, :, 2] - P[None, :, 0],
+                        uv[..., 1:2] * P[None, :, 2] - P[None, :, 1]], axis=1)  # (N, 2C, 4)
+    A /= np.linalg.norm(A, axis=2, keepdims=True) + 1e-12           # row conditioning
+    A *= np.concatenate([mask, mask], axis=1)[..., None]             # missing views drop out
+    # Null vector of A = eigenvector of the 4x4 normal matrix with the smallest
+    # eigenvalue; far cheaper than an SVD of the (2C, 4) system per point.
+    _, vecs = np.linalg.eigh(np.einsum("nki,nkj->nij", A, A))
+    Xh = vecs[:, :, 0]                                               # (N, 4)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # w ~ 0 means the rays are (nearly) parallel: point at infinity
+        far = np.abs(Xh[:, 3]) <= 1e-9
+        X = Xh[:, :3] / np.where(far, 1.0, Xh[:, 3])[:, None]
+        X[far] = np.inf
+        proj = np.einsum("cij,nj->nci", P, np.concatenate([X, np.ones((len(X), 1))], axis=1))
+        depth = proj[..., 2]
+        err = np.linalg.norm(proj[..., :2] / depth[..., None] - uv, axis=2)
+    err[~mask] = np.nan
+    return X, err, depth
+
+
+def _dlt(P, uv):
+    """Single-point DLT: P (N, 3, 4), uv (N, 2) -> (X (3,), error (N,), depths (N,))."""
+    X, err, depth = _dlt_batch(P, uv[None], np.ones((1, len(uv)), dtype=bool))
+    return X[0], err[0], depth[0]
+
+
+def triangulate_batch(camera_calibration: dict, pixels, mask=None, cam_ids=None):
+    """Triangulate many points (objects or frames) in one vectorized call.
 
     Args:
-        camera_calibration: mapping cam_id -> calibration dict (pos, focal_length, cx, cy).
+        camera_calibration: mapping cam_id -> calibration dict.
+        pixels: array (points, cameras, 2) of pixel coordinates.
+        mask: optional (points, cameras) bool, True where the view is valid;
+            defaults to every finite pixel pair.
+        cam_ids: calibration ids for the camera axis; defaults to the sorted
+            calibration keys.
+
+    Returns:
+        (positions (points, 3), residual_px (points,)).  Rows with fewer than
+        two valid views, near-parallel rays or a point behind a camera are NaN.
+        No outlier rejection is done; use ``triangulate_3d_position`` for that.
+    """
+    uv = np.asarray(pixels, dtype=float)
+    if uv.ndim != 3 or uv.shape[2] != 2:
+        raise ValueError(f"pixels must be shaped (points, cameras, 2), got {uv.shape}")
+    if cam_ids is None:
+        cam_ids = sorted(camera_calibration, key=str)
+    cam_ids = list(cam_ids)
+    if len(cam_ids) != uv.shape[1]:
+        raise ValueError(f"{uv.shape[1]} cameras in pixels but {len(cam_ids)} cam_ids")
+    valid = np.isfinite(uv).all(axis=2)
+    if mask is not None:
+        valid &= np.asarray(mask, dtype=bool)
+    uv = np.where(valid[..., None], uv, 0.0)
+
+    mats = projection_matrices(camera_calibration)
+    P = np.stack([mats[cid] for cid in cam_ids])
+    X, err, depth = _dlt_batch(P, uv, valid)
+
+    n_views = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        residual = np.sqrt(np.where(valid, err, 0.0) ** 2 @ np.ones(len(cam_ids)) / n_views)
+    bad = ((n_views < 2) | ~np.isfinite(X).all(axis=1)
+           | np.any(valid & (depth <= 0), axis=1))
+    X[bad] = np.nan
+    residual[bad] = np.nan
+    return X, residual
+
+
+@metrics.timed("triangulate")
+def triangulate_3d_position(camera_calibration: dict, pixel_coords: dict,
+                            max_reprojection_px: float = 15.0):
+    """Multi-view DLT triangulation with reprojection-error outlier rejection.
+
+    Args:
+        camera_calibration: mapping cam_id -> calibration dict (pos, focal_length / fx / fy,
+            cx, cy and optionally K, R or rvec).
         pixel_coords: mapping cam_id -> (x, y) pixel tuples OR None for invalid.
+        max_reprojection_px: with three or more views, the worst view is dropped
+            while its reprojection error exceeds this.
 
     Returns:
-        World-space (X, Y, Z) list rounded to 2 dp, or str with error.
+        TriangulationResult; every valid, calibrated view is used.
     """
     # Filter out invalid results first
-    valid = {cid: pt for cid, pt in pixel_coords.items() if pt}
+    valid = {cid: pt for cid, pt in pixel_coords.items() if pt and cid in camera_calibration}
     if len(valid) < 2:
-        return "Need two good camera views."
-
-    cam_ids = list(valid.keys())[:2]
-    cam1, cam2 = cam_ids
-    (x1, y1), (x2, y2) = valid[cam1], valid[cam2]
-
-    cam1_info = camera_calibration[cam1]
-    cam2_info = camera_calibration[cam2]
+        return TriangulationResult(error="Need two good camera views.")
 
-    baseline = np.linalg.norm(np.array(cam1_info['pos']) - np.array(cam2_info['pos']))  # metres
-    f = cam1_info.get('focal_length', 1000)  # pixels
-    cx = cam1_info.get('cx', 320)
-    cy = cam1_info.get('cy', 240)
+    mats = projection_matrices(camera_calibration)
+    cam_ids = list(valid)
+    P = np.stack([mats[cid] for cid in cam_ids])
+    uv = np.array([valid[cid] for cid in cam_ids], dtype=float)
 
-    disparity = abs(x1 - x2)
-    if disparity < 1:  # too small → unreliable depth
-        return "Disparity too small for reliable depth."
+    rejected = []
+    X, err, depth = _dlt(P, uv)
+    while len(cam_ids) > 2 and err.max() > max_reprojection_px:
+        worst = int(np.argmax(err))
+        rejected.append(cam_ids.pop(worst))
+        P = np.delete(P, worst, axis=0)
+        uv = np.delete(uv, worst, axis=0)
+        X, err, depth = _dlt(P, uv)
 
-    Z = f * baseline / disparity
-    X = (x1 - cx) * Z / f
-    Y = (y1 - cy) * Z / f
-    return [round(float(X), 2), round(float(Y), 2), round(float(Z), 2)]
\ No newline at end of file
+    if not np.all(np.isfinite(X)):
+        return TriangulationResult(views=cam_ids, rejected=rejected,
+                                   error="Disparity too small for reliable depth.")
+    if np.any(depth <= 0):
+        return TriangulationResult(views=cam_ids, rejected=rejected,
+                                   error="Views do not intersect in front of the cameras.")
+    return TriangulationResult(
+        position=[round(float(v), 2) for v in X],
+        residual_px=round(float(np.sqrt(np.mean(err ** 2))), 2),
+        views=cam_ids,
+        rejected=rejected,
+    )
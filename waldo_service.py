@@ -0,0 +1,388 @@
+"""Headless W.A.L.D.O. service and its local HTTP API.
+
+``WaldoService`` owns everything that does not need a display: frame sources
+and capture workers, the motion index, the object detector, the prompt
+router (and through it the arm controller) and the auto-prompt scheduler.
+The Tk window is one client of it; ``serve`` puts the same API on a local
+HTTP port for scripts, other machines on the rack and load tests:
+
+    POST /prompt          {"prompt": "...", "stream": false} -> {"answer": "..."}
+                          with "stream": true the reply is Server-Sent Events:
+                          "delta" events, then one "done" event with the answer;
+                          "supersede": true cancels the previous prompt of the
+                          same "client" (default: the caller's address); each
+                          client has its own conversation history
+    GET  /events          Server-Sent Events with status lines (auto prompts)
+    GET  /frames/<N>.jpg  newest frame of camera N as JPEG
+    GET  /cameras         camera ids, names, frame seq and capture fps
+    GET  /metrics         counters, gauges and stage timings as JSON;
+                          ?format=prometheus for the Prometheus text format
+    GET  /health          "ok"
+
+Requests are served on one thread per connection; prompts themselves run on
+the router's event loop, so many clients can have prompts in flight at once.
+"""
+import json, queue, re, threading, time
+from concurrent.futures import CancelledError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from ai_client_pool import close_all, aclose_all
+from ai_interface_router import InterfaceAIRouter
+from arm_motion import arm_motion
+from arm_transport import arm_driver
+from async_runtime import get_runtime
+from autoprompt_scheduler import AutoPromptScheduler
+from camera_capture import CaptureManager
+from config_store import ConfigStore
+from frame_sources import open_sources, open_source, source_spec
+from frame_store import FrameStore
+from metrics import metrics
+from motion_detector import MotionDetector
+from object_detector import object_detector
+from response_cache import response_cache
+
+
+class WaldoService:
+    def __init__(self, config, interface_ai, camera_calibration, runtime=None):
+        self.config = ConfigStore.wrap(config)
+        self.interface_ai = interface_ai
+        self.camera_calibration = camera_calibration
+        self.runtime = runtime or get_runtime()
+        self.frames = FrameStore()
+        self.capture = CaptureManager(self.frames)
+        self.camera_indices = []
+        self.router = None
+        self.motion = None
+        self.autoprompt = None
+        self.started_at = time.time()
+        self.counters = {"prompts": 0, "prompt_errors": 0, "prompts_cancelled": 0}
+        self._open_caps, self._source_specs = {}, {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._unsubscribe_config = None
+
+    # ------------------------------------------------------------- lifecycle
+    def start(self):
+        metrics.sync(self.config)
+        # Devices are probed in parallel; the opened sources go straight to capture
+        self._open_caps, self._source_specs = open_sources(self.config)
+        self.camera_indices = list(self._open_caps)
+        self._start_capture()
+        self.motion = MotionDetector.from_config(self.frames, self.config)
+        self.motion.start()
+        self.router = InterfaceAIRouter(self.interface_ai, self.config, self.camera_calibration,
+                                        app=self, runtime=self.runtime)
+        self.autoprompt = AutoPromptScheduler(self.frames, post=self.publish, runtime=self.runtime)
+        self.autoprompt.sync(self.config)
+        self._watch_config()
+        return self
+
+    def apply_config(self, config=None):
+        """Apply edited settings live; unchanged devices stay open."""
+        if config is not None and config is not self.config:
+            self.config = ConfigStore.wrap(config)
+            self._watch_config()
+        metrics.sync(self.config)
+        self.router.config_data = self.config
+        self.router.refresh_camera_ais()
+        self._open_caps.update(self.capture.stop_all(release=False))
+        self._start_capture()
+        self.autoprompt.sync(self.config)
+
+    def stop(self):
+        if self._unsubscribe_config:
+            self._unsubscribe_config()
+        self.config.flush()
+        if self.autoprompt:
+            self.autoprompt.stop()
+        try:
+            if self.router:
+                self.router.cancel_all()
+            self.runtime.run(aclose_all(), timeout=2)
+        except Exception:
+            pass
+        self.runtime.stop()
+        close_all()
+        object_detector.close()
+        arm_motion.stop()
+        arm_driver.close()
+        metrics.close()
+        if self.motion:
+            self.motion.stop()
+        self.capture.stop_all()
+        for cap in self._open_caps.values():
+            cap.release()
+        self._open_caps.clear()
+
+    def _start_capture(self):
+        for cam_idx in self.camera_indices:
+            cap = self._source_for(cam_idx)
+            if cap is not None:
+                # Files and synthetic sources play at their own rate, devices at fps_N
+                fps = cap.fps or getattr(self.config.typed, f"fps_{cam_idx}")
+                self.capture.add(cam_idx, cap, fps=fps)
+
+    def _watch_config(self):
+        """Settings that apply without a restart follow the store directly."""
+        if self._unsubscribe_config:
+            self._unsubscribe_config()
+        unsubscribe = [self.config.subscribe(self._fps_changed, "fps_"),
+                       self.config.subscribe(lambda _: metrics.sync(self.config), "metrics_")]
+        self._unsubscribe_config = lambda: [u() for u in unsubscribe]
+
+    def _fps_changed(self, changes):
+        for key, (_, fps) in changes.items():
+            cam_idx = int(key.rsplit("_", 1)[1])
+            worker = self.capture.workers.get(cam_idx)
+            if worker is not None and not getattr(worker.cap, "fps", None):  # devices only
+                worker.fps = fps
+
+    def _source_for(self, cam_idx):
+        """Already-open source for a slot, reopened if its ``source_N`` changed."""
+        spec = source_spec(self.config, cam_idx)
+        cap = self._open_caps.pop(cam_idx, None)
+        if cap is not None and self._source_specs.get(cam_idx) == spec:
+            return cap
+        if cap is not None:
+            cap.release()
+        self._source_specs[cam_idx] = spec
+        return open_source(spec, cam_idx)
+
+    # ---------------------------------------------------------------- prompts
+    def submit_prompt(self, prompt, on_token=None, supersede=False, client=None):
+        """Start answering ``prompt``; returns a ``concurrent.futures.Future``.
+
+        ``supersede`` only cancels the previous prompt of the same ``client``.
+        """
+        with self._lock:
+            self.counters["prompts"] += 1
+        future = self.router.submit_prompt(prompt, on_token=on_token, supersede=supersede,
+                                           client=client)
+        future.add_done_callback(self._count_outcome)
+        return future
+
+    def _count_outcome(self, future):
+        with self._lock:
+            if future.cancelled():
+                self.counters["prompts_cancelled"] += 1
+            elif future.exception() is not None:
+                self.counters["prompt_errors"] += 1
+
+    def cancel_all(self):
+        self.router.cancel_all()
+
+    # ----------------------------------------------------------------- status
+    def subscribe(self, callback):
+        """Call ``callback(text)`` for every status line; returns an unsubscribe function."""
+        with self._lock:
+            self._listeners.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._listeners:
+                    self._listeners.remove(callback)
+        return unsubscribe
+
+    def publish(self, text):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(text)
+            except Exception as e:
+                print(f"[Service] status listener failed: {e}")
+
+    # ------------------------------------------------------------ inspection
+    def camera_name(self, cam_idx):
+        return self.config.get(f"camera_name_{cam_idx}", f"Camera {cam_idx + 1}")
+
+    def cameras(self):
+        return [{"id": cam_idx,
+                 "name": self.camera_name(cam_idx),
+                 "source": self._source_specs.get(cam_idx, "device"),
+                 "seq": self.frames.latest_seq(cam_idx),
+                 "fps": getattr(self.capture.workers.get(cam_idx), "fps", None),
+                 "measured_fps": round(getattr(self.capture.workers.get(cam_idx), "measured_fps", 0.0), 1)}
+                for cam_idx in self.camera_indices]
+
+    def snapshot_jpeg(self, cam_idx, quality=80):
+        view = self.frames.read(cam_idx)
+        if view is None:
+            return None
+        with view:
+            ok, buffer = cv2.imencode(".jpg", view.frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if ok else None
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "prompts_in_flight": self.router.pending() if self.router else 0,
+            **counters,
+            "history_tokens": self.router.history_tokens() if self.router else 0,
+            "cameras": self.cameras(),
+            "motion_load": {str(k): round(v, 4) for k, v in self.motion.load().items()} if self.motion else {},
+            "response_cache": response_cache.stats(),
+            "autoprompt": dict(self.autoprompt.stats) if self.autoprompt else {},
+            "arm": arm_driver.snapshot(),
+            "arm_motion": arm_motion.snapshot(),
+            "stages": metrics.snapshot(),
+        }
+
+    def prometheus(self):
+        """Stage histograms plus the service's own counters, Prometheus text format."""
+        with self._lock:
+            counters = {f"service_{name}": value for name, value in self.counters.items()}
+        counters["response_cache_hits"] = response_cache.hits
+        counters["response_cache_misses"] = response_cache.misses
+        gauges = {"uptime_seconds": round(time.time() - self.started_at, 1),
+                  "router_prompts_in_flight": self.router.pending() if self.router else 0}
+        return metrics.prometheus(gauges, counters)
+
+
+# -----------------------------------------------------------------------------
+# HTTP API
+# -----------------------------------------------------------------------------
+_FRAME_PATH = re.compile(r"^/frames/(\d+)\.jpg$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "WALDO/1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, fmt, *args):  # keep the console for real problems
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+    # ---------------------------------------------------------------- GET
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/health":
+            return self._send(200, "ok", "text/plain")
+        if path == "/cameras":
+            return self._send(200, self.service.cameras())
+        if path == "/metrics":
+            if "format=prometheus" in self.path:
+                return self._send(200, self.service.prometheus(), "text/plain; version=0.0.4")
+            return self._send(200, self.service.metrics())
+        if path == "/events":
+            return self._events()
+        m = _FRAME_PATH.match(path)
+        if m:
+            jpeg = self.service.snapshot_jpeg(int(m.group(1)))
+            if jpeg is None:
+                return self._send(404, {"error": "no frame"})
+            return self._send(200, jpeg, "image/jpeg")
+        self._send(404, {"error": "not found"})
+
+    def _events(self):
+        lines = queue.SimpleQueue()
+        unsubscribe = self.service.subscribe(lines.put)
+        try:
+            self._start_events()
+            while True:
+                try:
+                    self._event("status", {"text": lines.get(timeout=15)})
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            unsubscribe()
+
+    # ---------------------------------------------------------------- POST
+    def do_POST(self):
+        if self.path.split("?", 1)[0] != "/prompt":
+            return self._send(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            prompt = str(body["prompt"]).strip()
+        except (ValueError, KeyError, TypeError):
+            return self._send(400, {"error": 'expected JSON {"prompt": "..."}'})
+        if not prompt:
+            return self._send(400, {"error": "empty prompt"})
+        client = str(body.get("client") or f"http:{self.client_address[0]}")
+        supersede = bool(body.get("supersede", False))
+
+        if not body.get("stream"):
+            future = self.service.submit_prompt(prompt, supersede=supersede, client=client)
+            try:
+                return self._send(200, {"answer": future.result()})
+            except CancelledError:
+                return self._send(409, {"error": "cancelled"})
+            except Exception as e:
+                return self._send(500, {"error": str(e)})
+
+        deltas = queue.SimpleQueue()
+        future = self.service.submit_prompt(prompt, on_token=lambda d: deltas.put(("delta", d)),
+                                            supersede=supersede, client=client)
+        future.add_done_callback(lambda f: deltas.put(("done", None)))
+        try:
+            self._start_events()
+            while True:
+                kind, delta = deltas.get()
+                if kind == "delta":
+                    self._event("delta", {"text": delta})
+                    continue
+                if future.cancelled():
+                    self._event("error", {"error": "cancelled"})
+                elif future.exception() is not None:
+                    self._event("error", {"error": str(future.exception())})
+                else:
+                    self._event("done", {"answer": future.result()})
+                break
+        except (BrokenPipeError, ConnectionResetError):
+            future.cancel()  # client went away; stop spending tokens on it
+
+
+class WaldoHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, service, host="127.0.0.1", port=8765):
+        super().__init__((host, port), _Handler)
+        self.service = service
+
+
+def serve(service, host="127.0.0.1", port=8765, background=False):
+    """Serve the API; with ``background`` on a daemon thread (returns the server)."""
+    server = WaldoHTTPServer(service, host, port)
+    print(f"[Service] API on http://{host}:{server.server_address[1]}")
+    if background:
+        threading.Thread(target=server.serve_forever, name="waldo-http", daemon=True).start()
+        return server
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server